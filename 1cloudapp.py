@@ -1,13 +1,35 @@
+import re
+import time
+import uuid
 from datetime import datetime
 from zoneinfo import ZoneInfo
-import time
+
 import streamlit as st
-import os, io, urllib.parse, time, pandas as pd, re
-from datetime import datetime
-from google import genai
-from docx import Document
-from fpdf import FPDF
-from supabase import create_client, Client
+# Heavy SDKs (google-genai, supabase, python-docx, fpdf) are imported inside vakildraft on first use,
+# so the login page renders without them; see bench/bench_startup.py for the breakdown
+from vakildraft.citations import extract_citations, flag_unverified, verify_citations
+from vakildraft.clients import ClientRegistry
+from vakildraft.context_cache import ContextCache
+from vakildraft.draft_store import DraftStore
+from vakildraft.drafting import generate, generate_stream
+from vakildraft.export import DraftExporter, has_malayalam
+from vakildraft.history_index import HistoryIndex
+from vakildraft.jobs import ACTIVE, JobQueue
+from vakildraft.judgments import JudgmentCorpus
+from vakildraft.keypool import KeyPool
+from vakildraft.log_store import AccessLogStore
+from vakildraft.metrics import Metrics
+from vakildraft.near_dup import REQUEST, NearDupIndex
+from vakildraft.placeholders import find_placeholders, replace_all
+from vakildraft.prompting import build_mirror_prompt, build_section_prompt, build_standard_prompt, route_model
+from vakildraft.response_cache import ResponseCache
+from vakildraft.sections import HEADINGS, changed_sections, input_hashes, is_sectioned, merge, section_body, stitch
+from vakildraft.session_memory import BlobStore, SessionMemory, process_rss
+from vakildraft.storage import open_storage
+from vakildraft.style_vault import StyleVault
+from vakildraft.text import estimate_tokens
+
+RERUN_START = time.perf_counter()
 
 # ---------------------------------------------------
 # 0. UNIVERSAL UI LOCKDOWN
@@ -29,6 +51,36 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_metrics():
+    # Rolling per-stage / per-model / per-key latency percentiles; [METRICS] secrets: window
+    return Metrics(**st.secrets.get("METRICS", {}))
+
+metrics = get_metrics()
+
+@st.cache_resource
+def get_client_registry():
+    # One keep-alive client per API key and one Supabase client for the whole process; [CLIENTS] secrets:
+    # timeout, max_connections, max_keepalive, keepalive_expiry (both pools), idle_ttl, supabase_timeout
+    return ClientRegistry(**st.secrets.get("CLIENTS", {}))
+
+clients = get_client_registry()
+
+SUPABASE_URL = "https://wuhsjcwtoradbzeqsoih.supabase.co"
+SUPABASE_KEY = "sb_publishable_02nqexIYCCBaWryubZEkqA_Tw2PqX6m"
+
+@st.cache_resource
+def get_storage():
+    # Logs, vault files and drafts shared by all replicas; [STORAGE] secrets: backend = "local" | "supabase",
+    # url/key (default: the project above), flush_interval, watch_interval, cache_ttl, ...
+    config = dict(st.secrets.get("STORAGE", {}))
+    if config.get("backend") == "supabase":
+        config.setdefault("url", SUPABASE_URL)
+        config.setdefault("key", SUPABASE_KEY)
+    return open_storage(clients, **config)
+
+storage = get_storage()
+
 # ---------------------------------------------------
 # NEW: LOG MANAGER (Using modern ZoneInfo for India)
 # ---------------------------------------------------
@@ -39,31 +91,83 @@ class LogManager:
         # Setting the timezone to India using ZoneInfo
         self.india_tz = ZoneInfo("Asia/Kolkata")
         self.start_time = datetime.now(self.india_tz).strftime("%Y-%m-%d %I:%M %p")
-        self.logs = []
+        # Persistent, shared by every worker process and replica through the storage layer
+        self.store = AccessLogStore(storage)
 
     def add_login(self, username):
-        session_id = str(time.time())
-        entry = {
-            "session_id": session_id,
-            "user": username.upper(),
-            "login_time": datetime.now(self.india_tz).strftime("%Y-%m-%d %I:%M %p"),
-            "logout_time": "Active", 
-            "year": datetime.now(self.india_tz).year
-        }
-        self.logs.append(entry)
+        session_id = uuid.uuid4().hex
+        now = datetime.now(self.india_tz)
+        self.store.login(session_id, username.upper(), now.strftime("%Y-%m-%d %I:%M %p"), now.year)
         return session_id
 
     def add_logout(self, session_id):
-        for entry in self.logs:
-            if entry["session_id"] == session_id:
-                entry["logout_time"] = datetime.now(self.india_tz).strftime("%Y-%m-%d %I:%M %p")
-                break
-
-    def get_df(self):
-        return pd.DataFrame(self.logs)
+        self.store.logout(session_id, datetime.now(self.india_tz).strftime("%Y-%m-%d %I:%M %p"))
 
 log_store = LogManager()
 
+@st.cache_resource
+def get_context_cache():
+    # Server-side caches of large prompt prefixes, per API key; [CONTEXT_CACHE] secrets: ttl, max_handles, ...
+    return ContextCache(clients, metrics=metrics, **st.secrets.get("CONTEXT_CACHE", {}))
+
+context_cache = get_context_cache()
+
+@st.cache_resource
+def get_response_cache():
+    # Identical (model, prompt) pairs are answered from memory/disk instead of the API
+    return ResponseCache(**st.secrets.get("RESPONSE_CACHE", {}))
+
+response_cache = get_response_cache()
+
+@st.cache_resource
+def get_exporter():
+    # Optional [EXPORT] secrets: font_path to a Unicode TTF, max_items, max_workers
+    return DraftExporter(metrics=metrics, **st.secrets.get("EXPORT", {}))
+
+exporter = get_exporter()
+
+@st.cache_resource
+def get_history_index():
+    # BM25 index over the past-draft CSVs, persisted under cache/ and refreshed incrementally
+    index = HistoryIndex()
+    index.refresh()
+    return index
+
+history_index = get_history_index()
+
+@st.cache_resource
+def get_near_dups():
+    # MinHash/LSH signatures of past drafts and their facts; [NEAR_DUP] secrets: path, num_perm, bands, threshold
+    return NearDupIndex(**st.secrets.get("NEAR_DUP", {}))
+
+near_dups = get_near_dups()
+
+@st.cache_resource
+def get_draft_store():
+    # Per-user version chains in shared storage; sessions hold only the current version id
+    return DraftStore(storage, **st.secrets.get("DRAFTS", {}))
+
+draft_store = get_draft_store()
+
+@st.cache_resource
+def get_judgments():
+    # Offline judgment corpus, filled by `python -m vakildraft.judgments ingest`;
+    # [JUDGMENTS] secrets: path, mmap_mb, max_workers
+    return JudgmentCorpus(**st.secrets.get("JUDGMENTS", {}))
+
+judgments = get_judgments()
+
+@st.cache_resource
+def get_session_memory():
+    # Long session texts live once in a shared blob store (state keeps sha256 handles) and spill to disk;
+    # [SESSION_MEMORY] secrets: memory_mb, path, idle_spill, expire_after
+    config = dict(st.secrets.get("SESSION_MEMORY", {}))
+    store = BlobStore(path=config.pop("path", None), memory_mb=config.pop("memory_mb", 64))
+    return SessionMemory(store, **config)
+
+session_memory = get_session_memory()
+blobs = session_memory.store
+
 
 # ---------------------------------------------------
 # 1. SESSION STATE INIT
@@ -72,11 +176,23 @@ if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
     st.session_state.user_role = 'user'
 
-if 'final_master' not in st.session_state:
-    st.session_state.final_master = ""
+# Key of this browser session in the session memory manager
+if 'memory_sid' not in st.session_state:
+    st.session_state.memory_sid = uuid.uuid4().hex
+
+# Handle of the current draft text in the blob store (the editor widget holds the live copy)
+if 'master_blob' not in st.session_state:
+    st.session_state.master_blob = ""
+
+if 'draft_version' not in st.session_state:
+    st.session_state.draft_version = None
+
+if 'undo_stack' not in st.session_state:
+    st.session_state.undo_stack = []
 
-if 'draft_history' not in st.session_state:
-    st.session_state.draft_history = []
+# Fingerprints of the case inputs each section of the current draft was written from
+if 'section_hashes' not in st.session_state:
+    st.session_state.section_hashes = {}
 
 if 'facts_input' not in st.session_state:
     st.session_state.facts_input = ""
@@ -91,6 +207,10 @@ if "search_keywords" not in st.session_state:
 if "selected_references" not in st.session_state:
     st.session_state.selected_references = []
 
+# Corpus hits per (phrase, court, period), so reruns don't search again
+if "judgment_hits" not in st.session_state:
+    st.session_state.judgment_hits = {}
+
 if "research_court" not in st.session_state:
     st.session_state.research_court = "Kerala High Court"
 
@@ -121,16 +241,21 @@ if not st.session_state.authenticated:
 
     st.stop()
 
+if session_memory.touch(st.session_state.memory_sid, st.session_state.user_role):
+    # An admin evicted this session: drop what can be recomputed on demand
+    st.session_state.judgment_hits = {}
+    st.session_state.similar_drafts = None
+    st.session_state.mapping_counts = None
+
 # ---------------------------------------------------
 # 3. STORAGE
 # ---------------------------------------------------
-SUPABASE_URL = "https://wuhsjcwtoradbzeqsoih.supabase.co"
-SUPABASE_KEY = "sb_publishable_02nqexIYCCBaWryubZEkqA_Tw2PqX6m"
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+@st.cache_resource
+def get_style_vault():
+    # Listing read through the storage cache + Style DNA precomputed at upload into the vault's .dna/
+    return StyleVault(storage)
 
-VAULT_PATH = "private_vault"
-if not os.path.exists(VAULT_PATH):
-    os.makedirs(VAULT_PATH)
+vault = get_style_vault()
 
 # ---------------------------------------------------
 # 4. COURT DATA
@@ -169,45 +294,231 @@ DIST_SESSIONS_COURT = {
 # ---------------------------------------------------
 # 5. CORE FUNCTIONS
 # ---------------------------------------------------
-def perform_replacement(old, new):
-    if new and old and "main_editor" in st.session_state:
-        updated = st.session_state.main_editor.replace(old, new)
-        st.session_state.final_master = updated
+UNDO_DEPTH = 20
+
+def keep_blob(text):
+    return blobs.put(st.session_state.memory_sid, text)
+
+def master_text():
+    """The current draft text; a released blob (expired session) is reloaded from the draft store."""
+    text = blobs.get(st.session_state.master_blob)
+    if text is None:
+        text = draft_store.get(st.session_state.draft_version) or ""
+        st.session_state.master_blob = keep_blob(text)
+    return text
+
+def references():
+    """selected_references with their extracts, as the prompt builders and citation checks expect."""
+    return [
+        {"title": ref["title"], "citation": ref["citation"], "extract": blobs.get(ref["blob"]) or ""}
+        for ref in st.session_state.selected_references
+    ]
+
+def add_reference(title, citation, extract):
+    handle = keep_blob(extract)
+    if all(ref["blob"] != handle for ref in st.session_state.selected_references):
+        st.session_state.selected_references.append({"title": title, "citation": citation, "blob": handle})
+
+def apply_mapping(mapping, whole_word=True, ignore_case=False):
+    """Fill every placeholder in the editor in one pass; the previous version goes on the undo stack."""
+    if "main_editor" not in st.session_state:
+        return
+    text = st.session_state.main_editor
+    updated, counts = replace_all(text, mapping, whole_word=whole_word, ignore_case=ignore_case)
+    st.session_state.mapping_counts = counts
+    if updated == text:
+        return
+    # Make sure the text being replaced is itself a version we can return to
+    before = draft_store.add(
+        st.session_state.user_role, text, f"✏️ Edit {datetime.now().strftime('%H:%M')}", kind="edit"
+    )
+    st.session_state.undo_stack = (st.session_state.undo_stack + [before])[-UNDO_DEPTH:]
+    save_draft(updated, f"🔁 Mapped {sum(counts.values())} placeholder(s) {datetime.now().strftime('%H:%M')}", kind="edit")
+
+def undo_mapping():
+    if st.session_state.undo_stack:
+        restore_version(st.session_state.undo_stack.pop())
+        st.session_state.mapping_counts = None
+
+def flag_citations_inline():
+    if "main_editor" in st.session_state:
+        text = st.session_state.main_editor
+        _, unverified = verify_citations(text, references())
+        updated = flag_unverified(text, unverified)
+        st.session_state.master_blob = keep_blob(updated)
         st.session_state.main_editor = updated
 
-def detect_unverified_citation(text):
-    patterns = [
-        r"\(\d{4}\)\s*\d+\s*SCC",
-        r"AIR\s*\d{4}",
-        r"\d{4}\s*KHC",
-        r"\d{4}\s*Ker\s*LJ"
-    ]
-    for p in patterns:
-        if re.search(p, text):
-            return True
-    return False
+PROMPT_CONFIG = {
+    "reference_budget": 6000, "dna_budget": 1500, "pro_threshold_tokens": 300, "pro_context_tokens": 2000,
+}
+PROMPT_CONFIG.update(st.secrets.get("PROMPT", {}))
 
-def smart_rotate_draft(prompt, facts, choice):
-    projects = st.secrets.get("API_KEYS", [])
+def pick_model(stats, choice):
     effective_choice = choice if st.session_state.user_role == "admin" else "Auto-Pilot"
 
-    target_model = (
-        effective_choice
-        if effective_choice != "Auto-Pilot"
-        else ("gemini-2.5-pro" if len(facts) > 1200 else "gemini-2.5-flash")
+    # Auto-Pilot routes on what the advocate supplied (facts, compacted references, DNA), not the instructions
+    return route_model(
+        stats, effective_choice, PROMPT_CONFIG["pro_threshold_tokens"], PROMPT_CONFIG["pro_context_tokens"]
     )
 
-    start_time = time.time()
-
-    for name, key in projects:
-        try:
-            client = genai.Client(api_key=key)
-            res = client.models.generate_content(model=target_model, contents=prompt)
-            return res.text, f"{name} ({target_model})", round(time.time() - start_time, 1)
-        except:
-            continue
+@st.cache_resource
+def get_key_pool(projects):
+    # Shared by every session; tuning lives in the optional [KEY_POOL] secrets table
+    return KeyPool(projects, **st.secrets.get("KEY_POOL", {}))
+
+def key_pool():
+    projects = tuple(tuple(p) for p in st.secrets.get("API_KEYS", []))
+    return get_key_pool(projects)
+
+def smart_rotate_draft(prompt, stats, choice, force=False):
+    return generate(
+        key_pool(), clients, response_cache, pick_model(stats, choice), prompt,
+        force=force, metrics=metrics, user=st.session_state.user_role
+    )
 
-    return None, "Offline", 0
+@st.cache_resource
+def get_job_queue():
+    # Background drafting for every session; [JOBS] secrets: max_workers, per_user, keep
+    return JobQueue(**st.secrets.get("JOBS", {}))
+
+job_queue = get_job_queue()
+
+def submit_draft_job(label, prompt, stats, history_label, force=False, section_hashes=None, request=None):
+    """Queue a streaming draft; resolved on the script thread, run on the job pool.
+
+    stats is the prompt's token breakdown; its prefix_chars mark the static start of the prompt
+    (see build_standard_prompt), sent through the context cache.
+    """
+    pool = key_pool()
+    model = pick_model(stats, st.session_state.selected_model)
+    prefix = prompt[:stats["prefix_chars"]]
+    user = st.session_state.user_role
+
+    def run(job):
+        return generate_stream(
+            pool, clients, response_cache, model, prompt, job.set_partial,
+            force=force, should_stop=job.cancelled, metrics=metrics, user=user,
+            prefix=prefix, context_cache=context_cache
+        )
+
+    meta = {
+        "history_label": history_label,
+        "prompt_tokens": estimate_tokens(prompt),
+        "section_hashes": section_hashes or {},
+        "request": request,
+    }
+    return job_queue.submit(user, label, run, meta=meta)
+
+def submit_section_job(case, names, force=False):
+    """Queue a redraft of just these sections; collect_finished_drafts merges them into the editor text."""
+    pool = key_pool()
+    user = st.session_state.user_role
+    plans = {}
+    with metrics.span("prompt"):
+        for name in names:
+            prompt, stats = build_section_prompt(
+                name, case["dtype"], case["court"], case["district"], case["facts"], case["references"],
+                reference_budget=PROMPT_CONFIG["reference_budget"]
+            )
+            model = pick_model(stats, st.session_state.selected_model)
+            plans[name] = (prompt, model, prompt[:stats["prefix_chars"]])
+
+    def run(job):
+        start_time = time.time()
+        bodies, tanks, ttft = {}, [], None
+        for name, (prompt, model, prefix) in plans.items():
+            text, tank, timings = generate_stream(
+                pool, clients, response_cache, model, prompt,
+                lambda partial, heading=HEADINGS[name]: job.set_partial(f"{heading}\n\n{partial}"),
+                force=force, should_stop=job.cancelled, metrics=metrics, user=user,
+                prefix=prefix, context_cache=context_cache
+            )
+            if text is None:
+                return None, tank, timings
+            bodies[name] = section_body(name, text)
+            tanks.append(tank)
+            ttft = timings["ttft"] if ttft is None else ttft
+        return bodies, ", ".join(dict.fromkeys(tanks)), {"ttft": ttft, "total": round(time.time() - start_time, 1)}
+
+    hashes = input_hashes(case)
+    titles = ", ".join(HEADINGS[name].title() for name in names)
+    tokens = sum(estimate_tokens(prompt) for prompt, _, _ in plans.values())
+    meta = {
+        "history_label": f"🧩 {titles} ({datetime.now().strftime('%H:%M')})",
+        "prompt_tokens": tokens,
+        "sections": list(names),
+        "section_hashes": {name: hashes[name] for name in names},
+    }
+    return job_queue.submit(user, f"{case['dtype']} - {titles} (≈{tokens} tokens)", run, meta=meta)
+
+def load_draft(text, version_id):
+    # Called before the editor is drawn (or from a callback), so the widget can be set too
+    st.session_state.master_blob = keep_blob(text)
+    st.session_state.main_editor = text
+    st.session_state.draft_version = version_id
+
+def save_draft(text, label, kind="draft"):
+    load_draft(text, draft_store.add(st.session_state.user_role, text, label, kind))
+
+def capture_edits():
+    """Save the editor text as a version if it differs from the current one."""
+    edited = st.session_state.get("main_editor")
+    if st.session_state.master_blob and edited and edited != draft_store.get(st.session_state.draft_version):
+        st.session_state.draft_version = draft_store.add(
+            st.session_state.user_role, edited, f"✏️ Edit {datetime.now().strftime('%H:%M')}", kind="edit"
+        )
+
+def restore_version(version_id):
+    text = draft_store.get(version_id)
+    if text is not None:
+        load_draft(text, version_id)
+
+def use_past_draft(doc_id):
+    text = history_index.get(doc_id)
+    if text:
+        save_draft(text, f"📜 Past draft #{doc_id}", kind="past")
+        st.session_state.section_hashes = {}
+
+def use_similar_draft(ref):
+    """Open a near-identical earlier draft instead of paying for a new one."""
+    kind, _, ref_id = ref.partition(":")
+    if kind == "history":
+        use_past_draft(int(ref_id))
+    else:
+        restore_version(int(ref_id))
+        st.session_state.section_hashes = {}
+    st.session_state.similar_drafts = None
+
+def collect_finished_drafts():
+    for job, result in job_queue.collect(st.session_state.user_role):
+        if "sections" in job.meta:
+            # Only the redrafted sections change; the rest of the editor text, edits included, stays
+            current = st.session_state.get("main_editor") or master_text()
+            if not is_sectioned(current):
+                # The editor now holds a draft without headings: keep the sections as their own version
+                draft_store.add(
+                    st.session_state.user_role, stitch("", result), job.meta["history_label"], kind="draft"
+                )
+                st.toast(f"{job.label}: the current draft has no section headings, sections saved to Draft History")
+                continue
+            save_draft(merge(current, result), job.meta["history_label"])
+            st.session_state.section_hashes = {**st.session_state.section_hashes, **job.meta["section_hashes"]}
+        else:
+            # The new draft replaces the editor text: keep what was typed there as a version first
+            capture_edits()
+            save_draft(result, job.meta["history_label"])
+            st.session_state.section_hashes = job.meta["section_hashes"]
+            if job.meta.get("request"):
+                # Remember what this draft was written from for the "similar drafts" check
+                petition_type, facts = job.meta["request"]
+                near_dups.add(
+                    REQUEST, f"version:{st.session_state.draft_version}", facts, petition_type,
+                    datetime.now().strftime("%Y-%m-%d %H:%M")
+                )
+        st.toast(
+            f"{job.label} ready via {job.tank}: first words in {job.timings['ttft']}s, "
+            f"complete in {job.timings['total']}s"
+        )
 
 # ---------------------------------------------------
 # QUERY TYPE DETECTION (NEW)
@@ -223,8 +534,8 @@ def detect_query_type(text):
     if re.search(r"\bair\s+\d{4}", q):
         return "citation"
 
-    # SCC citation detection
-    if re.search(r"\(\d{4}\)\s*\d+\s*scc", q):
+    # Reported citation detection (SCC, KHC, KLT, Ker LJ, ...)
+    if extract_citations(text):
         return "citation"
 
     # Case number detection (WP(C) 1234/2022)
@@ -235,7 +546,7 @@ def detect_query_type(text):
 
 
 
-def generate_search_keywords(dtype, facts):
+def generate_search_keywords(dtype, facts, force=False):
 
     query_type = detect_query_type(facts)
 
@@ -284,7 +595,8 @@ Petition Type: {dtype}
 Facts: {facts}
 """
 
-    result, _, _ = smart_rotate_draft(strict_prompt, facts, st.session_state.selected_model)
+    stats = {"facts_tokens": estimate_tokens(facts)}
+    result, _, _ = smart_rotate_draft(strict_prompt, stats, st.session_state.selected_model, force=force)
 
     if result:
         lines = [l.strip("- ").strip() for l in result.split("\n") if l.strip()]
@@ -363,6 +675,11 @@ st.session_state.facts_input = st.text_area(
     height=150
 )
 
+force_fresh = st.checkbox(
+    "♻️ Force regenerate",
+    help="Skip cached AI answers for identical requests and call the model again."
+)
+
 # ---------------------------------------------------
 # 8A. LITIGATION RESEARCH MODULE (PROFESSIONAL)
 # ---------------------------------------------------
@@ -399,15 +716,66 @@ def generate_google_link(base_site, keywords, period):
 
     return f"https://www.google.com/search?q={quote_plus(query)}"
 
-if st.button("🧠 Generate Official Search Links"):
+RESEARCH_YEARS = {"Last 3 Years": 3, "Last 5 Years": 5}
+
+def search_judgments(phrase, court, period):
+    key = (phrase, court, period)
+    if key not in st.session_state.judgment_hits:
+        years = RESEARCH_YEARS.get(period)
+        start = time.perf_counter()
+        st.session_state.judgment_hits[key] = judgments.search(
+            phrase,
+            courts=None if court == "Both" else [court],
+            year_from=datetime.now().year - years + 1 if years else None,
+            limit=5,
+        )
+        metrics.observe("judgment_search", time.perf_counter() - start)
+    return st.session_state.judgment_hits[key]
+
+def add_judgment(key):
+    ref = judgments.reference(key)
+    if ref:
+        add_reference(ref["title"], ref["citation"], ref["extract"])
+
+corpus_ready = judgments.stats()["paragraphs"] > 0
+
+if st.button("🧠 Search Judgments" if corpus_ready else "🧠 Generate Official Search Links"):
     if st.session_state.facts_input.strip():
-        keywords = generate_search_keywords(dtype, st.session_state.facts_input)
+        keywords = generate_search_keywords(dtype, st.session_state.facts_input, force=force_fresh)
         st.session_state.search_keywords = keywords
+        st.session_state.judgment_hits = {}
     else:
         st.warning("Enter facts first.")
 
-if st.session_state.search_keywords:
+if st.session_state.search_keywords and corpus_ready:
+    st.markdown("### 🔎 Matching Judgments")
+
+    for phrase in st.session_state.search_keywords:
+
+        st.markdown(f"**Search Phrase:** {phrase}")
+        hits = search_judgments(phrase, st.session_state.research_court, st.session_state.research_period)
+        if not hits:
+            st.caption("No judgments in the corpus match this phrase for the chosen court and period.")
+
+        for hit in hits:
+            h1, h2 = st.columns([6, 1])
+            with h1:
+                st.markdown(
+                    f"**{hit['title']}** {hit['citation']} · {hit['court']}, {hit['year'] or 'year unknown'} · "
+                    f"para {hit['n']} of {hit['paragraphs']}\n\n> {hit['snippet']}"
+                )
+            with h2:
+                st.button("➕ Add", key=f"judgment_{phrase}_{hit['key']}", on_click=add_judgment, args=(hit["key"],))
+
+        st.markdown("---")
+
+elif st.session_state.search_keywords:
+    # No corpus ingested on this server yet: fall back to web search links
     st.markdown("### 🔎 Official Search Links")
+    st.caption(
+        "The offline judgment corpus is empty. Index judgment dumps with "
+        "`python -m vakildraft.judgments ingest <folder> --court \"Kerala High Court\"` to search them here."
+    )
 
     for phrase in st.session_state.search_keywords:
 
@@ -444,17 +812,13 @@ if st.button("➕ Add to Draft References"):
     if not case_title.strip() or not extract.strip():
         st.warning("Case Title and Extract are mandatory.")
     else:
-        st.session_state.selected_references.append({
-            "title": case_title.strip(),
-            "citation": citation.strip(),
-            "extract": extract.strip()
-        })
+        add_reference(case_title.strip(), citation.strip(), extract.strip())
         st.success("Judgment added.")
 
 if st.session_state.selected_references:
     st.markdown("### 📚 Added References")
 
-    for i, ref in enumerate(st.session_state.selected_references):
+    for i, ref in enumerate(references()):
         with st.expander(ref["title"]):
             st.write(f"**Citation:** {ref['citation']}")
             st.write(ref["extract"][:500] + "...")
@@ -465,66 +829,69 @@ if st.session_state.selected_references:
 # ---------------------------------------------------
 # 9. ACTION BUTTONS
 # ---------------------------------------------------
-b1, b2, b3 = st.columns(3)
+# Drafts that finished in the background since the last run land here
+collect_finished_drafts()
 
-with b1:
-    if st.button("🚀 Draft Standard", type="primary", use_container_width=True):
+quota_wait = key_pool().expected_wait()
+if quota_wait >= 1:
+    st.caption(f"⏳ The API keys are at their quota: a new draft would start in about {round(quota_wait)}s.")
 
-        references_text = ""
-        if st.session_state.selected_references:
-            references_text = "\nVerified Judgments:\n"
-            for ref in st.session_state.selected_references:
-                references_text += f"""
-Case: {ref['title']}
-Citation: {ref['citation']}
-Extract:
-{ref['extract']}
-"""
-
-        prompt = f"""
-Draft {dtype} for {court} at {target_dist}.
-
-Facts:
-{st.session_state.facts_input}
-
-IMPORTANT:
-Use ONLY the verified judgment extracts below.
-Do NOT create or assume any case law.
-If no verified extract is provided, do not cite case law.
-
-{references_text}
-
-STRICT RULES:
-- STRICTLY use PARTY A and PARTY B
-"""
+b1, b2, b3 = st.columns(3)
 
-        with st.spinner("AI Drafting..."):
-            res, tank, sec = smart_rotate_draft(prompt, st.session_state.facts_input, st.session_state.selected_model)
+def current_case(petition_type):
+    return {
+        "dtype": petition_type, "court": court, "district": target_dist,
+        "facts": st.session_state.facts_input, "references": references(),
+    }
+
+def queue_standard_draft(petition_type):
+    with metrics.span("prompt"):
+        prompt, prompt_stats = build_standard_prompt(
+            petition_type, court, target_dist, st.session_state.facts_input, references(),
+            reference_budget=PROMPT_CONFIG["reference_budget"]
+        )
+    submit_draft_job(
+        f"{petition_type} (≈{prompt_stats['tokens']} tokens)", prompt, prompt_stats,
+        f"{petition_type} ({datetime.now().strftime('%H:%M')})", force=force_fresh,
+        section_hashes=input_hashes(current_case(petition_type)),
+        request=(petition_type, st.session_state.facts_input)
+    )
 
-            if res:
-                st.session_state.final_master = res
-                st.session_state.draft_history.insert(
-                    0,
-                    {"label": f"{dtype} ({datetime.now().strftime('%H:%M')})", "content": res}
-                )
-                st.toast(f"Draft generated in {sec}s")
+with b1:
+    if st.button("🚀 Draft Standard", type="primary", use_container_width=True):
+        # Near-identical facts drafted before: offer that draft before paying for a new one
+        similar = [] if force_fresh else near_dups.similar(st.session_state.facts_input, REQUEST, dtype)
+        if similar:
+            st.session_state.similar_drafts = {"dtype": dtype, "facts": st.session_state.facts_input, "hits": similar}
+        else:
+            queue_standard_draft(dtype)
 
 with b2:
-    selected_ref = st.selectbox("Mirror Reference", ["None"] + os.listdir(VAULT_PATH))
+    mirror_options = ["None"] + vault.list()
+    if st.session_state.get("history_dna"):
+        mirror_options.insert(1, st.session_state.history_dna["label"])
+    selected_ref = st.selectbox("Mirror Reference", mirror_options)
     if st.button("✨ Mirror Style", use_container_width=True, disabled=(selected_ref == "None")):
-        doc = Document(os.path.join(VAULT_PATH, selected_ref))
-        dna = "\n".join([p.text for p in doc.paragraphs[:15]])
-        prompt = f"Style DNA:\n{dna}\n\nDraft {dtype} for {court} at {target_dist}. Use PARTY A/B."
-        with st.spinner("Mirroring..."):
-            res, tank, sec = smart_rotate_draft(prompt, st.session_state.facts_input, st.session_state.selected_model)
-            if res:
-                st.session_state.final_master = res
+        if st.session_state.get("history_dna") and selected_ref == st.session_state.history_dna["label"]:
+            lines = [l for l in (blobs.get(st.session_state.history_dna["blob"]) or "").split("\n") if l.strip()]
+            dna = "\n".join(lines[:15])
+        else:
+            dna = vault.dna(selected_ref)
+        with metrics.span("prompt"):
+            prompt, prompt_stats = build_mirror_prompt(
+                dtype, court, target_dist, dna, dna_budget=PROMPT_CONFIG["dna_budget"]
+            )
+        submit_draft_job(
+            f"{dtype} - Mirror (≈{prompt_stats['tokens']} tokens)", prompt, prompt_stats,
+            f"{dtype} - Mirror ({datetime.now().strftime('%H:%M')})", force=force_fresh
+        )
 
 with b3:
     if st.button("🗑️ Reset All", use_container_width=True):
         # 1. Log the logout before clearing state
         if "current_sid" in st.session_state:
             log_store.add_logout(st.session_state.current_sid)
+        session_memory.forget(st.session_state.memory_sid)
             
         preserved_auth = st.session_state.get("authenticated", False)
         preserved_role = st.session_state.get("user_role", "user")
@@ -534,6 +901,95 @@ with b3:
         st.session_state.user_role = preserved_role
         st.rerun()
 
+similar_drafts = st.session_state.get("similar_drafts")
+if similar_drafts and (similar_drafts["dtype"], similar_drafts["facts"]) == (dtype, st.session_state.facts_input):
+    with st.container(border=True):
+        st.warning(
+            f"🔎 {len(similar_drafts['hits'])} {dtype} draft(s) already exist for near-identical facts. "
+            "Reuse one instead of drafting again?"
+        )
+        for hit in similar_drafts["hits"]:
+            source = "your drafts" if hit["ref"].startswith("version:") else "past drafts"
+            st.button(
+                f"📝 Use the {hit['date']} draft ({round(hit['similarity'] * 100)}% similar, {source})",
+                key=f"similar_{hit['ref']}", on_click=use_similar_draft, args=(hit["ref"],)
+            )
+        if st.button("🚀 Draft Anyway"):
+            st.session_state.similar_drafts = None
+            queue_standard_draft(dtype)
+
+# Changed facts or references only redraft the sections written from them
+if st.session_state.master_blob:
+    case = current_case(dtype)
+    stale = changed_sections(st.session_state.section_hashes, case)
+    # Mirror drafts, past drafts and reused drafts have no headings to splice sections into
+    sectioned = is_sectioned(st.session_state.get("main_editor") or master_text())
+    s1, s2 = st.columns(2)
+    with s1:
+        if st.button(
+            f"🧩 Redraft Changed Sections ({len(stale)})", disabled=not (stale and sectioned),
+            use_container_width=True,
+        ):
+            submit_section_job(case, stale, force=force_fresh)
+    with s2:
+        if st.button("⚖️ Regenerate Grounds Only", disabled=not sectioned, use_container_width=True):
+            # Unchanged inputs would only hit the cache: asking again means a fresh take
+            submit_section_job(case, ["grounds"], force=force_fresh or "grounds" not in stale)
+    if not sectioned:
+        st.caption("This draft has no section headings, so it can only be redrafted in full (Draft Standard).")
+    elif stale:
+        st.caption("Changed since this draft: " + ", ".join(HEADINGS[name].title() for name in stale))
+
+
+# ---------------------------------------------------
+# 9A. DRAFTING JOBS
+# ---------------------------------------------------
+with st.expander("📚 Queue drafts for several petition types"):
+    batch_types = st.multiselect(
+        "Petition types", COURT_DATA.get(court, DIST_SESSIONS_COURT["Civil"] + DIST_SESSIONS_COURT["Criminal"])
+    )
+    if st.button("Queue Selected", disabled=not batch_types):
+        for petition_type in batch_types:
+            queue_standard_draft(petition_type)
+
+my_jobs_active = any(j.status in ACTIVE for j in job_queue.for_user(st.session_state.user_role))
+
+@st.fragment(run_every=1 if my_jobs_active else None)
+def drafting_jobs_panel():
+    jobs = job_queue.for_user(st.session_state.user_role)[:8]
+    active = [j for j in jobs if j.status in ACTIVE]
+    if any(j.status == "done" and not j.collected for j in jobs) or (my_jobs_active and not active):
+        # Pull finished drafts into the editor (full rerun) and stop polling
+        st.rerun()
+    if not jobs:
+        return
+
+    st.markdown("#### 🧵 Drafting Jobs")
+    for job in jobs:
+        j1, j2 = st.columns([5, 1])
+        with j1:
+            if job.status == "queued":
+                st.write(f"⏳ **{job.label}** — queued (#{job_queue.position(job.id) + 1} in your queue)")
+            elif job.status == "running" and not job.partial:
+                quota_wait = key_pool().expected_wait(job.meta.get("prompt_tokens", 0))
+                waiting = f" (waiting for API quota, ~{round(quota_wait)}s)" if quota_wait >= 1 else ""
+                st.write(f"✍️ **{job.label}** — drafting… {job.elapsed()}s{waiting}")
+            elif job.status == "running":
+                st.write(f"✍️ **{job.label}** — drafting… {job.elapsed()}s")
+            elif job.status == "done":
+                st.write(f"✅ **{job.label}** — done in {job.elapsed()}s")
+            elif job.status == "failed":
+                st.write(f"❌ **{job.label}** — {job.error}")
+            else:
+                st.write(f"🚫 **{job.label}** — cancelled")
+        with j2:
+            if job.status in ACTIVE:
+                st.button("Cancel", key=f"cancel_{job.id}", on_click=job_queue.cancel, args=(job.id,))
+        if job.status == "running" and job.partial:
+            with st.container(height=300):
+                st.markdown(job.partial + " ▌")
+
+drafting_jobs_panel()
 
 # ---------------------------------------------------
 # 10. STYLE VAULT
@@ -541,58 +997,179 @@ with b3:
 with st.expander("📁 Style Vault Upload"):
     uploaded = st.file_uploader("Upload Reference (.docx)", type="docx")
     if uploaded:
-        with open(os.path.join(VAULT_PATH, uploaded.name), "wb") as f:
-            f.write(uploaded.getbuffer())
+        # Re-saving the same bytes on later reruns is a no-op; new files get their DNA extracted here
+        vault.save(uploaded.name, uploaded.getvalue())
         st.success("Uploaded successfully.")
 
+# ---------------------------------------------------
+# 10A. PAST DRAFTS SEARCH
+# ---------------------------------------------------
+def use_past_dna(doc_id, label):
+    text = history_index.get(doc_id)
+    if text:
+        st.session_state.history_dna = {"label": label, "blob": keep_blob(text)}
+
+with st.expander("🗂️ Past Drafts Search"):
+    history_index.refresh()
+    near_dups.refresh(history_index)
+    h_query = st.text_input("Search past drafts", key="hist_query", placeholder="Leave empty to search by the case facts")
+    hc1, hc2 = st.columns(2)
+    with hc1:
+        h_types = st.multiselect("Type", history_index.types(), key="hist_types")
+    with hc2:
+        h_range = st.date_input("Date range", value=(), key="hist_range")
+    h_from = h_range[0] if len(h_range) > 0 else None
+    h_to = h_range[1] if len(h_range) > 1 else h_from
+
+    query = h_query.strip() or st.session_state.facts_input
+    # Over-fetch, then keep the best hit of each near-duplicate cluster
+    found = history_index.search(query, h_types, h_from, h_to, limit=20) if query.strip() else []
+    clusters = near_dups.clusters_of([f"history:{hit['id']}" for hit in found])
+    hits, seen = [], set()
+    for hit in found:
+        cluster = clusters.get(f"history:{hit['id']}")
+        group = cluster if cluster is not None else f"history:{hit['id']}"
+        if group not in seen and len(hits) < 5:
+            seen.add(group)
+            hit["copies"] = near_dups.copies(cluster) if cluster is not None else 1
+            hits.append(hit)
+    if query.strip() and not hits:
+        st.write("No matching past drafts.")
+
+    for hit in hits:
+        hidden = f" · +{hit['copies'] - 1} near-identical" if hit["copies"] > 1 else ""
+        st.markdown(f"**{hit['type']}** · {hit['date']} · relevance {hit['score']}{hidden}")
+        st.markdown(hit["snippet"])
+        u1, u2 = st.columns(2)
+        with u1:
+            st.button("📝 Use as Draft", key=f"hist_use_{hit['id']}", on_click=use_past_draft, args=(hit["id"],))
+        with u2:
+            st.button(
+                "🎨 Use as Style DNA", key=f"hist_dna_{hit['id']}", on_click=use_past_dna,
+                args=(hit["id"], f"📜 Past draft: {hit['type']} ({hit['date'][:10]})")
+            )
+        st.markdown("---")
+
 # ---------------------------------------------------
 # 11. DRAFT HISTORY
 # ---------------------------------------------------
+# Editor changes from the last run are kept as versions too (small deltas on the version they started from)
+capture_edits()
+
 with st.expander("📜 Draft History (Last 10)"):
-    for i, item in enumerate(st.session_state.draft_history[:10]):
-        if st.button(item["label"], key=f"h_{i}"):
-            st.session_state.final_master = item["content"]
-            st.rerun()
+    versions = draft_store.history(st.session_state.user_role, limit=10)
+    for item in versions:
+        stamp = datetime.fromtimestamp(item["created"]).strftime("%d %b %H:%M")
+        current = " · current" if item["id"] == st.session_state.draft_version else ""
+        st.button(
+            f"{item['label']} — {stamp}{current}", key=f"h_{item['id']}",
+            on_click=restore_version, args=(item["id"],)
+        )
+
+    if len(versions) > 1:
+        names = {v["id"]: f"v{v['id']} {v['label']}" for v in versions}
+        dc1, dc2 = st.columns(2)
+        with dc1:
+            diff_old = st.selectbox("Compare", list(names), index=1, format_func=names.get, key="diff_old")
+        with dc2:
+            diff_new = st.selectbox("With", list(names), index=0, format_func=names.get, key="diff_new")
+        if diff_old != diff_new:
+            diff_text = draft_store.diff(diff_old, diff_new)
+            diff_lines = diff_text.splitlines()
+            st.code("\n".join(diff_lines[:400]) or "No differences.", language="diff")
+            if len(diff_lines) > 400:
+                st.caption(f"Showing 400 of {len(diff_lines)} diff lines.")
+
+    store_stats = draft_store.stats(st.session_state.user_role)
+    if store_stats["versions"]:
+        st.caption(
+            f"{store_stats['versions']} versions kept · {store_stats['text_mb']} MB of text "
+            f"stored as {store_stats['stored_mb']} MB"
+        )
 
 # ---------------------------------------------------
 # 12. EDITOR & DOWNLOAD
 # ---------------------------------------------------
-if st.session_state.final_master:
+if st.session_state.master_blob:
 
     st.divider()
 
-    col_a, col_b, col_c = st.columns(3)
-
-    with col_a:
-        p_a = st.text_input("Petitioner Name:", key="pet_name")
-        st.button("Map 'PARTY A'", on_click=perform_replacement, args=("PARTY A", p_a), use_container_width=True)
-
-    with col_b:
-        p_b = st.text_input("Respondent Name:", key="res_name")
-        st.button("Map 'PARTY B'", on_click=perform_replacement, args=("PARTY B", p_b), use_container_width=True)
-
-    with col_c:
-        f_old = st.text_input("Find:", key="f_txt")
-        f_new = st.text_input("Replace:", key="r_txt")
-        st.button("Replace All", on_click=perform_replacement, args=(f_old, f_new), use_container_width=True)
-
-    st.text_area("Live Editor", value=st.session_state.final_master, height=500, key="main_editor")
-
-    d1, d2 = st.columns(2)
-
-    with d1:
-        doc_gen = Document()
-        doc_gen.add_paragraph(st.session_state.final_master)
-        bio = io.BytesIO()
-        doc_gen.save(bio)
-        st.download_button("📥 MS Word", data=bio.getvalue(), file_name=f"{dtype}.docx")
-
-    with d2:
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=11)
-        pdf.multi_cell(0, 10, st.session_state.final_master.encode('latin-1','replace').decode('latin-1'))
-        st.download_button("📥 PDF", data=pdf.output(dest='S').encode('latin-1'), file_name=f"{dtype}.pdf")
+    # Placeholders still in the draft are listed for filling; extra find/replace rows can be added below them
+    unmapped = find_placeholders(st.session_state.get("main_editor") or master_text())
+    with st.expander(f"🔁 Map Placeholders ({len(unmapped)} unmapped)", expanded=bool(unmapped)):
+        mapping_rows = st.data_editor(
+            [{"Placeholder": ph, "Value": "", "Found": n} for ph, n in unmapped.items()]
+            or [{"Placeholder": "", "Value": "", "Found": 0}],
+            num_rows="dynamic",
+            column_config={"Found": st.column_config.NumberColumn(disabled=True)},
+            use_container_width=True,
+            key=f"mapping_{st.session_state.draft_version}",
+        )
+        mapping = {r["Placeholder"]: r["Value"] for r in mapping_rows if r.get("Placeholder") and r.get("Value")}
+        m1, m2, m3, m4 = st.columns(4)
+        with m1:
+            map_whole = st.checkbox("Whole words only", value=True, key="map_whole")
+        with m2:
+            map_case = st.checkbox("Ignore case", key="map_case")
+        with m3:
+            st.button(
+                "✅ Apply All", on_click=apply_mapping, args=(mapping, map_whole, map_case),
+                disabled=not mapping, use_container_width=True
+            )
+        with m4:
+            st.button(
+                f"↩️ Undo ({len(st.session_state.undo_stack)})", on_click=undo_mapping,
+                disabled=not st.session_state.undo_stack, use_container_width=True
+            )
+        if st.session_state.get("mapping_counts"):
+            st.caption("Replaced: " + ", ".join(f"{k} ×{n}" for k, n in st.session_state.mapping_counts.items()))
+
+    editor_text = st.text_area("Live Editor", value=master_text(), height=500, key="main_editor")
+
+    # Every draft is checked against the verified references on each render (a few ms)
+    verified, unverified = verify_citations(editor_text, references())
+    if unverified:
+        flagged = sorted({c.normalized for c in unverified})
+        st.warning(
+            f"⚠️ {len(unverified)} citation(s) not backed by an added verified judgment: " + "; ".join(flagged)
+        )
+        st.button("🚩 Flag Unverified Citations in Draft", on_click=flag_citations_inline)
+    elif verified:
+        st.success(f"✅ All {len(verified)} citation(s) match your verified judgments.")
+
+    # Files are rendered only on request, off the script thread, and memoized by draft hash
+    export_text = master_text()
+    export_formats = [("docx", "📥 MS Word"), ("pdf", "📥 PDF")]
+
+    if not exporter.malayalam and has_malayalam(export_text):
+        st.warning(
+            "No Malayalam font is installed on this server, so Malayalam text will be blank in the PDF "
+            "(the Word file is fine). Ask the admin to install Noto Sans Malayalam or set [EXPORT] font_path."
+        )
+
+    if st.button("📦 Prepare Downloads"):
+        for fmt, _ in export_formats:
+            exporter.submit(export_text, fmt)
+
+    export_jobs = {fmt: exporter.peek(export_text, fmt) for fmt, _ in export_formats}
+    rendering = any(job is not None and not job.done() for job in export_jobs.values())
+
+    @st.fragment(run_every=1 if rendering else None)
+    def download_row():
+        d1, d2 = st.columns(2)
+        for col, (fmt, label) in zip((d1, d2), export_formats):
+            job = exporter.peek(export_text, fmt)
+            with col:
+                if job is None:
+                    continue
+                if not job.done():
+                    st.caption(f"Rendering {fmt.upper()}...")
+                elif job.exception() is not None:
+                    st.error(f"{fmt.upper()} export failed: {job.exception()}")
+                else:
+                    st.download_button(label, data=job.result(), file_name=f"{dtype}.{fmt}", on_click="ignore")
+
+    download_row()
 
 
 # ---------------------------------------------------
@@ -601,14 +1178,113 @@ if st.session_state.final_master:
 if st.session_state.get("user_role") == "admin":
     st.divider()
     with st.expander("🛡️ Admin: Access Logs"):
-        df = log_store.get_df()
-        if not df.empty:
-            st.info(f"System Online Since: {log_store.start_time}")
-            # Show newest first, hide the session_id
-            st.dataframe(df.drop(columns=["session_id"]).iloc[::-1], use_container_width=True)
-            
-            # Download for your Mac
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button("📥 Download Logs (CSV)", data=csv, file_name="vakildraft_access_logs.csv")
+        cache_stats = response_cache.stats()
+        st.caption(
+            f"AI response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['disk_items']} stored ({cache_stats['disk_mb']} MB)"
+        )
+        st.info(f"System Online Since: {log_store.start_time}")
+
+        # Filtering and paging happen in SQLite; only the visible page is loaded
+        store = log_store.store
+        f1, f2, f3 = st.columns([2, 1, 1])
+        with f1:
+            log_user = st.selectbox("User", ["All"] + store.users(), key="log_user")
+        with f2:
+            log_year = st.selectbox("Year", ["All"] + store.years(), key="log_year")
+        log_user = None if log_user == "All" else log_user
+        log_year = None if log_year == "All" else log_year
+
+        page_size = 50
+        total = store.count(log_user, log_year)
+        pages = max(1, -(-total // page_size))
+        with f3:
+            log_page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="log_page")
+
+        rows = store.query(log_user, log_year, page=log_page - 1, page_size=page_size)
+        if rows:
+            # Newest first; session_id stays out of the table
+            st.dataframe(rows, use_container_width=True)
+            st.caption(f"{total} log entries · page {log_page} of {pages}")
+
+            # Download for your Mac (built only when clicked)
+            st.download_button(
+                "📥 Download Logs (CSV)",
+                data=lambda: store.to_csv(log_user, log_year),
+                file_name="vakildraft_access_logs.csv",
+                on_click="ignore",
+            )
         else:
             st.write("No logs yet.")
+
+        # Rolling latency percentiles for this process (all users)
+        st.markdown("#### ⏱️ Performance")
+        perf_rows = metrics.rows()
+        if perf_rows:
+            st.dataframe(perf_rows, use_container_width=True)
+            st.caption(
+                f"Last {metrics.window} samples per stage / model / key / outcome. "
+                "key_attempt rows are single tries on one API key; model_call is the whole draft."
+            )
+            st.download_button(
+                "📥 Download Timings (CSV)",
+                data=metrics.to_csv,
+                file_name="vakildraft_timings.csv",
+                on_click="ignore",
+            )
+            st.dataframe(key_pool().snapshot(), use_container_width=True)
+        else:
+            st.write("No timings yet.")
+
+        # Shown whether or not any call has been timed yet, so an outage on a fresh process is visible
+        cc = context_cache.stats()
+        st.caption(
+            f"Context cache: {cc['handles']} live prefixes · {cc['hits']} hits · {cc['created']} created · "
+            f"{cc['renewed']} renewed · {cc['evicted']} evicted · "
+            f"≈{cc['cached_tokens']} input tokens not re-sent"
+        )
+        ss = storage.stats()
+        st.caption(
+            f"Shared storage ({ss['backend']}): {ss['hits']} cached reads / {ss['misses']} backend reads · "
+            f"{ss['writes']} writes in {ss['write_calls']} calls · {ss['queued']} queued · "
+            f"{ss['remote_changes']} changes from other replicas · {ss['failures']} failed backend writes · "
+            f"{ss['journaled']} waiting in the journal · {ss['replayed']} replayed"
+        )
+        if ss["journaled"]:
+            st.warning(f"Shared storage is unreachable: {ss['journaled']} writes are held in the local journal.")
+
+        # Per-session footprint in this process, and manual eviction
+        st.markdown("#### 🧠 Session Memory")
+        sessions = session_memory.usage()
+        bs = blobs.stats()
+        rss = process_rss()
+        st.caption(
+            (f"Process RSS {rss / 2 ** 20:.0f} MB · " if rss else "")
+            + f"{len(sessions)} sessions · blob store: {bs['blobs']} blobs, {bs['memory_bytes'] / 2 ** 20:.2f} MB "
+            f"in memory, {bs['disk_bytes'] / 2 ** 20:.2f} MB spilled to disk ({bs['spilled']} spills, "
+            f"{bs['loaded']} reads back)"
+        )
+        if sessions:
+            st.dataframe(sessions, use_container_width=True)
+            m1, m2 = st.columns(2)
+            with m1:
+                evict_sid = st.selectbox(
+                    "Session", [r["session"] for r in sessions], key="evict_sid",
+                    format_func=lambda sid: next(
+                        f"{r['user']} · {sid[:8]} · {r['state_kb'] + r['blobs_memory_kb']:.0f} KB"
+                        for r in sessions if r["session"] == sid
+                    ),
+                )
+                st.button("🧹 Evict Session", on_click=session_memory.evict, args=(evict_sid,))
+            with m2:
+                idle_minutes = st.number_input("Idle for (minutes)", min_value=1, value=15, key="evict_idle")
+                if st.button("🧹 Evict Idle Sessions"):
+                    st.toast(f"Evicted {session_memory.evict_idle(idle_minutes * 60)} session(s).")
+
+# Record this session's footprint and release blobs its state no longer refers to
+live_blobs = [st.session_state.master_blob] + [ref["blob"] for ref in st.session_state.selected_references]
+if st.session_state.get("history_dna"):
+    live_blobs.append(st.session_state.history_dna["blob"])
+session_memory.measure(st.session_state.memory_sid, st.session_state.to_dict(), live_blobs)
+
+metrics.observe("rerun", time.perf_counter() - RERUN_START)
@@ -0,0 +1,323 @@
+"""End-to-end benchmark of 1cloudapp.py with no network.
+
+Drives the app through Streamlit's AppTest harness with the fake Gemini and
+Supabase clients from bench/fakes.py, so the numbers are the app's own
+overhead plus a fixed, known model latency. Reports cold start, full-script
+rerun time, search keyword latency, DOCX/PDF export time, key rotation
+under injected failures and memory growth across draft cycles.
+
+Run from the repo root:  python bench/bench_app.py [--cycles 100] [--json out.json]
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fakes import Profile, install  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from vakildraft.clients import ClientRegistry  # noqa: E402
+from vakildraft.drafting import generate  # noqa: E402
+from vakildraft.export import find_font, render_docx, render_pdf  # noqa: E402
+from vakildraft.keypool import KeyPool  # noqa: E402
+
+APP = os.path.join(ROOT, "1cloudapp.py")
+API_KEYS = [["dead", "dead-key"], ["p1", "good-1"], ["p2", "good-2"]]
+
+
+# ---------------------------------------------------
+# HELPERS
+# ---------------------------------------------------
+def ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50_ms": ms(statistics.median(ordered)),
+        "p95_ms": ms(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]),
+        "max_ms": ms(ordered[-1]),
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def rss_mb():
+    # ru_maxrss is KiB on Linux: a high-water mark, so it only ever grows
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def make_workdir(history_rows):
+    """A throwaway cwd with a synthetic past-draft CSV, so runs never touch the real data."""
+    workdir = tempfile.mkdtemp(prefix="vakildraft-bench-")
+    with open(os.path.join(workdir, "kerala_legal_history.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Type", "Draft"])
+        for i in range(history_rows):
+            writer.writerow([
+                f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:00:00",
+                ("Bail App", "Crl.MC", "WP(C)")[i % 3],
+                f"Draft {i}: petition under section {i % 500} seeking bail, parity with co-accused, "
+                "custody period and conditions. " * 5,
+            ])
+    os.chdir(workdir)
+    return workdir
+
+
+def new_app():
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.secrets["passwords"] = {"admin": "pw"}
+    at.secrets["API_KEYS"] = API_KEYS
+    at.secrets["KEY_POOL"] = {"hedge_delay": 1.0}
+    return at
+
+
+def login(at):
+    at.text_input[0].input("admin")
+    at.text_input[1].input("pw")
+    at.button[0].click()
+    at.run()
+
+
+def button(at, label):
+    return next(b for b in at.button if label in b.label)
+
+
+def facts_box(at):
+    return next(t for t in at.text_area if t.label == "Case Facts:")
+
+
+def wait_for(at, done, timeout=30.0, poll=0.02):
+    """Rerun until done(at) holds, like the polling fragments would."""
+    deadline = time.time() + timeout
+    while not done(at):
+        if time.time() > deadline:
+            raise TimeoutError("app did not reach the expected state")
+        time.sleep(poll)
+        at.run()
+
+
+def check(at):
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+
+# ---------------------------------------------------
+# SCENARIOS
+# ---------------------------------------------------
+def bench_cold_start():
+    at = new_app()
+    first = timed(at.run)
+    check(at)
+    after_login = timed(lambda: login(at))
+    check(at)
+    warm = new_app()
+    warm_first = timed(warm.run)
+    return at, {
+        "cold_login_page_ms": ms(first),
+        "cold_login_ms": ms(after_login),
+        "warm_login_page_ms": ms(warm_first),
+    }
+
+
+def bench_reruns(at, n):
+    samples = [timed(at.run) for _ in range(n)]
+    check(at)
+    return summarize(samples)
+
+
+def bench_keywords(at):
+    facts_box(at).input("Petitioner arrested in a cheating case; co-accused already granted bail.")
+    at.run()
+    miss = timed(lambda: (button(at, "Generate Official").click(), at.run()))
+    check(at)
+    hit = timed(lambda: (button(at, "Generate Official").click(), at.run()))
+    return {
+        "miss_ms": ms(miss),
+        "cached_ms": ms(hit),
+        "phrases": len(at.session_state.search_keywords),
+    }
+
+
+def draft_once(at, facts):
+    before = at.session_state.draft_version
+    facts_box(at).input(facts)
+    at.run()
+    button(at, "Draft Standard").click()
+    at.run()
+    wait_for(at, lambda a: a.session_state.draft_version != before)
+    check(at)
+
+
+def bench_export(at):
+    at.text_area(key="main_editor").input(at.session_state.main_editor)
+    at.run()
+
+    def rendered(a):
+        labels = {b.label for b in a.get("download_button")}
+        return {"📥 MS Word", "📥 PDF"} <= labels
+
+    ui = timed(lambda: (button(at, "Prepare Downloads").click(), at.run(), wait_for(at, rendered)))
+    check(at)
+    text = at.session_state.main_editor
+    font = find_font()
+    return {
+        "ui_until_buttons_ms": ms(ui),
+        "render_docx_ms": ms(timed(lambda: render_docx(text))),
+        "render_pdf_ms": ms(timed(lambda: render_pdf(text, font))),
+        "draft_chars": len(text),
+    }
+
+
+def bench_rotation(calls, latency):
+    """Many concurrent drafts over a pool with dead, throttled, flaky and slow keys."""
+    profiles = {
+        "good": Profile(latency=latency),
+        "slow": Profile(latency=latency * 4),
+        "flaky": Profile(latency=latency, fail_rate=0.3),
+        "throttled": Profile(latency=latency, rate_limit_rate=0.5),
+        "dead": Profile(latency=latency, dead=True),
+    }
+    gemini = install(profiles)
+    pool = KeyPool([(k, k) for k in profiles], hedge_delay=latency * 3, cooldown=2.0, breaker_reset=5.0)
+    clients = ClientRegistry()
+
+    def one(i):
+        start = time.perf_counter()
+        text, tank, _ = generate(pool, clients, None, "gemini-2.5-flash", f"case {i}")
+        return time.perf_counter() - start, tank.split(" ")[0] if text else None
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(one, range(calls)))
+
+    winners = {}
+    for _, name in results:
+        winners[name] = winners.get(name, 0) + 1
+    return {
+        "calls": calls,
+        "succeeded": calls - winners.pop(None, 0),
+        "latency": summarize([r[0] for r in results]),
+        "keys": {
+            key: {"attempts": gemini.calls.get(key, 0), "errors": gemini.errors.get(key, 0), "won": winners.get(key, 0)}
+            for key in profiles
+        },
+        "pool": pool.snapshot(),
+    }
+
+
+def cycle_facts(i):
+    # Distinct facts so every cycle misses the response cache
+    return f"Cycle {i}: bail sought after {i + 30} days in custody."
+
+
+def bench_cycles(at, n):
+    """Type facts, queue a draft and rerun until it lands in the session."""
+    return summarize([timed(lambda: draft_once(at, cycle_facts(-i - 1))) for i in range(n)])
+
+
+def bench_memory(at, cycles):
+    # Timed separately (bench_cycles): tracemalloc slows every allocation
+    tracemalloc.start()
+    samples = []
+    for i in range(cycles):
+        draft_once(at, cycle_facts(i))
+        if i == 0 or (i + 1) % 10 == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            samples.append((i + 1, round(current / 2 ** 20, 2)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    first, last = samples[0][1], samples[-1][1]
+    return {
+        "cycles": cycles,
+        "traced_mb": dict(samples),
+        "growth_mb": round(last - first, 2),
+        "growth_kb_per_cycle": round((last - first) * 1024 / max(1, cycles - 1), 1),
+        "traced_peak_mb": round(peak / 2 ** 20, 2),
+        "rss_high_water_mb": rss_mb(),
+    }
+
+
+# ---------------------------------------------------
+# REPORT
+# ---------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of 1cloudapp.py")
+    parser.add_argument("--cycles", type=int, default=100, help="draft cycles for the memory run")
+    parser.add_argument("--reruns", type=int, default=30, help="full-script reruns to time")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency in seconds")
+    parser.add_argument("--history-rows", type=int, default=2000, help="rows in the synthetic history CSV")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Keep per-rerun deprecation and bare-mode warnings out of the report
+    for name in ("streamlit.deprecation_util", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+        logging.getLogger(name).disabled = True
+    json_path = os.path.abspath(args.json) if args.json else None
+    cwd = os.getcwd()
+    workdir = make_workdir(args.history_rows)
+    results = {}
+    try:
+        install(
+            {"dead-key": Profile(dead=True, latency=args.latency)},
+            default=Profile(latency=args.latency),
+        )
+        at, results["cold_start"] = bench_cold_start()
+        results["rerun_idle"] = bench_reruns(at, args.reruns)
+        results["keywords"] = bench_keywords(at)
+        draft_once(at, "Petitioner arrested in a cheating case; co-accused already granted bail.")
+        results["export"] = bench_export(at)
+        results["rerun_with_draft"] = bench_reruns(at, args.reruns)
+        results["draft_cycle"] = bench_cycles(at, 10)
+        results["memory"] = bench_memory(at, args.cycles)
+        results["rotation"] = bench_rotation(200, args.latency)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    cold, kw, export, mem, rot = (
+        results["cold_start"], results["keywords"], results["export"], results["memory"], results["rotation"]
+    )
+    print(f"fake model latency: {ms(args.latency)} ms · history rows: {args.history_rows}")
+    print(f"cold start        : login page {cold['cold_login_page_ms']} ms, login {cold['cold_login_ms']} ms "
+          f"(warm login page {cold['warm_login_page_ms']} ms)")
+    for name in ("rerun_idle", "rerun_with_draft"):
+        r = results[name]
+        print(f"{name:<18}: p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, max {r['max_ms']} ms ({r['n']} runs)")
+    print(f"search keywords   : {kw['miss_ms']} ms uncached, {kw['cached_ms']} ms cached ({kw['phrases']} phrases)")
+    print(f"export            : {export['ui_until_buttons_ms']} ms until both download buttons "
+          f"(docx {export['render_docx_ms']} ms, pdf {export['render_pdf_ms']} ms, {export['draft_chars']:,} chars)")
+    cyc = results["draft_cycle"]
+    print(f"draft cycle       : p50 {cyc['p50_ms']} ms, p95 {cyc['p95_ms']} ms ({cyc['n']} drafts)")
+    print(f"memory            : {mem['growth_mb']} MB traced growth ({mem['growth_kb_per_cycle']} KB/cycle), "
+          f"peak {mem['traced_peak_mb']} MB, RSS high-water {mem['rss_high_water_mb']} MB over {mem['cycles']} cycles")
+    print(f"rotation          : {rot['succeeded']}/{rot['calls']} succeeded, "
+          f"p50 {rot['latency']['p50_ms']} ms, p95 {rot['latency']['p95_ms']} ms")
+    for key, k in rot["keys"].items():
+        print(f"  {key:<10} attempts {k['attempts']:>4}  errors {k['errors']:>4}  won {k['won']:>4}")
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark the citation engine on a synthetic 50-page draft.
+
+Run from the repo root:  python bench/bench_citations.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vakildraft.citations import extract_citations, flag_unverified, verify_citations  # noqa: E402
+
+CITATIONS = [
+    "(2020) 3 SCC 45", "(2019) 2 SCC (Cri) 100", "AIR 2019 SC 123", "AIR 1978 Kerala 7",
+    "2019 (3) KHC 123", "2018 KHC 456", "2017 (1) KLT 789", "2016 KLJ 12",
+    "2015 Ker. L.J. 34", "2005 Cri LJ 1234", "2004 Crl.L.J. 99",
+]
+
+FILLER = (
+    "The petitioner most respectfully submits that the impugned order is arbitrary, illegal "
+    "and in violation of the principles of natural justice, and that the respondent failed to "
+    "consider the materials placed on record before passing the same on 12.03.2021. "
+)
+
+
+def build_draft(pages=50, words_per_page=500, citations_per_page=3, seed=7):
+    rng = random.Random(seed)
+    words = FILLER.split()
+    out = []
+    for page in range(pages):
+        body = [words[i % len(words)] for i in range(words_per_page)]
+        for _ in range(citations_per_page):
+            body.insert(rng.randrange(len(body)), rng.choice(CITATIONS))
+        out.append(f"{page + 1}. " + " ".join(body))
+    return "\n\n".join(out)
+
+
+def timeit(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    draft = build_draft()
+    refs = [{"title": "Ref", "citation": c, "extract": ""} for c in CITATIONS[::2]]
+    found = extract_citations(draft)
+    verified, unverified = verify_citations(draft, refs)
+
+    print(f"draft: {len(draft):,} chars, {len(draft.split()):,} words, {len(found)} citations")
+    print(f"extract_citations : {timeit(lambda: extract_citations(draft)):7.2f} ms")
+    print(f"verify_citations  : {timeit(lambda: verify_citations(draft, refs)):7.2f} ms "
+          f"({len(verified)} verified / {len(unverified)} unverified)")
+    print(f"flag_unverified   : {timeit(lambda: flag_unverified(draft, unverified)):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
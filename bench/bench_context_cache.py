@@ -0,0 +1,110 @@
+"""Context cache benchmark: repeat drafts against one large reference pack.
+
+An advocate drafts a series of petitions for different clients against the
+same set of verified judgments. Every Draft Standard prompt then starts
+with the same reference pack. The same series runs twice against fake keys
+(bench/fakes.py) whose time to first token grows with the input tokens
+they read: once sending the whole prompt every time, once through
+vakildraft.context_cache, which registers the pack once per key and sends
+only the facts after that. A last run with a TTL of a couple of seconds
+checks renewal, eviction and recovery from a cache deleted on the server.
+
+Run from the repo root:  python bench/bench_context_cache.py [--drafts 12] [--refs 40]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fakes import FILLER, Profile, install  # noqa: E402
+
+from vakildraft.clients import ClientRegistry  # noqa: E402
+from vakildraft.context_cache import ContextCache  # noqa: E402
+from vakildraft.drafting import generate_stream  # noqa: E402
+from vakildraft.keypool import KeyPool  # noqa: E402
+from vakildraft.prompting import build_standard_prompt  # noqa: E402
+
+KEYS = ("k1", "k2")
+MODEL = "gemini-2.5-pro"
+
+
+def reference_pack(n, seed=3):
+    rng = random.Random(seed)
+    words = sorted(set(FILLER.split()))
+    return [
+        {
+            "title": f"Party A{i} v. State",
+            "citation": f"({2000 + i % 24}) {i % 12 + 1} SCC {100 + i}",
+            # Distinct extracts, so deduplication keeps the whole pack
+            "extract": " ".join(rng.choice(words) for _ in range(150)) + ".",
+        }
+        for i in range(n)
+    ]
+
+
+def run_series(cached, drafts, refs, ttl=3600.0, renew_before=300.0, sleep=0.0, max_handles=64, drop_after=None):
+    gemini = install(default=Profile(latency=0.05, input_latency=0.2, cached_input_latency=0.02, words=400))
+    pool = KeyPool([(k, k) for k in KEYS], timeout=30.0)
+    clients = ClientRegistry()
+    context_cache = None
+    if cached:
+        context_cache = ContextCache(clients, ttl=ttl, renew_before=renew_before, max_handles=max_handles)
+    pack = reference_pack(refs)
+    ttfts, prompt_tokens = [], 0
+    for i in range(drafts):
+        if drop_after is not None and i == drop_after:
+            gemini.caches.clear()   # deleted on the server behind our back
+        facts = f"Client {i} was arrested on {i % 28 + 1} March in a cheating case and seeks regular bail."
+        prompt, stats = build_standard_prompt("Bail Application", "Sessions Court", "Pune", facts, pack, 20000)
+        prompt_tokens = stats["tokens"]
+        text, _, timings = generate_stream(
+            pool, clients, None, MODEL, prompt, lambda partial: None,
+            prefix=prompt[:stats["prefix_chars"]], context_cache=context_cache,
+        )
+        if text is None:
+            raise RuntimeError(f"draft {i} failed")
+        ttfts.append(timings["ttft"])
+        time.sleep(sleep)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "ttft_p50": statistics.median(ttfts),
+        "ttft_first": ttfts[0],
+        "sent": sum(gemini.input_tokens.values()),
+        "from_cache": sum(gemini.cached_tokens.values()),
+        "server_caches": len(gemini.caches),
+        "stats": context_cache.stats() if context_cache else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Context cache benchmark against fake keys")
+    parser.add_argument("--drafts", type=int, default=12, help="drafts in the series")
+    parser.add_argument("--refs", type=int, default=40, help="judgment extracts in the shared reference pack")
+    args = parser.parse_args()
+
+    plain = run_series(False, args.drafts, args.refs)
+    print(f"{args.drafts} Draft Standard prompts of ≈{plain['prompt_tokens']} tokens sharing {args.refs} extracts, "
+          f"{len(KEYS)} keys\n")
+    cached = run_series(True, args.drafts, args.refs)
+    for label, r in (("whole prompt every time", plain), ("context cache", cached)):
+        print(f"{label}:")
+        print(f"  time to first chunk p50 {r['ttft_p50']}s (first draft {r['ttft_first']}s)")
+        print(f"  input tokens sent {r['sent']}, read from cache {r['from_cache']}")
+        if r["stats"]:
+            print(f"  {r['stats']}")
+
+    # Short TTL: handles get renewed between drafts, one handle slot forces evictions,
+    # and a cache dropped on the server falls back to the whole prompt and is recreated
+    churn = run_series(True, 8, args.refs, ttl=1.5, renew_before=1.0, sleep=0.6, max_handles=1, drop_after=4)
+    print("\nshort TTL (1.5s, renewed in its last second), 1 handle slot, server caches dropped before draft 5:")
+    print(f"  {churn['stats']} · {churn['server_caches']} caches left on the server")
+
+
+if __name__ == "__main__":
+    main()
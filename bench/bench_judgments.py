@@ -0,0 +1,119 @@
+"""Judgment corpus benchmark: search latency over a million paragraphs.
+
+Builds a synthetic corpus of Kerala High Court and Supreme Court
+judgments (legal vocabulary with a Zipf-like word distribution, so common
+terms like "bail" and "accused" have long posting lists, as in real
+judgments) across ten years, then times the research module's queries:
+the three phrases generate_search_keywords produces for a bail case,
+with no filter, one court, and the last three years.
+
+Run from the repo root:  python bench/bench_judgments.py [--paragraphs 1000000] [--keep corpus/bench]
+(building a million paragraphs takes 15-20 minutes on one core; --keep reuses a built corpus)
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vakildraft.judgments import JudgmentCorpus  # noqa: E402
+
+LEGAL = (
+    "bail accused petitioner respondent prosecution custody arrest offence investigation cheating conditions "
+    "breach anticipatory economic parity co-accused surety trial evidence witness statute section code "
+    "procedure criminal court order appeal revision writ jurisdiction hearing judgment decree injunction "
+    "property tenancy eviction lease rent possession title suit plaint limitation delay condonation "
+    "maintenance divorce custody child marriage cruelty dowry domestic violence compensation accident "
+    "insurance negligence contract breach damages arbitration award tender employer employee dismissal "
+    "pension service promotion seniority reservation land acquisition compensation municipality licence"
+).split()
+PHRASES = ("bail conditions breach", "anticipatory bail economic offence", "parity co-accused bail")
+YEARS = range(2017, 2027)
+COURTS = ("Kerala High Court", "Supreme Court")
+
+
+def vocabulary(rng, size=20000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = list(LEGAL)
+    while len(words) < size:
+        words.append("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return words
+
+
+def build(corpus, paragraphs, per_judgment=20, words_per_paragraph=70, seed=11):
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    # Zipf-like weights: the legal words (listed first) are the common ones
+    weights = [1.0 / (rank + 8) for rank in range(len(words))]
+    judgments = paragraphs // per_judgment
+    start = time.time()
+    for j in range(judgments):
+        court = COURTS[j % len(COURTS)]
+        year = YEARS[j % len(YEARS)]
+        body = "\n\n".join(
+            " ".join(rng.choices(words, weights, k=words_per_paragraph)).capitalize() + "."
+            for _ in range(per_judgment)
+        )
+        corpus.add(body, title=f"Petitioner {j} v. State of Kerala", citation=f"{year}:KER:{j}", court=court, year=year,
+                   source="synthetic")
+        if j and j % 5000 == 0:
+            print(f"  {j * per_judgment} paragraphs ({time.time() - start:.0f}s)", flush=True)
+    corpus.finish()
+    return time.time() - start
+
+
+def timed(corpus, phrase, **filters):
+    start = time.time()
+    hits = corpus.search(phrase, limit=10, **filters)
+    return time.time() - start, len(hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Judgment corpus search benchmark")
+    parser.add_argument("--paragraphs", type=int, default=1_000_000, help="paragraphs in the synthetic corpus")
+    parser.add_argument("--keep", help="build into (or reuse) this folder instead of a temporary one")
+    parser.add_argument("--repeat", type=int, default=5, help="warm runs per query")
+    args = parser.parse_args()
+
+    path = args.keep or tempfile.mkdtemp(prefix="judgments-")
+    try:
+        corpus = JudgmentCorpus(path)
+        if corpus.stats()["paragraphs"] < args.paragraphs:
+            print(f"building {args.paragraphs} paragraphs in {path}")
+            print(f"built in {build(corpus, args.paragraphs):.0f}s")
+        stats = corpus.stats()
+        size = sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(path) for f in fs)
+        print(f"{stats['paragraphs']} paragraphs, {stats['judgments']} judgments in {stats['shards']} shards, "
+              f"{size / 2 ** 20:.0f} MB on disk\n")
+
+        this_year = max(YEARS)
+        cases = (
+            ("all courts, all years", {}),
+            ("Kerala High Court", {"courts": ["Kerala High Court"]}),
+            ("both courts, last 3 years", {"courts": list(COURTS), "year_from": this_year - 2}),
+        )
+        for label, filters in cases:
+            cold, warm, found = [], [], []
+            for phrase in PHRASES:
+                seconds, n = timed(corpus, phrase, **filters)
+                cold.append(seconds)
+                for _ in range(args.repeat):
+                    warm.append(timed(corpus, phrase, **filters)[0])
+                found.append(n)
+            print(f"{label:28}: first run {max(cold) * 1000:.0f} ms max · warm p50 "
+                  f"{statistics.median(warm) * 1000:.0f} ms, max {max(warm) * 1000:.0f} ms · hits {found}")
+        hit = corpus.search(PHRASES[0], limit=1)[0]
+        print(f"\ntop hit: {hit['title']} ({hit['citation']}) para {hit['n']}: {hit['snippet'][:160]}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
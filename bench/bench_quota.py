@@ -0,0 +1,110 @@
+"""Quota scheduler benchmark: sustained throughput and fairness under 429s.
+
+Several advocates draft at once against fake keys that enforce a real
+per-window request and token quota (bench/fakes.py). One "heavy" user
+keeps many drafts in flight; the others draft one at a time. The same load
+runs twice: once with the pool only reacting to 429s (cooldown and
+failover, a failed draft is retried at once by its user), once with the
+per-key token buckets from vakildraft.quota. The quota window is shortened
+to a few seconds so a run takes seconds, not minutes; throughput is
+reported per window.
+
+Run from the repo root:  python bench/bench_quota.py [--seconds 12] [--window 2]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fakes import Profile, install  # noqa: E402
+
+from vakildraft.clients import ClientRegistry  # noqa: E402
+from vakildraft.drafting import generate  # noqa: E402
+from vakildraft.keypool import KeyPool  # noqa: E402
+
+KEYS = ("k1", "k2", "k3")
+
+
+def run_load(scheduled, seconds, window, rpm, tpm, latency, heavy_threads, light_users):
+    gemini = install(default=Profile(latency=latency, rpm=rpm, tpm=tpm, window=window, words=600))
+    limits = {"rpm": rpm, "tpm": tpm, "period": window} if scheduled else {}
+    pool = KeyPool([(k, k) for k in KEYS], cooldown=window, timeout=30.0, **limits)
+    clients = ClientRegistry()
+    users = {"heavy": heavy_threads}
+    users.update({f"light{i}": 1 for i in range(light_users)})
+    stop_at = time.time() + seconds
+    done = {user: [] for user in users}
+    failed = {user: 0 for user in users}
+    lock = threading.Lock()
+    counter = iter(range(10 ** 9))
+
+    def worker(user):
+        while time.time() < stop_at:
+            with lock:
+                i = next(counter)
+            start = time.time()
+            text, _, _ = generate(pool, clients, None, "gemini-2.5-flash", f"{user} case {i}", user=user)
+            with lock:
+                if text:
+                    done[user].append(time.time() - start)
+                else:
+                    failed[user] += 1
+
+    start = time.time()
+    threads = [threading.Thread(target=worker, args=(user,)) for user, n in users.items() for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+
+    per_user = {user: len(times) for user, times in done.items()}
+    light = [t for user, times in done.items() if user != "heavy" for t in times]
+    drafted = sum(per_user.values())
+    return {
+        "drafted": drafted,
+        "failed": sum(failed.values()),
+        "per_window": round(drafted / (elapsed / window), 2),
+        "rate_limited": sum(gemini.throttled.values()),
+        "attempts": sum(gemini.calls.values()),
+        "per_user": per_user,
+        # Fairness across users, not threads: one-at-a-time users should not wait behind the heavy one
+        "light_p50_s": round(statistics.median(light), 2) if light else None,
+        "light_max_s": round(max(light), 2) if light else None,
+        "heavy_p50_s": round(statistics.median(done["heavy"]), 2) if done["heavy"] else None,
+        "elapsed_s": round(elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quota scheduler benchmark against rate-limited fake keys")
+    parser.add_argument("--seconds", type=float, default=12.0, help="how long users keep submitting drafts")
+    parser.add_argument("--window", type=float, default=2.0, help="quota window in seconds (Gemini: 60)")
+    parser.add_argument("--rpm", type=int, default=4, help="requests per window on each key")
+    parser.add_argument("--tpm", type=int, default=6000, help="tokens per window on each key")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency in seconds")
+    parser.add_argument("--heavy-threads", type=int, default=8, help="drafts the heavy user keeps in flight")
+    parser.add_argument("--light-users", type=int, default=4, help="users drafting one at a time")
+    args = parser.parse_args()
+
+    print(f"{len(KEYS)} keys · {args.rpm} requests and {args.tpm} tokens per {args.window}s window each · "
+          f"1 heavy user x{args.heavy_threads} + {args.light_users} light users · {args.seconds}s of load")
+    for label, scheduled in (("429 failover only", False), ("token buckets", True)):
+        r = run_load(scheduled, args.seconds, args.window, args.rpm, args.tpm, args.latency,
+                     args.heavy_threads, args.light_users)
+        print(f"\n{label}:")
+        print(f"  drafted {r['drafted']}, failed {r['failed']} · {r['per_window']} drafts per window "
+              f"· {r['rate_limited']} 429s in {r['attempts']} attempts")
+        print(f"  per user {r['per_user']}")
+        print(f"  draft time: light users p50 {r['light_p50_s']}s, max {r['light_max_s']}s · "
+              f"heavy user p50 {r['heavy_p50_s']}s · run took {r['elapsed_s']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Session memory benchmark: per-session state with and without the blob store.
+
+Simulates a server with many advocates logged in at once. Each session
+has a long draft it has edited in the Live Editor (so the saved version
+and the editor text differ), a handful of judgment extracts picked from a
+shared pool (the same leading judgments get added by many advocates), and
+a past draft used as Style DNA. Memory is measured with tracemalloc:
+
+- before: session state holds the texts themselves (final_master, the
+  editor copy, full reference extracts, DNA text), one copy per session;
+- after: session state holds the editor text and sha256 handles; the
+  other texts live once in the BlobStore under a memory_mb budget, and
+  sessions idle past idle_spill have their blobs on disk.
+
+Run from the repo root:  python bench/bench_session_memory.py [--sessions 60] [--memory-mb 4]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vakildraft.session_memory import BlobStore, SessionMemory, footprint  # noqa: E402
+
+WORDS = (
+    "petitioner respondent hon'ble court bail accused custody investigation prayed submitted section "
+    "code criminal procedure facts grounds relief interim order kerala ernakulam district sessions"
+).split()
+
+
+def text(rng, words):
+    # Built fresh each time, as texts arriving from the browser or the model are
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def pools(rng, extracts=40, past_drafts=20):
+    return ([text(rng, 900) for _ in range(extracts)], [text(rng, 6000) for _ in range(past_drafts)])
+
+
+def session(rng, extracts, past_drafts):
+    draft = text(rng, 8000)
+    return {
+        "draft": draft,
+        "edited": draft.replace("submitted", "respectfully submitted", 3),
+        "references": [
+            {"title": f"Judgment {i}", "citation": f"2024:KER:{i}", "extract": "".join(list(extracts[i]))}
+            for i in rng.sample(range(len(extracts)), 5)
+        ],
+        "dna": "".join(list(rng.choice(past_drafts))),
+    }
+
+
+def before(sessions):
+    return [{
+        "final_master": s["draft"], "main_editor": s["edited"], "selected_references": s["references"],
+        "history_dna": {"label": "Past draft", "text": s["dna"]},
+    } for s in sessions]
+
+
+def after(sessions, memory):
+    states = []
+    for sid, s in enumerate(sessions):
+        sid = str(sid)
+        memory.touch(sid, f"user{sid}")
+        state = {
+            "master_blob": memory.store.put(sid, s["draft"]),
+            "main_editor": s["edited"],
+            "selected_references": [
+                {"title": r["title"], "citation": r["citation"], "blob": memory.store.put(sid, r["extract"])}
+                for r in s["references"]
+            ],
+            "history_dna": {"label": "Past draft", "blob": memory.store.put(sid, s["dna"])},
+        }
+        live = [state["master_blob"], state["history_dna"]["blob"]]
+        memory.measure(sid, state, live + [r["blob"] for r in state["selected_references"]])
+        states.append(state)
+    return states
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session memory benchmark")
+    parser.add_argument("--sessions", type=int, default=60, help="concurrent advocate sessions")
+    parser.add_argument("--memory-mb", type=float, default=4, help="blob store memory budget")
+    parser.add_argument("--idle", type=float, default=0.5, help="share of sessions that have gone idle")
+    args = parser.parse_args()
+    rng = random.Random(5)
+    extracts, past_drafts = pools(rng)
+
+    def sessions():
+        local = random.Random(9)
+        return [session(local, extracts, past_drafts) for _ in range(args.sessions)]
+
+    # Before: session state keeps every text it was given
+    tracemalloc.start()
+    old_states = before(sessions())
+    old_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del old_states
+
+    with tempfile.TemporaryDirectory() as workdir:
+        memory = SessionMemory(BlobStore(os.path.join(workdir, "blobs.sqlite"), memory_mb=args.memory_mb))
+        tracemalloc.start()
+        raw = sessions()
+        states = after(raw, memory)
+        del raw   # texts not kept by the store (duplicates, spilled blobs) are freed
+        idle = int(args.sessions * args.idle)
+        for sid in range(idle):
+            memory.evict(str(sid))
+        new_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        state_bytes = sum(footprint(s) for s in states)
+        store = memory.store.stats()
+        start = time.perf_counter()
+        for sid in range(idle):
+            memory.store.get(states[sid]["master_blob"])
+        read_back = (time.perf_counter() - start) / max(idle, 1)
+
+    print(f"{args.sessions} sessions ({idle} idle), each a {len(states[0]['main_editor']) // 1024} KB draft, "
+          "5 judgment extracts and a Style DNA past draft")
+    print(f"before: {old_bytes / 2 ** 20:.1f} MB ({old_bytes / args.sessions / 1024:.0f} KB per session)")
+    print(f"after:  {new_bytes / 2 ** 20:.1f} MB ({new_bytes / args.sessions / 1024:.0f} KB per session): "
+          f"session state {state_bytes / 2 ** 20:.1f} MB + blob store {store['memory_bytes'] / 2 ** 20:.1f} MB "
+          f"in memory (budget {args.memory_mb:g} MB), {store['disk_bytes'] / 2 ** 20:.1f} MB on disk, "
+          f"{store['blobs']} blobs")
+    print(f"reading an evicted session's draft back from disk: {read_back * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
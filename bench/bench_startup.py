@@ -0,0 +1,98 @@
+"""Cold-start report for 1cloudapp.py.
+
+Renders the login page in a fresh interpreter (through AppTest, with no
+secrets and no network), reports how long that took, and lists which
+heavy SDKs were already imported by then. A second pass under
+``python -X importtime`` breaks the import cost down per top-level
+package.
+
+Run from the repo root:  python bench/bench_startup.py [--top 15]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "1cloudapp.py")
+
+# Loaded on first real use: genai on the first draft, docx/fpdf on the first export,
+# pandas for the admin tables, supabase when storage is touched
+HEAVY = ("google.genai", "httpx", "supabase", "docx", "fpdf", "pandas", "pyarrow")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+harness = time.perf_counter()
+preloaded = [m for m in %(heavy)r if m in sys.modules]
+at = AppTest.from_file(%(app)r, default_timeout=120)
+at.run()
+done = time.perf_counter()
+print(json.dumps({
+    "harness_s": harness - start,
+    "login_page_s": done - harness,
+    "exception": [e.value for e in at.exception],
+    "loaded": [m for m in %(heavy)r if m in sys.modules and m not in preloaded],
+    "preloaded": preloaded,
+}))
+"""
+
+
+def make_workdir(workdir):
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write('[passwords]\nadmin = "pw"\n')
+
+
+def probe(workdir):
+    code = PROBE % {"app": APP, "heavy": HEAVY}
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=workdir, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def import_breakdown(workdir):
+    """Cumulative self time per top-level package while rendering the login page."""
+    code = PROBE % {"app": APP, "heavy": HEAVY}
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=workdir, capture_output=True, text=True, check=True
+    ).stderr
+    totals = {}
+    for line in err.splitlines():
+        # "import time:      self [us] |    cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        top = name.split(".")[0]
+        totals[top] = totals.get(top, 0) + int(self_us)
+    return sorted(totals.items(), key=lambda kv: -kv[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start report for 1cloudapp.py")
+    parser.add_argument("--top", type=int, default=15, help="packages to list in the import breakdown")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="vakildraft-startup-") as workdir:
+        make_workdir(workdir)
+        result = probe(workdir)
+        breakdown = import_breakdown(workdir)
+
+    if result["exception"]:
+        print("login page raised:", result["exception"][0])
+    print(f"AppTest harness import : {result['harness_s'] * 1000:8.1f} ms")
+    print(f"cold login page render : {result['login_page_s'] * 1000:8.1f} ms")
+    print(f"heavy SDKs loaded      : {', '.join(result['loaded']) or 'none'}"
+          f" (already loaded by the harness: {', '.join(result['preloaded']) or 'none'})")
+    total = sum(us for _, us in breakdown)
+    print(f"\nimport time by package (self time, {total / 1000:.0f} ms total):")
+    for name, us in breakdown[: args.top]:
+        print(f"  {name:<24} {us / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
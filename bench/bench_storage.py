@@ -0,0 +1,158 @@
+"""Shared storage benchmark: two replicas on one backend.
+
+Two Storage instances stand in for two app replicas behind a load balancer
+(each has its own cache, writer and watcher, exactly as two processes
+would). The benchmark runs on the local SQLite backend and on the fake
+Supabase project from bench/fakes.py, and measures:
+
+- batching: backend write calls for a burst of logins and logouts;
+- read-through caching: backend requests for the admin log view over
+  repeated reruns, with and without changes in between;
+- change notifications: how long until replica B sees a vault upload and
+  a new draft version made on replica A.
+
+Run from the repo root:  python bench/bench_storage.py [--logins 300] [--watch 0.2]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fakes import FakeSupabase, install  # noqa: E402
+
+from vakildraft.clients import ClientRegistry  # noqa: E402
+from vakildraft.draft_store import DraftStore  # noqa: E402
+from vakildraft.log_store import AccessLogStore  # noqa: E402
+from vakildraft.storage import open_storage  # noqa: E402
+from vakildraft.style_vault import StyleVault  # noqa: E402
+
+
+def reference_docx(title):
+    from docx import Document
+
+    doc = Document()
+    doc.add_paragraph(title.upper())
+    for i in range(1, 6):
+        doc.add_paragraph(f"{i}. It is respectfully submitted that the petitioner is entitled to relief.")
+    doc.add_paragraph("PRAYER")
+    doc.add_paragraph("It is therefore most respectfully prayed that this Hon'ble Court may be pleased to allow.")
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def until(check, timeout=10.0):
+    start = time.time()
+    while not check():
+        if time.time() - start > timeout:
+            return None
+        time.sleep(0.005)
+    return time.time() - start
+
+
+def replicas(backend, workdir, watch):
+    if backend == "local":
+        config = {
+            "path": os.path.join(workdir, "shared.sqlite"),
+            "files": {
+                "access_logs": os.path.join(workdir, "access_logs.sqlite"),
+                "versions": os.path.join(workdir, "drafts.sqlite"),
+            },
+            "buckets": {"vault": os.path.join(workdir, "vault")},
+        }
+    else:
+        config = {"backend": "supabase", "url": "https://fake.supabase.co", "key": "fake"}
+    clients = ClientRegistry()
+    return [open_storage(clients, watch_interval=watch, flush_interval=0.05, **config) for _ in range(2)]
+
+
+def requests_counter(backend, storages):
+    if backend == "supabase":
+        return lambda: FakeSupabase.db.requests
+    # SQLite has no request log: count backend reads and write calls from Storage's own counters
+    return lambda: sum(s.misses + s.batches for s in storages)
+
+
+def admin_view(logs):
+    logs.users()
+    logs.years()
+    logs.count()
+    logs.query(page=0)
+
+
+def run(backend, logins, watch, reruns):
+    install()
+    with tempfile.TemporaryDirectory() as workdir:
+        a, b = replicas(backend, workdir, watch)
+        requests = requests_counter(backend, (a, b))
+        logs_a, logs_b = AccessLogStore(a), AccessLogStore(b)
+
+        # Batched writes: every login followed by its logout, as fast as sessions arrive
+        before = a.batches
+        for i in range(logins):
+            logs_a.login(f"s{i}", f"USER{i % 7}", "2026-01-01 10:00 AM", 2026)
+            logs_a.logout(f"s{i}", "2026-01-01 11:00 AM")
+        logs_a.flush(30)
+        write_calls = a.batches - before
+
+        # Read-through caching: the admin page reruns; nothing changes, then one login elsewhere
+        admin_view(logs_b)
+        start = requests()
+        for _ in range(reruns):
+            admin_view(logs_b)
+        idle = requests() - start
+        logs_a.login("late", "USER0", "2026-01-01 12:00 PM", 2026)
+        logs_a.flush()
+        seen_login = until(lambda: logs_b.count() == logins + 1)
+
+        # Change notifications: a vault upload and a new draft version on replica A
+        vault_a, vault_b = StyleVault(a), StyleVault(b)
+        drafts_a, drafts_b = DraftStore(a), DraftStore(b)
+        vault_b.list()
+        drafts_b.history("USER0")
+        vault_a.save("bail_reference.docx", reference_docx("Bail application"))
+        seen_upload = until(lambda: "bail_reference.docx" in vault_b.list())
+        dna_ok = "PRAYER" in vault_b.dna("bail_reference.docx")
+        version = drafts_a.add("USER0", "CAUSE TITLE\n\nPARTY A v. PARTY B\n", "Draft 10:00")
+        seen_draft = until(lambda: any(v["id"] == version for v in drafts_b.history("USER0")))
+        text_ok = drafts_b.get(version) == "CAUSE TITLE\n\nPARTY A v. PARTY B\n"
+        return {
+            "writes": logins * 2,
+            "write_calls": write_calls,
+            "idle_requests": idle,
+            "seen_login_s": seen_login,
+            "seen_upload_s": seen_upload,
+            "seen_draft_s": seen_draft,
+            "consistent": dna_ok and text_ok,
+            "stats_b": b.stats(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared storage benchmark: two replicas on one backend")
+    parser.add_argument("--logins", type=int, default=300, help="sessions logged in and out on replica A")
+    parser.add_argument("--watch", type=float, default=0.2, help="change feed poll interval in seconds")
+    parser.add_argument("--reruns", type=int, default=50, help="admin log view reruns on replica B")
+    args = parser.parse_args()
+
+    def ms(seconds):
+        return "never" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+    for backend in ("local", "supabase"):
+        r = run(backend, args.logins, args.watch, args.reruns)
+        print(f"\n{backend} backend:")
+        print(f"  {r['writes']} log writes on A in {r['write_calls']} backend calls")
+        print(f"  {args.reruns} admin view reruns on B with nothing new: {r['idle_requests']} backend requests")
+        print(f"  B sees A's changes (watch interval {args.watch}s): login {ms(r['seen_login_s'])} · "
+              f"vault upload {ms(r['seen_upload_s'])} · draft version {ms(r['seen_draft_s'])}")
+        print(f"  B reads the same DNA and draft text: {r['consistent']} · B {r['stats_b']}")
+
+
+if __name__ == "__main__":
+    main()
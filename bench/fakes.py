@@ -0,0 +1,441 @@
+"""Offline stand-ins for Gemini and Supabase used by the benchmarks.
+
+install() patches google.genai.Client and supabase.create_client (which
+vakildraft.clients imports on first use), so neither the app nor the library code opens a socket.
+Each API key gets a Profile that controls its latency, failures and 429s,
+including a real per-minute request/token quota like Gemini's free tier
+and the context caches API (client.caches), whose cached prefix is read
+faster than fresh input when input_latency is set:
+
+    gemini = install({"dead": Profile(dead=True), "busy": Profile(rate_limit_rate=0.5), "free": Profile(rpm=10)})
+    ...
+    gemini.calls   # {"dead": 3, "busy": 41, ...}
+"""
+import random
+import threading
+import time
+import zlib
+from collections import deque
+
+import supabase
+from google import genai
+from google.genai import errors
+
+from vakildraft.sections import HEADINGS
+from vakildraft.text import estimate_tokens
+
+FILLER = (
+    "It is most respectfully submitted that PARTY A is entitled to the relief sought, since PARTY B "
+    "acted without authority and in disregard of the statutory procedure, as held in (2020) 3 SCC 45. "
+)
+
+
+class Profile:
+    def __init__(
+        self, latency=0.05, jitter=0.0, fail_rate=0.0, rate_limit_rate=0.0, dead=False, words=1500, chunks=20,
+        rpm=None, tpm=None, window=60.0, input_latency=0.0, cached_input_latency=0.0,
+    ):
+        self.latency = latency                  # seconds before the answer (or first chunk)
+        self.jitter = jitter                    # +/- uniform noise on latency
+        self.fail_rate = fail_rate              # share of calls that raise a 500
+        self.rate_limit_rate = rate_limit_rate  # share of calls that raise a 429
+        self.dead = dead                        # every call fails with an invalid-key error
+        self.words = words                      # length of a draft answer
+        self.chunks = chunks                    # stream pieces per draft
+        self.rpm = rpm                          # requests allowed per window, else a 429
+        self.tpm = tpm                          # prompt + answer tokens allowed per window
+        self.window = window                    # quota window in seconds (shorten for benchmarks)
+        self.input_latency = input_latency      # extra seconds per 1k fresh input tokens
+        self.cached_input_latency = cached_input_latency   # ... per 1k tokens read from a context cache
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+def api_error(code, status, message):
+    return errors.APIError(code, {"error": {"code": code, "status": status, "message": message}})
+
+
+class FakeGemini:
+    """Shared state behind every fake client: key profiles and call counters."""
+
+    def __init__(self, profiles=None, default=None, seed=7):
+        self.profiles = dict(profiles or {})
+        self.default = default or Profile()
+        self.calls = {}
+        self.errors = {}
+        self.throttled = {}        # 429s from the quota, per key
+        self._usage = {}           # key -> deque of (start time, tokens) inside the quota window
+        self.input_tokens = {}     # prompt tokens sent, per key
+        self.cached_tokens = {}    # prompt tokens read from a context cache, per key
+        self.caches = {}           # cache name -> {"key", "model", "prefix", "expires"}
+        self._cache_ids = iter(range(1, 10 ** 9))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def profile(self, key):
+        return self.profiles.get(key, self.default)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+            self.throttled.clear()
+            self._usage.clear()
+            self.input_tokens.clear()
+            self.cached_tokens.clear()
+            self.caches.clear()
+
+    def _over_quota(self, key, profile, tokens, now):
+        """Charge the call to the key's window; True if it does not fit (caller holds the lock)."""
+        if profile.rpm is None and profile.tpm is None:
+            return False
+        usage = self._usage.setdefault(key, deque())
+        while usage and now - usage[0][0] >= profile.window:
+            usage.popleft()
+        if profile.rpm is not None and len(usage) >= profile.rpm:
+            return True
+        if profile.tpm is not None and sum(t for _, t in usage) + tokens > profile.tpm:
+            return True
+        usage.append((now, tokens))
+        return False
+
+    def _begin(self, key, tokens=0, fresh=0, cached=0):
+        """Count the call, sleep for its latency and raise any injected failure.
+
+        fresh and cached are the input tokens sent with the call and read from
+        a context cache; they only add latency and feed the counters.
+        """
+        profile = self.profile(key)
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+            if self._over_quota(key, profile, tokens, time.time()):
+                self.throttled[key] = self.throttled.get(key, 0) + 1
+                self.errors[key] = self.errors.get(key, 0) + 1
+                raise api_error(429, "RESOURCE_EXHAUSTED", "Quota exceeded for quota metric 'Generate Content'.")
+            self.input_tokens[key] = self.input_tokens.get(key, 0) + fresh
+            self.cached_tokens[key] = self.cached_tokens.get(key, 0) + cached
+            roll = self._rng.random()
+            noise = self._rng.uniform(-profile.jitter, profile.jitter)
+        reading = (fresh * profile.input_latency + cached * profile.cached_input_latency) / 1000
+        time.sleep(max(0.0, profile.latency + reading + noise))
+        failure = None
+        if profile.dead:
+            failure = api_error(400, "INVALID_ARGUMENT", "API key not valid. Please pass a valid API key.")
+        elif roll < profile.rate_limit_rate:
+            failure = api_error(429, "RESOURCE_EXHAUSTED", "Quota exceeded for this project.")
+        elif roll < profile.rate_limit_rate + profile.fail_rate:
+            failure = api_error(500, "INTERNAL", "An internal error has occurred.")
+        if failure is not None:
+            with self._lock:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            raise failure
+        return profile
+
+    @staticmethod
+    def answer(model, contents, profile):
+        if contents.lstrip().startswith("Generate exactly 3"):
+            return "bail conditions breach\nanticipatory bail economic offence\nparity co-accused bail"
+        words = FILLER.split()
+        # Tag each answer with its prompt so different cases never produce identical drafts
+        tag = f"DRAFT ({model}) #{zlib.crc32(contents.encode('utf-8')):08x}"
+        if "Write ONLY the" in contents:
+            # One section of a sectioned petition: a fifth of a full draft
+            return tag + "\n\n" + " ".join(words[i % len(words)] for i in range(profile.words // 5))
+        if "section headings" in contents:
+            share = profile.words // len(HEADINGS)
+            parts = [tag] + [
+                f"{heading}\n\n" + " ".join(words[i % len(words)] for i in range(share)) for heading in HEADINGS.values()
+            ]
+            return "\n\n".join(parts)
+        body = " ".join(words[i % len(words)] for i in range(profile.words))
+        return f"{tag}\n\n{body}"
+
+
+class _Models:
+    def __init__(self, gemini, key):
+        self._gemini = gemini
+        self._key = key
+
+    def _call(self, model, contents, config):
+        prefix = ""
+        cache_name = getattr(config, "cached_content", None)
+        if cache_name:
+            with self._gemini._lock:
+                cached = self._gemini.caches.get(cache_name)
+                if cached is not None and cached["expires"] <= time.time():
+                    del self._gemini.caches[cache_name]
+                    cached = None
+            if cached is None or cached["key"] != self._key:
+                raise api_error(404, "NOT_FOUND", f"CachedContent not found (or permission denied): {cache_name}")
+            prefix = cached["prefix"]
+        # The answer is known up front, so the quota is charged its real size
+        text = self._gemini.answer(model, prefix + contents, self._gemini.profile(self._key))
+        fresh, cached_tokens = estimate_tokens(contents), estimate_tokens(prefix) if prefix else 0
+        profile = self._gemini._begin(self._key, fresh + cached_tokens + estimate_tokens(text), fresh, cached_tokens)
+        return profile, text
+
+    def generate_content(self, model, contents, config=None):
+        return _Response(self._call(model, contents, config)[1])
+
+    def generate_content_stream(self, model, contents, config=None):
+        profile, text = self._call(model, contents, config)
+        step = max(1, len(text) // profile.chunks)
+        for i in range(0, len(text), step):
+            yield _Response(text[i:i + step])
+
+
+class _CachedContent:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Caches:
+    """client.caches: create/update/delete with a TTL, scoped to the key that created the cache."""
+
+    def __init__(self, gemini, key):
+        self._gemini = gemini
+        self._key = key
+
+    @staticmethod
+    def _seconds(ttl):
+        return float(str(ttl).rstrip("s"))
+
+    def create(self, model, config):
+        prefix = "".join(config.contents)
+        self._gemini._begin(self._key)
+        with self._gemini._lock:
+            name = f"cachedContents/{next(self._gemini._cache_ids)}"
+            self._gemini.caches[name] = {
+                "key": self._key, "model": model, "prefix": prefix, "expires": time.time() + self._seconds(config.ttl),
+            }
+        return _CachedContent(name)
+
+    def update(self, name, config):
+        with self._gemini._lock:
+            cached = self._gemini.caches.get(name)
+            if cached is None or cached["key"] != self._key or cached["expires"] <= time.time():
+                raise api_error(404, "NOT_FOUND", f"CachedContent not found (or permission denied): {name}")
+            cached["expires"] = time.time() + self._seconds(config.ttl)
+        return _CachedContent(name)
+
+    def delete(self, name):
+        with self._gemini._lock:
+            self._gemini.caches.pop(name, None)
+
+
+class FakeClient:
+    def __init__(self, gemini, api_key=None, **kwargs):
+        self.models = _Models(gemini, api_key)
+        self.caches = _Caches(gemini, api_key)
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------
+# SUPABASE
+# ---------------------------------------------------
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = len(data) if count is None else count
+
+
+_COMPARE = {
+    "eq": lambda a, b: a == b,
+    "lt": lambda a, b: a is not None and a < b,
+    "lte": lambda a, b: a is not None and a <= b,
+    "gt": lambda a, b: a is not None and a > b,
+    "gte": lambda a, b: a is not None and a >= b,
+}
+
+
+class _Query:
+    """The PostgREST builder chain: select/insert/upsert/update/delete, filters, order, range, execute."""
+
+    def __init__(self, db, table, op, payload=None, **options):
+        self._db = db
+        self._table = table
+        self._op = op
+        self._payload = payload
+        self._options = options
+        self._filters = []
+        self._order = None
+        self._range = None
+
+    def _filter(self, op, column, value):
+        self._filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n):
+        self._range = (0, n - 1)
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def _matches(self, row):
+        return all(_COMPARE[op](row.get(column), value) for op, column, value in self._filters)
+
+    def execute(self):
+        with self._db.lock:
+            self._db.requests += 1
+            rows = self._db.tables.setdefault(self._table, [])
+            payload = self._payload if isinstance(self._payload, list) else [self._payload]
+            if self._op == "insert":
+                added = []
+                for p in payload:
+                    row = dict(p)
+                    # Identity columns, as the schema in vakildraft.storage declares them
+                    for column in ("id", "seq"):
+                        if column in self._db.identity.get(self._table, ()) and row.get(column) is None:
+                            self._db.next_id += 1
+                            row[column] = self._db.next_id
+                    rows.append(row)
+                    added.append(dict(row))
+                return _Result(added)
+            if self._op == "upsert":
+                key = self._options.get("on_conflict")
+                for p in payload:
+                    existing = next((r for r in rows if key and r.get(key) == p.get(key)), None)
+                    if existing is not None:
+                        existing.update(p)
+                    else:
+                        rows.append(dict(p))
+                return _Result([dict(p) for p in payload])
+            matched = [r for r in rows if self._matches(r)]
+            if self._op == "update":
+                for r in matched:
+                    r.update(self._payload)
+                return _Result([dict(r) for r in matched])
+            if self._op == "delete":
+                self._db.tables[self._table] = [r for r in rows if not self._matches(r)]
+                return _Result([dict(r) for r in matched])
+            if self._order:
+                column, desc = self._order
+                matched.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            total = len(matched)
+            if self._range:
+                matched = matched[self._range[0]:self._range[1] + 1]
+            if self._options.get("head"):
+                return _Result([], total)
+            columns = self._options.get("columns")
+            return _Result([{c: r.get(c) for c in columns} if columns else dict(r) for r in matched], total)
+
+
+class _Table:
+    def __init__(self, db, name):
+        self._db = db
+        self._name = name
+
+    def select(self, *columns, count=None, head=False):
+        wanted = [c for col in columns for c in col.split(",") if c and c != "*"]
+        return _Query(self._db, self._name, "select", columns=wanted, head=head)
+
+    def insert(self, payload):
+        return _Query(self._db, self._name, "insert", payload)
+
+    def upsert(self, payload, on_conflict=None):
+        return _Query(self._db, self._name, "upsert", payload, on_conflict=on_conflict)
+
+    def update(self, payload):
+        return _Query(self._db, self._name, "update", payload)
+
+    def delete(self):
+        return _Query(self._db, self._name, "delete")
+
+
+class _Bucket:
+    def __init__(self, db, name):
+        self._db = db
+        self._files = db.buckets.setdefault(name, {})
+
+    def upload(self, path, file, file_options=None):
+        with self._db.lock:
+            self._db.requests += 1
+            if path in self._files and str((file_options or {}).get("upsert")).lower() != "true":
+                raise RuntimeError("The resource already exists")
+            self._files[path] = bytes(file)
+
+    def download(self, path):
+        with self._db.lock:
+            self._db.requests += 1
+            if path not in self._files:
+                raise RuntimeError("Object not found")
+            return self._files[path]
+
+    def list(self, path=None, options=None):
+        options = options or {}
+        with self._db.lock:
+            self._db.requests += 1
+            names = sorted({name.split("/", 1)[0]: "/" in name for name in self._files}.items())
+        # Folders are listed without an id, like Supabase Storage does
+        items = [{"name": name, "id": None if folder else name} for name, folder in names]
+        offset = options.get("offset", 0)
+        return items[offset:offset + options.get("limit", 100)]
+
+
+class _Storage:
+    def __init__(self, db):
+        self._db = db
+
+    def from_(self, bucket):
+        return _Bucket(self._db, bucket)
+
+
+class SupabaseDB:
+    """One in-memory Supabase project; every FakeSupabase client sees the same tables and buckets."""
+
+    def __init__(self):
+        self.tables = {}
+        self.buckets = {}
+        self.identity = {"versions": ("id",), "changes": ("seq",)}
+        self.next_id = 0
+        self.requests = 0
+        self.lock = threading.RLock()
+
+
+class FakeSupabase:
+    """Tables with the PostgREST chain and Storage buckets, backed by a shared SupabaseDB."""
+
+    db = SupabaseDB()
+
+    def __init__(self, url=None, key=None, options=None):
+        self.url = url
+        self.tables = self.db.tables
+        self.storage = _Storage(self.db)
+
+    def table(self, name):
+        return _Table(self.db, name)
+
+
+def install(profiles=None, default=None, seed=7):
+    """Route every Gemini and Supabase client through the fakes. Returns the FakeGemini."""
+    gemini = FakeGemini(profiles, default, seed)
+    genai.Client = lambda api_key=None, **kwargs: FakeClient(gemini, api_key, **kwargs)
+    FakeSupabase.db = SupabaseDB()
+    supabase.create_client = FakeSupabase
+    return gemini
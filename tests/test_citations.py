@@ -0,0 +1,40 @@
+"""Citation extraction and verification against the advocate's references.
+
+Run from the repo root:  python -m pytest -q tests
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vakildraft.citations import extract_citations, verify_citations  # noqa: E402
+
+
+def normalized(text):
+    return [c.normalized for c in extract_citations(text)]
+
+
+def test_khc_online_keeps_its_number():
+    assert normalized("relied on 2023 KHC OnLine 123 and 2023 KHC 45") == ["2023 KHC OnLine 123", "2023 KHC 45"]
+    citation = extract_citations("2023 KHC OnLine 123")[0]
+    assert citation.reporter == "KHC OnLine" and citation.page == "123"
+
+
+def test_reporter_and_year_without_a_page_is_not_a_citation():
+    assert normalized("as reported in 2019 KLT, the court held") == []
+    assert normalized("2019 KLT 45") == ["2019 KLT 45"]
+
+
+def test_a_draft_citation_without_a_page_is_not_verified():
+    references = [{"title": "A v. State", "citation": "(2020) 3 SCC 45", "extract": ""}]
+    verified, unverified = verify_citations("See (2020) 3 SCC.", references)
+    assert verified == [] and [c.normalized for c in unverified] == ["(2020) 3 SCC"]
+
+
+def test_volume_and_page_must_match_the_reference():
+    references = [{"title": "", "citation": "2019 (2) KLT 45", "extract": ""}]
+    assert verify_citations("2019 (2) KLT 45", references)[1] == []
+    assert verify_citations("2019 KLT 45", references)[1] == []   # the draft gives no volume to compare
+    assert len(verify_citations("2019 (3) KLT 45", references)[1]) == 1
+    assert len(verify_citations("2019 (2) KLT 46", references)[1]) == 1
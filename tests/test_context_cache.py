@@ -0,0 +1,52 @@
+"""Context cache handles and their counters against the fake keys in bench/fakes.py.
+
+Run from the repo root:  python -m pytest -q tests
+"""
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fakes import Profile, install  # noqa: E402
+
+from vakildraft.clients import ClientRegistry  # noqa: E402
+from vakildraft.context_cache import ContextCache  # noqa: E402
+from vakildraft.text import estimate_tokens  # noqa: E402
+
+PREFIX = "Verified extract about bail parity. " * 40
+
+
+def test_creating_a_cache_saves_no_tokens():
+    install(default=Profile(latency=0.0))
+    cache = ContextCache(ClientRegistry(), min_tokens={"flash": 10})
+
+    first = cache.handle("k1", "k1", "gemini-2.5-flash", PREFIX)
+    assert first and cache.stats()["created"] == 1
+    assert cache.stats()["cached_tokens"] == 0 and cache.stats()["hits"] == 0
+
+    assert cache.handle("k1", "k1", "gemini-2.5-flash", PREFIX) == first
+    assert cache.stats()["hits"] == 1 and cache.stats()["cached_tokens"] == estimate_tokens(PREFIX)
+
+
+def test_counters_add_up_across_concurrent_handles():
+    install(default=Profile(latency=0.0))
+    cache = ContextCache(ClientRegistry(), min_tokens={"flash": 10})
+    prefixes = [f"Reference pack {n}. " + PREFIX for n in range(8)]
+
+    def draft(prefix):
+        for _ in range(50):
+            cache.handle("k1", "k1", "gemini-2.5-flash", prefix)
+
+    threads = [threading.Thread(target=draft, args=(p,)) for p in prefixes for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = cache.stats()
+    assert stats["created"] == 8
+    assert stats["hits"] == len(threads) * 50 - 8
+    assert stats["cached_tokens"] == sum(estimate_tokens(p) * (100 - 1) for p in prefixes)
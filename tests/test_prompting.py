@@ -0,0 +1,41 @@
+"""Auto-Pilot model routing on the prompt's token breakdown.
+
+Run from the repo root:  python -m pytest -q tests
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vakildraft.prompting import build_mirror_prompt, build_standard_prompt, route_model  # noqa: E402
+
+FLASH = "gemini-2.5-flash"
+PRO = "gemini-2.5-pro"
+
+
+def standard(facts, references=()):
+    return build_standard_prompt("Bail Application", "Kerala High Court", "Ernakulam", facts, list(references))[1]
+
+
+def test_facts_follow_the_old_1200_character_rule():
+    assert route_model(standard("x" * 1100)) == FLASH
+    assert route_model(standard("x" * 1300)) == PRO
+
+
+def test_fixed_instructions_do_not_count():
+    stats = standard("Petitioner arrested in a cheating case.")
+    assert stats["tokens"] > 100
+    assert route_model(stats, pro_threshold_tokens=20, pro_context_tokens=20) == FLASH
+
+
+def test_references_and_dna_count_towards_the_context_threshold():
+    extract = {"title": "A v. State", "citation": "2023 KHC 101", "extract": "bail conditions " * 200}
+    assert route_model(standard("short facts", [extract])) == FLASH
+    assert route_model(standard("short facts", [extract]), pro_context_tokens=500) == PRO
+    dna = build_mirror_prompt("Bail Application", "Kerala High Court", "Ernakulam", "Style line.\n" * 130)[1]
+    assert 300 < dna["dna_tokens"] < 2000 and route_model(dna) == FLASH
+
+
+def test_a_chosen_model_is_used_as_is():
+    assert route_model(standard("x" * 5000), "gemini-2.5-flash") == FLASH
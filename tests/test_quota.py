@@ -0,0 +1,145 @@
+"""Quota scheduler and key pool against the quota-enforcing fake keys in bench/fakes.py.
+
+The fake keys answer 429 as soon as a window's requests or tokens run out,
+so these tests fail if the buckets ever let more through than the quota.
+Windows are shortened to under a second to keep the run quick.
+
+Run from the repo root:  python -m pytest -q tests
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fakes import Profile, install  # noqa: E402
+
+from vakildraft.clients import ClientRegistry  # noqa: E402
+from vakildraft.drafting import Cancelled, generate, generate_stream  # noqa: E402
+from vakildraft.keypool import KeyPool  # noqa: E402
+from vakildraft.quota import QuotaScheduler, TokenBucket  # noqa: E402
+
+WINDOW = 0.5
+
+
+def test_no_429s_within_rpm_and_tpm():
+    gemini = install(default=Profile(latency=0.01, rpm=3, tpm=3000, window=WINDOW, words=150))
+    pool = KeyPool(
+        [("k1", "k1"), ("k2", "k2")], rpm=3, tpm=3000, period=WINDOW, output_reserve=400,
+        cooldown=WINDOW, timeout=30.0,
+    )
+    clients = ClientRegistry()
+    texts = []
+    lock = threading.Lock()
+
+    def draft(user, n):
+        for i in range(n):
+            text, _, _ = generate(pool, clients, None, "gemini-2.5-flash", f"{user} case {i}", user=user)
+            with lock:
+                texts.append(text)
+
+    # 18 drafts over 2 keys at 3 per window: the load has to queue across several windows
+    threads = [threading.Thread(target=draft, args=(f"user{u}", 6)) for u in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(texts) == 18 and all(texts)
+    assert sum(gemini.throttled.values()) == 0
+    assert sum(gemini.calls.values()) == 18
+    assert pool.quota.waited > 0
+
+
+def test_queues_are_served_round_robin_across_users():
+    scheduler = QuotaScheduler(["k1"], rpm=1, period=0.2)
+    assert scheduler.try_take(["k1"], 0) == "k1"   # the only slot this window
+    granted = []
+    lock = threading.Lock()
+
+    def ask(user):
+        if scheduler.acquire(user, 0, lambda: ["k1"], timeout=10) == "k1":
+            with lock:
+                granted.append(user)
+
+    # The heavy user queues three calls before the light user queues one
+    threads = []
+    for user in ("heavy", "heavy", "heavy", "light"):
+        t = threading.Thread(target=ask, args=(user,))
+        t.start()
+        threads.append(t)
+        time.sleep(0.02)
+    for t in threads:
+        t.join()
+
+    assert granted == ["heavy", "light", "heavy", "heavy"]
+
+
+def test_token_bucket_refund_and_window():
+    bucket = TokenBucket(per_minute=1000, period=WINDOW)
+    now = time.time()
+    bucket.take(800, now)
+    assert bucket.level(now) == 200
+    assert bucket.wait(500, now) > 0
+    bucket.adjust(800, 0)
+    assert bucket.level(now) == 1000
+    assert bucket.wait(500, now) == 0
+    bucket.take(1000, now)
+    assert bucket.level(now + bucket.period + 0.01) == 1000
+
+
+def test_failed_call_refunds_its_reserved_tokens():
+    gemini = install(default=Profile(latency=0.01, fail_rate=1.0, tpm=5000, window=WINDOW))
+    pool = KeyPool([("k1", "k1")], tpm=5000, period=WINDOW, output_reserve=1000, timeout=5.0, hedge_delay=None)
+
+    text, tank, _ = generate(pool, ClientRegistry(), None, "gemini-2.5-flash", "case " * 200)
+
+    assert text is None and tank == "Offline"
+    assert gemini.calls == {"k1": 1}
+    assert pool.quota.snapshot()["k1"]["tpm_left"] == 5000
+
+
+def test_successful_call_is_settled_to_its_real_size():
+    install(default=Profile(latency=0.01, words=50))
+    pool = KeyPool([("k1", "k1")], tpm=10000, period=60.0, output_reserve=2000, hedge_delay=None)
+
+    text, _, _ = generate(pool, ClientRegistry(), None, "gemini-2.5-flash", "short prompt")
+
+    used = 10000 - pool.quota.snapshot()["k1"]["tpm_left"]
+    assert text and 0 < used < 2000
+
+
+def test_cancelled_stream_is_settled_to_what_was_streamed():
+    install(default=Profile(latency=0.01, words=1000, chunks=20))
+    pool = KeyPool([("k1", "k1")], tpm=10000, period=60.0, output_reserve=4000, hedge_delay=None)
+    seen = []
+
+    with pytest.raises(Cancelled):
+        generate_stream(
+            pool, ClientRegistry(), None, "gemini-2.5-flash", "short prompt", seen.append,
+            should_stop=lambda: len(seen) >= 3,
+        )
+
+    used = 10000 - pool.quota.snapshot()["k1"]["tpm_left"]
+    assert 0 < used < 4000
+
+
+def test_stop_while_waiting_for_quota():
+    install(default=Profile(latency=0.01))
+    pool = KeyPool([("k1", "k1")], rpm=1, period=60.0, timeout=30.0, hedge_delay=None)
+    assert pool.quota.try_take(["k1"], 0) == "k1"   # the window's only request is gone
+    stop = threading.Event()
+    threading.Timer(0.3, stop.set).start()
+
+    start = time.time()
+    with pytest.raises(Cancelled):
+        generate_stream(pool, ClientRegistry(), None, "gemini-2.5-flash", "case", lambda text: None,
+                        should_stop=stop.is_set)
+
+    assert time.time() - start < 2
+    assert pool.quota.queued() == 0
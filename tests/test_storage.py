@@ -0,0 +1,153 @@
+"""Storage's write queue against a backend that refuses writes for a while.
+
+Run from the repo root:  python -m pytest -q tests
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vakildraft.storage import LocalBackend, Storage  # noqa: E402
+
+
+class Flaky(LocalBackend):
+    """A LocalBackend whose upserts and updates raise while down is set."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.down = False
+
+    def upsert(self, table, rows, key):
+        if self.down:
+            raise ConnectionError("backend unavailable")
+        return super().upsert(table, rows, key)
+
+    def update(self, table, values, where):
+        if self.down:
+            raise ConnectionError("backend unavailable")
+        return super().update(table, values, where)
+
+
+def flaky(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    return Flaky(path, files={"access_logs": path, "versions": path}, blob_dir=str(tmp_path / "blobs"))
+
+
+def storage(tmp_path, backend, **options):
+    return Storage(
+        backend, flush_interval=0.01, watch_interval=60, retries=2, retry_backoff=0.01, retry_max=0.05,
+        journal=str(tmp_path / "journal.jsonl"), **options
+    )
+
+
+def login(session_id):
+    return {"session_id": session_id, "user": "asha", "login_time": "10:00", "logout_time": "Active",
+            "year": 2026, "login_ts": 1.0}
+
+
+def rows(backend):
+    return {r["session_id"]: r["logout_time"] for r in backend.select("access_logs")}
+
+
+def test_failed_batch_is_retried_until_the_backend_answers(tmp_path):
+    backend = flaky(tmp_path)
+    calls = []
+    upsert = backend.upsert
+
+    def once_down(table, rows, key):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise ConnectionError("backend unavailable")
+        return upsert(table, rows, key)
+
+    backend.upsert = once_down
+    store = storage(tmp_path, backend)
+    store.upsert("access_logs", login("s1"))
+    store.flush()
+
+    assert rows(backend) == {"s1": "Active"}
+    assert store.stats()["failures"] == 1 and store.stats()["journaled"] == 0
+    assert store.stats()["writes"] == 1
+
+
+def test_writes_are_journaled_while_down_and_replayed_in_order(tmp_path):
+    backend = flaky(tmp_path)
+    store = storage(tmp_path, backend)
+    backend.down = True
+    store.upsert("access_logs", login("s1"))
+    store.flush()
+    # Queued behind the journal, so the logout cannot land before its login
+    store.update("access_logs", {"logout_time": "18:00"}, {"session_id": "s1"})
+    store.flush()
+
+    assert store.stats()["journaled"] == 2 and store.stats()["failures"] >= 3
+    assert os.path.exists(store.journal) and rows(backend) == {}
+
+    backend.down = False
+    store.upsert("access_logs", login("s2"))
+    store.flush()
+
+    assert rows(backend) == {"s1": "18:00", "s2": "Active"}
+    assert store.stats()["journaled"] == 0 and store.stats()["replayed"] == 2
+    assert not os.path.exists(store.journal)
+
+
+def test_journal_left_by_an_earlier_process_is_replayed(tmp_path):
+    backend = flaky(tmp_path)
+    crashed = storage(tmp_path, backend)
+    crashed._write_journal([("upsert", "access_logs", login("s1"), "logs")])
+
+    store = storage(tmp_path, backend)
+    store.upsert("access_logs", login("s2"))
+    store.flush()
+
+    assert rows(backend) == {"s1": "Active", "s2": "Active"}
+    assert store.stats()["replayed"] == 1
+
+
+def test_processes_sharing_a_journal_replay_each_write_once(tmp_path):
+    backend = flaky(tmp_path)
+    sent = []
+    upsert = backend.upsert
+
+    def counted(table, rows, key):
+        if not backend.down:
+            sent.extend(r["session_id"] for r in rows)
+        return upsert(table, rows, key)
+
+    backend.upsert = counted
+    first, second = storage(tmp_path, backend), storage(tmp_path, backend)
+    backend.down = True
+    first.upsert("access_logs", login("s1"))
+    second.upsert("access_logs", login("s2"))
+    first.flush()
+    second.flush()
+    assert first.stats()["journaled"] == 1 and second.stats()["journaled"] == 1
+
+    backend.down = False
+    first.upsert("access_logs", login("s3"))
+    first.flush()
+    second.upsert("access_logs", login("s4"))
+    second.flush()
+
+    assert rows(backend) == {"s1": "Active", "s2": "Active", "s3": "Active", "s4": "Active"}
+    assert sorted(sent) == ["s1", "s2", "s3", "s4"]
+    assert first.stats()["replayed"] + second.stats()["replayed"] == 2
+
+
+def test_writer_survives_a_journal_it_cannot_write(tmp_path):
+    backend = flaky(tmp_path)
+    store = storage(tmp_path, backend)
+    store.journal = str(tmp_path)   # a folder: appending to it fails
+    backend.down = True
+    store.upsert("access_logs", login("s1"))
+    store.flush(timeout=2)
+    assert store.stats()["queued"] == 0 and store.stats()["failures"] >= 3
+
+    backend.down = False
+    store.journal = str(tmp_path / "journal.jsonl")
+    store.upsert("access_logs", login("s2"))
+    store.flush(timeout=2)
+
+    assert rows(backend) == {"s2": "Active"}
@@ -0,0 +1 @@
+"""Support code for the VakilDraft Streamlit app (1cloudapp.py)."""
@@ -0,0 +1,199 @@
+"""Headless batch drafting.
+
+Drafts every case in a CSV or JSONL file without the Streamlit UI, using
+the same prompt builder, key pool, client registry and response cache as
+the app:
+
+    python -m vakildraft.batch cases.csv --out batch_out --workers 8 --rpm 10 --tpm 250000 --docx
+
+Each case needs court, dtype, district and facts. It may also carry
+references (a JSON list of {title, citation, extract}) and an id
+(default: the row number). Results are appended to <out>/results.jsonl
+and fsync'd one case at a time, which makes that file the checkpoint: a
+rerun skips every id already drafted successfully. Secrets (API_KEYS,
+KEY_POOL, CLIENTS, PROMPT, RESPONSE_CACHE, CONTEXT_CACHE) are read from
+.streamlit/secrets.toml. Cases that share a reference pack send it to each
+key once, through the context cache.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from vakildraft.clients import ClientRegistry
+from vakildraft.context_cache import ContextCache
+from vakildraft.drafting import generate
+from vakildraft.export import render_docx
+from vakildraft.keypool import KeyPool
+from vakildraft.prompting import build_standard_prompt, route_model
+from vakildraft.response_cache import ResponseCache
+
+REQUIRED = ("court", "dtype", "district", "facts")
+
+
+# ---------------------------------------------------
+# INPUT / CHECKPOINT
+# ---------------------------------------------------
+def load_secrets(path):
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def read_cases(path):
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    cases = []
+    for n, row in enumerate(rows, start=1):
+        missing = [k for k in REQUIRED if not str(row.get(k) or "").strip()]
+        if missing:
+            raise ValueError(f"{path}: case {n} is missing {', '.join(missing)}")
+        refs = row.get("references") or []
+        if isinstance(refs, str):
+            refs = json.loads(refs) if refs.strip() else []
+        cases.append({
+            "id": str(row.get("id") or n),
+            "court": row["court"].strip(),
+            "dtype": row["dtype"].strip(),
+            "district": row["district"].strip(),
+            "facts": row["facts"].strip(),
+            "references": [
+                {"title": r.get("title", ""), "citation": r.get("citation", ""), "extract": r.get("extract", "")}
+                for r in refs
+            ],
+        })
+    return cases
+
+
+def completed_ids(results_path):
+    done = set()
+    if os.path.exists(results_path):
+        with open(results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue   # a line cut short by a crash
+                if row.get("text"):
+                    done.add(row["id"])
+    return done
+
+
+def safe_name(text):
+    return re.sub(r"[^\w.-]+", "_", text).strip("_")[:80]
+
+
+# ---------------------------------------------------
+# RUN
+# ---------------------------------------------------
+def run_batch(
+    cases, out_dir, secrets, workers=4, rpm=None, tpm=None, model="Auto-Pilot", docx=False, use_cache=True
+):
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, "results.jsonl")
+    done = completed_ids(results_path)
+    todo = [c for c in cases if c["id"] not in done]
+
+    pool_config = dict(secrets.get("KEY_POOL", {}))
+    if rpm:
+        pool_config["rpm"] = rpm
+    if tpm:
+        pool_config["tpm"] = tpm
+    pool = KeyPool([tuple(p) for p in secrets.get("API_KEYS", [])], **pool_config)
+    clients = ClientRegistry(**secrets.get("CLIENTS", {}))
+    cache = ResponseCache(**secrets.get("RESPONSE_CACHE", {})) if use_cache else None
+    context_cache = ContextCache(clients, **secrets.get("CONTEXT_CACHE", {}))
+    prompt_config = {"reference_budget": 6000, "pro_threshold_tokens": 300, "pro_context_tokens": 2000}
+    prompt_config.update(secrets.get("PROMPT", {}))
+
+    write_lock = threading.Lock()
+    start = time.time()
+    drafted = failed = 0
+    print(f"{len(cases)} cases, {len(done)} already done, {len(todo)} to draft", flush=True)
+
+    def draft(case):
+        prompt, stats = build_standard_prompt(
+            case["dtype"], case["court"], case["district"], case["facts"], case["references"],
+            reference_budget=prompt_config["reference_budget"],
+        )
+        target = route_model(
+            stats, model, prompt_config["pro_threshold_tokens"], prompt_config["pro_context_tokens"]
+        )
+        try:
+            text, tank, seconds = generate(
+                pool, clients, cache, target, prompt, user="batch",
+                prefix=prompt[:stats["prefix_chars"]], context_cache=context_cache,
+            )
+        except Exception as exc:
+            # One bad case is recorded as failed instead of aborting the batch
+            return case, None, str(exc)[:300], 0, stats["tokens"]
+        return case, text, tank, seconds, stats["tokens"]
+
+    with open(results_path, "a", encoding="utf-8") as results, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(draft, case) for case in todo]
+        for future in as_completed(futures):
+            case, text, tank, seconds, tokens = future.result()
+            row = {
+                "id": case["id"], "court": case["court"], "dtype": case["dtype"], "district": case["district"],
+                "tank": tank, "seconds": seconds, "prompt_tokens": tokens, "text": text,
+                "error": None if text else (tank if tank != "Offline" else "No response from any key"),
+            }
+            with write_lock:
+                if text and docx:
+                    with open(os.path.join(out_dir, f"{safe_name(case['id'])}_{safe_name(case['dtype'])}.docx"), "wb") as f:
+                        f.write(render_docx(text))
+                results.write(json.dumps(row, ensure_ascii=False) + "\n")
+                results.flush()
+                os.fsync(results.fileno())
+            if text:
+                drafted += 1
+            else:
+                failed += 1
+            minutes = max(time.time() - start, 1e-6) / 60
+            print(
+                f"[{drafted + failed}/{len(todo)}] {case['id']} {case['dtype']}: "
+                f"{'ok via ' + tank if text else 'FAILED'} in {seconds}s · {drafted / minutes:.1f} drafts/min",
+                flush=True,
+            )
+
+    minutes = (time.time() - start) / 60
+    rate = drafted / minutes if minutes else 0.0
+    print(f"Done: {drafted} drafted, {failed} failed in {minutes:.1f} min · {rate:.1f} drafts/min")
+    return {"drafted": drafted, "failed": failed, "skipped": len(done), "drafts_per_minute": round(rate, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Draft a CSV/JSONL of cases without the UI.")
+    parser.add_argument("cases", help="CSV or JSONL with court, dtype, district, facts[, references, id]")
+    parser.add_argument("--out", default="batch_out", help="output folder (results.jsonl + optional .docx)")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent drafts")
+    parser.add_argument("--rpm", type=int, default=None, help="requests per minute allowed on each API key")
+    parser.add_argument("--tpm", type=int, default=None, help="tokens per minute allowed on each API key")
+    parser.add_argument("--model", default="Auto-Pilot", help="Auto-Pilot or an explicit Gemini model")
+    parser.add_argument("--docx", action="store_true", help="also write one .docx per draft")
+    parser.add_argument("--no-cache", action="store_true", help="ignore cached responses for identical prompts")
+    args = parser.parse_args(argv)
+
+    secrets = load_secrets(args.secrets)
+    if not secrets.get("API_KEYS"):
+        parser.error(f"No API_KEYS in {args.secrets}")
+    summary = run_batch(
+        read_cases(args.cases), args.out, secrets, workers=args.workers, rpm=args.rpm, tpm=args.tpm,
+        model=args.model, docx=args.docx, use_cache=not args.no_cache,
+    )
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
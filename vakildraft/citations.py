@@ -0,0 +1,115 @@
+"""Single-pass citation extraction and verification.
+
+One precompiled pattern covers SCC, AIR, KHC, KHC OnLine, KLT, KLJ, Ker LJ
+and Cri LJ citations; a reporter and year without a page ("2019 KLT") is
+not a citation. extract_citations() walks a draft once and returns every
+citation with its span and a normalized form. verify_citations() checks
+them against the citations in the verified references the advocate
+added.
+"""
+import re
+from collections import namedtuple
+
+Citation = namedtuple("Citation", "start end text reporter year volume court page normalized")
+
+AIR_COURTS = (
+    "SC", "Ker", "Kerala", "Mad", "Bom", "Del", "Cal", "All", "AP", "Kar", "Guj", "Raj",
+    "Ori", "Pat", "P&H", "MP", "Gau", "HP", "J&K", "Jhar", "Chh", "Utr", "Mani", "Sikkim",
+)
+
+# The lookahead skips positions that cannot start a citation; AIR itself is
+# case-sensitive so prose like "the air 2019" is not taken for a citation.
+CITATION_PATTERN = re.compile(
+    r"""
+    (?=[(A12])
+    (?:
+      \((?P<scc_year>(?:19|20)\d{2})\)\s*(?P<scc_vol>\d{1,2})\s*(?i:SCC)
+        (?:\s*\((?P<scc_series>(?i:Cri|Civ|L\s*&\s*S))\))?
+        (?:\s+(?P<scc_page>\d{1,5}))?
+    | \bAIR\s*(?P<air_year>(?:19|20)\d{2})
+        (?:\s+(?P<air_court>(?i:""" + "|".join(re.escape(c) for c in AIR_COURTS) + r""")))?\b
+        (?:\s+(?P<air_page>\d{1,5}))?
+    | \b(?P<year>(?:19|20)\d{2})\s*(?:\((?P<vol>\d{1,2})\)\s*)?
+        (?P<rep>(?i:KHC\s*On\s?Line|KHC|KLT|KLJ
+                  |Ker\.?\s?L\.?\s?J\.?|Cri\.?\s?L\.?\s?J\.?|Crl\.?\s?L\.?\s?J\.?))
+        \s*(?P<page>\d{1,5})
+    )
+    """,
+    re.VERBOSE,
+)
+
+# Spelling variants of the same reporter collapse to one canonical name
+REPORTERS = {
+    "KHC": "KHC", "KHCONLINE": "KHC OnLine", "KLT": "KLT", "KLJ": "KLJ", "KERLJ": "Ker LJ", "CRILJ": "Cri LJ",
+    "CRLLJ": "Cri LJ",
+}
+COURTS = {c.upper(): c for c in AIR_COURTS}
+COURTS["KERALA"] = "Ker"
+
+
+def _citation(m):
+    if m.group("scc_year"):
+        series = m.group("scc_series")
+        series = re.sub(r"\s+", " ", series).replace(" & ", "&") if series else None
+        reporter = f"SCC ({series.title() if series != 'L&S' else 'L&S'})" if series else "SCC"
+        year, volume, court, page = m.group("scc_year"), m.group("scc_vol"), None, m.group("scc_page")
+        normalized = f"({year}) {volume} {reporter}" + (f" {page}" if page else "")
+    elif m.group("air_year"):
+        court = m.group("air_court")
+        court = COURTS.get(court.upper(), court) if court else None
+        reporter, year, volume, page = "AIR", m.group("air_year"), None, m.group("air_page")
+        normalized = " ".join(p for p in ("AIR", year, court, page) if p)
+    else:
+        reporter = REPORTERS[re.sub(r"[^A-Za-z]", "", m.group("rep")).upper()]
+        year, volume, court, page = m.group("year"), m.group("vol"), None, m.group("page")
+        normalized = year + (f" ({volume})" if volume else "") + f" {reporter} {page}"
+    return Citation(m.start(), m.end(), m.group(0), reporter, year, volume, court, page, normalized)
+
+
+def extract_citations(text):
+    return [_citation(m) for m in CITATION_PATTERN.finditer(text)]
+
+
+def _same(cited, known):
+    # Every part the draft gives must be in the reference and equal; without a page nothing can be checked
+    if cited.reporter != known.reporter or cited.year != known.year or cited.page is None:
+        return False
+    return all(x is None or x == y for x, y in (
+        (cited.volume, known.volume), (cited.court, known.court), (cited.page, known.page),
+    ))
+
+
+def verify_citations(text, references):
+    """Split the citations in text into (verified, unverified) against the references.
+
+    Each reference is a {title, citation, extract} dict (the app's
+    references()); citations are read from all three fields.
+    """
+    known = {}
+    for ref in references:
+        for field in ("citation", "title", "extract"):
+            for c in extract_citations(ref.get(field, "")):
+                known.setdefault((c.reporter, c.year), []).append(c)
+
+    verified, unverified = [], []
+    for c in extract_citations(text):
+        if any(_same(c, k) for k in known.get((c.reporter, c.year), ())):
+            verified.append(c)
+        else:
+            unverified.append(c)
+    return verified, unverified
+
+
+UNVERIFIED_MARK = " [⚠ UNVERIFIED CITATION]"
+
+
+def flag_unverified(text, unverified):
+    """Insert UNVERIFIED_MARK after each unverified citation (skipping ones already flagged)."""
+    out, last = [], 0
+    for c in unverified:
+        out.append(text[last:c.end])
+        if not text.startswith(UNVERIFIED_MARK, c.end):
+            out.append(UNVERIFIED_MARK)
+        last = c.end
+    out.append(text[last:])
+    return "".join(out)
@@ -0,0 +1,120 @@
+"""Process-wide registry of keep-alive API clients.
+
+Streamlit reruns the whole script on every widget interaction, so anything
+built at module level in 1cloudapp.py is rebuilt each time. The registry
+keeps one genai.Client per API key and one Supabase client per project,
+each with its own pooled httpx connections sized by the same settings, and
+closes genai clients that have sat idle for longer than idle_ttl. The SDKs themselves are imported on the first
+client request, so the login page never pays for them.
+"""
+import threading
+import time
+
+
+class ClientRegistry:
+    def __init__(
+        self,
+        timeout=90.0,
+        max_connections=20,
+        max_keepalive=10,
+        keepalive_expiry=120.0,
+        idle_ttl=1800.0,
+        supabase_timeout=20.0,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        # Must stay well above timeout so a client is never closed mid-call
+        self.idle_ttl = max(idle_ttl, 2 * timeout)
+        self.supabase_timeout = supabase_timeout
+        self._lock = threading.Lock()
+        self._genai = {}       # api key -> [client, last_used]
+        self._supabase = {}    # (url, key) -> client
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def _limits(self):
+        import httpx
+
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    # ---------------------------------------------------
+    # GEMINI
+    # ---------------------------------------------------
+    def genai(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._genai.get(key)
+            if entry is not None:
+                entry[1] = now
+                self.reused += 1
+                client = entry[0]
+            else:
+                from google import genai
+                from google.genai import types
+
+                client = genai.Client(
+                    api_key=key,
+                    http_options=types.HttpOptions(
+                        timeout=int(self.timeout * 1000), client_args={"limits": self._limits()}
+                    ),
+                )
+                self._genai[key] = [client, now]
+                self.created += 1
+        self.evict_idle(now)
+        return client
+
+    def evict_idle(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            stale = [k for k, (_, used) in self._genai.items() if now - used > self.idle_ttl]
+            clients = [self._genai.pop(k)[0] for k in stale]
+            self.evicted += len(clients)
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    # ---------------------------------------------------
+    # SUPABASE
+    # ---------------------------------------------------
+    def supabase(self, url, key):
+        with self._lock:
+            client = self._supabase.get((url, key))
+            if client is None:
+                import httpx
+                from supabase import ClientOptions, create_client
+
+                # One pooled httpx client for the project's table and Storage calls
+                http = httpx.Client(timeout=self.supabase_timeout, limits=self._limits(), follow_redirects=True)
+                client = create_client(
+                    url,
+                    key,
+                    options=ClientOptions(
+                        postgrest_client_timeout=self.supabase_timeout,
+                        storage_client_timeout=int(self.supabase_timeout),
+                        httpx_client=http,
+                    ),
+                )
+                self._supabase[(url, key)] = client
+                self.created += 1
+            else:
+                self.reused += 1
+            return client
+
+    def stats(self):
+        with self._lock:
+            return {
+                "genai_clients": len(self._genai),
+                "supabase_clients": len(self._supabase),
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+            }
@@ -0,0 +1,190 @@
+"""Server-side context caching for the static part of a prompt.
+
+Draft Standard and Mirror Style prompts start with a large prefix that
+repeats from draft to draft (the verified judgment pack, the Style DNA)
+and end with the small part that changes (facts, petition type). The
+prefix is registered once with Gemini's context cache and later calls
+send only the suffix plus the cache's name, which cuts input tokens and
+time to first token.
+
+Handles are kept per (API key, model, prefix hash), because a cache lives
+in the project of the key that created it. A handle is renewed when a call
+finds it close to expiry, least recently used handles beyond max_handles
+are deleted on the server, and a prefix the server refuses (too short, no
+caching on that model) is not retried until retry_after has passed.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from vakildraft.text import estimate_tokens
+
+# Gemini refuses to cache fewer input tokens than this, per model family
+DEFAULT_MIN_TOKENS = {"pro": 4096, "flash": 1024}
+
+
+def prefix_hash(prefix):
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+def is_missing_cache(exc):
+    """True for the error a call gets when its cached content expired or was deleted."""
+    text = str(exc)
+    return getattr(exc, "code", None) == 404 or ("CachedContent" in text and "not found" in text.lower())
+
+
+class Handle:
+    def __init__(self, key):
+        self.key = key            # API key of the project holding the cache
+        self.name = None          # server-side cache name, None until created (or while refused)
+        self.expires = 0.0
+        self.lock = threading.Lock()
+
+
+class ContextCache:
+    def __init__(
+        self,
+        clients,
+        ttl=3600.0,
+        renew_before=300.0,
+        max_handles=64,
+        min_tokens=None,
+        retry_after=600.0,
+        metrics=None,
+    ):
+        self.clients = clients
+        self.ttl = ttl
+        self.renew_before = renew_before
+        self.max_handles = max_handles
+        self.min_tokens = dict(DEFAULT_MIN_TOKENS, **(min_tokens or {}))
+        self.retry_after = retry_after
+        self.metrics = metrics
+        self._handles = OrderedDict()   # (key name, model, prefix hash) -> Handle
+        self._lock = threading.Lock()
+        self.created = 0
+        self.renewed = 0
+        self.evicted = 0
+        self.hits = 0
+        self.cached_tokens = 0          # prefix tokens not re-sent thanks to a cache
+
+    def _min_tokens(self, model):
+        for family, tokens in self.min_tokens.items():
+            if family in model:
+                return tokens
+        return min(self.min_tokens.values())
+
+    # ---------------------------------------------------
+    # SERVER CALLS
+    # ---------------------------------------------------
+    def _create(self, name, key, model, prefix):
+        from google.genai import types
+
+        client = self.clients.genai(key)
+        config = types.CreateCachedContentConfig(
+            contents=[prefix], ttl=f"{int(self.ttl)}s", display_name=f"vakildraft-{prefix_hash(prefix)}"
+        )
+        if self.metrics is not None:
+            with self.metrics.span("context_cache_create", model, name):
+                return client.caches.create(model=model, config=config).name
+        return client.caches.create(model=model, config=config).name
+
+    def _renew(self, key, cache_name):
+        from google.genai import types
+
+        self.clients.genai(key).caches.update(
+            name=cache_name, config=types.UpdateCachedContentConfig(ttl=f"{int(self.ttl)}s")
+        )
+
+    def _delete(self, key, cache_name):
+        try:
+            self.clients.genai(key).caches.delete(name=cache_name)
+        except Exception:
+            pass   # it expires on its own anyway
+
+    # ---------------------------------------------------
+    # HANDLES
+    # ---------------------------------------------------
+    def handle(self, name, key, model, prefix):
+        """The cache name to send with a call on this key, or None to send the whole prompt."""
+        if not prefix or estimate_tokens(prefix) < self._min_tokens(model):
+            return None
+        ident = (name, model, prefix_hash(prefix))
+        evicted = []
+        with self._lock:
+            entry = self._handles.get(ident)
+            if entry is None:
+                entry = self._handles[ident] = Handle(key)
+            self._handles.move_to_end(ident)
+            while len(self._handles) > self.max_handles:
+                _, old = self._handles.popitem(last=False)
+                if old.name:
+                    evicted.append(old)
+            self.evicted += len(evicted)
+        for old in evicted:
+            self._delete(old.key, old.name)
+
+        # One caller per handle talks to the server; the others wait for its answer
+        renewed = created = False
+        with entry.lock:
+            now = time.time()
+            if entry.name and now < entry.expires - self.renew_before:
+                pass
+            elif entry.name and now < entry.expires:
+                try:
+                    self._renew(key, entry.name)
+                    entry.expires = now + self.ttl
+                    renewed = True
+                except Exception:
+                    entry.name, entry.expires = None, 0.0
+            elif entry.name is None and now < entry.expires:
+                return None   # refused recently
+            else:
+                entry.name = None
+            if entry.name is None:
+                try:
+                    entry.name = self._create(name, key, model, prefix)
+                    entry.expires = now + self.ttl
+                    created = True
+                except Exception:
+                    entry.expires = now + self.retry_after
+                    return None
+            cache_name = entry.name
+        # Counters are shared by every handle, so they change under the registry lock
+        with self._lock:
+            self.renewed += renewed
+            if created:
+                # Creating the cache uploads the whole prefix: nothing was saved on this call
+                self.created += 1
+            else:
+                self.hits += 1
+                self.cached_tokens += estimate_tokens(prefix)
+        return cache_name
+
+    def forget(self, name, model, prefix):
+        """Drop a handle the server no longer knows (expired early, deleted elsewhere)."""
+        with self._lock:
+            self._handles.pop((name, model, prefix_hash(prefix)), None)
+
+    def split(self, name, key, model, prompt, prefix):
+        """(contents, config) for a call: the suffix plus the cache, or the whole prompt."""
+        if not prefix or not prompt.startswith(prefix):
+            return prompt, None
+        cache_name = self.handle(name, key, model, prefix)
+        if cache_name is None:
+            return prompt, None
+        from google.genai import types
+
+        return prompt[len(prefix):], types.GenerateContentConfig(cached_content=cache_name)
+
+    def stats(self):
+        with self._lock:
+            live = sum(1 for h in self._handles.values() if h.name and h.expires > time.time())
+        return {
+            "handles": live,
+            "created": self.created,
+            "renewed": self.renewed,
+            "evicted": self.evicted,
+            "hits": self.hits,
+            "cached_tokens": self.cached_tokens,
+        }
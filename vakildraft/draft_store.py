@@ -0,0 +1,196 @@
+"""Versioned draft history, delta-encoded and kept in shared storage.
+
+Every generated draft and every saved edit becomes a version in a per-user
+chain in the versions table (see vakildraft.storage), so a user's history
+follows them to whichever replica serves the next request. A version is stored either as a keyframe (the whole text,
+zlib-compressed) or as a line delta against the previous version in the
+chain: copy runs of the parent's lines plus the inserted lines, also
+compressed. Whichever encoding is smaller wins, and a keyframe is forced
+every keyframe_every versions so a rebuild never replays a long chain.
+Only a small LRU of rebuilt texts lives in memory (versions never change,
+so it needs no invalidation); sessions keep a version id, not the text,
+and the history outlives Reset All and reconnects. History pages and
+stats are cached until the user's next version on any replica.
+"""
+import difflib
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+FULL = "full"
+DELTA = "delta"
+TABLE = "versions"
+
+
+def encode_delta(base, text):
+    """Ops that rebuild text from base: [start, end] copies base lines, a string inserts."""
+    a = base.splitlines(keepends=True)
+    b = text.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return ops
+
+
+def apply_delta(base, ops):
+    a = base.splitlines(keepends=True)
+    return "".join("".join(a[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def pack(obj):
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def topic(user):
+    return f"drafts:{user}"
+
+
+class DraftStore:
+    def __init__(self, storage, keyframe_every=20, keep=200, cache_items=16):
+        self.storage = storage
+        self.keyframe_every = keyframe_every
+        self.keep = keep                  # versions kept per user
+        self.cache_items = cache_items    # rebuilt texts held in memory
+        self._cache = OrderedDict()       # version id -> text
+        self._lock = threading.Lock()
+
+    @property
+    def _rows(self):
+        return self.storage.backend
+
+    # ---------------------------------------------------
+    # WRITE
+    # ---------------------------------------------------
+    def add(self, user, text, label, kind="draft"):
+        """Store text as the user's newest version. Returns its id (the latest id if text is unchanged)."""
+        sha = digest(text)
+        with self._lock:
+            latest = self._rows.select(TABLE, ["id", "sha", "depth"], {"user": user}, order="id", desc=True, limit=1)
+            latest = latest[0] if latest else None
+            if latest is not None and latest["sha"] == sha:
+                return latest["id"]
+
+            encoding, depth, payload = FULL, 0, pack(text)
+            if latest is not None and latest["depth"] + 1 < self.keyframe_every:
+                delta = pack(encode_delta(self._text(latest["id"]), text))
+                if len(delta) < len(payload):
+                    encoding, depth, payload = DELTA, latest["depth"] + 1, delta
+
+            version_id = self._rows.insert(TABLE, [{
+                "user": user, "label": label, "kind": kind, "created": time.time(),
+                "parent": latest["id"] if latest else None, "encoding": encoding, "depth": depth,
+                "payload": payload, "chars": len(text), "sha": sha, "stored": len(payload),
+            }])[0]
+            self._remember(version_id, text)
+            self._prune(user)
+        self.storage.publish(topic(user))
+        return version_id
+
+    def _prune(self, user):
+        rows = self._rows.select(TABLE, ["id"], {"user": user}, order="id", desc=True, limit=1, offset=self.keep)
+        if not rows:
+            return
+        cutoff = rows[0]["id"]
+        # The oldest survivor may be a delta on a version about to go: make it a keyframe first
+        oldest = self._rows.select(
+            TABLE, ["id", "encoding"], [("user", "=", user), ("id", ">", cutoff)], order="id", limit=1
+        )
+        if oldest and oldest[0]["encoding"] == DELTA:
+            payload = pack(self._text(oldest[0]["id"]))
+            self._rows.update(
+                TABLE, {"encoding": FULL, "depth": 0, "parent": None, "payload": payload, "stored": len(payload)},
+                {"id": oldest[0]["id"]},
+            )
+        self._rows.delete(TABLE, [("user", "=", user), ("id", "<=", cutoff)])
+        for version_id in [v for v in self._cache if v <= cutoff]:
+            self._cache.pop(version_id, None)
+
+    # ---------------------------------------------------
+    # READ
+    # ---------------------------------------------------
+    def _remember(self, version_id, text):
+        self._cache[version_id] = text
+        self._cache.move_to_end(version_id)
+        while len(self._cache) > self.cache_items:
+            self._cache.popitem(last=False)
+
+    def _text(self, version_id):
+        """Rebuild a version (caller holds the lock)."""
+        if version_id in self._cache:
+            self._cache.move_to_end(version_id)
+            return self._cache[version_id]
+        chain = []
+        current = version_id
+        while current is not None:
+            if current in self._cache:
+                text = self._cache[current]
+                break
+            rows = self._rows.select(TABLE, ["parent", "encoding", "payload"], {"id": current})
+            if not rows:
+                raise KeyError(version_id)
+            row = rows[0]
+            if row["encoding"] == FULL:
+                text = unpack(row["payload"])
+                break
+            chain.append(row["payload"])
+            current = row["parent"]
+        for payload in reversed(chain):
+            text = apply_delta(text, unpack(payload))
+        self._remember(version_id, text)
+        return text
+
+    def get(self, version_id):
+        if version_id is None:
+            return None
+        with self._lock:
+            try:
+                return self._text(version_id)
+            except KeyError:
+                return None
+
+    def history(self, user, limit=10):
+        """The user's newest versions (metadata only), newest first."""
+        rows = self.storage.cached(topic(user), ("history", limit), lambda: self._rows.select(
+            TABLE, ["id", "label", "kind", "created", "encoding", "chars", "stored"], {"user": user},
+            order="id", desc=True, limit=limit,
+        ))
+        return [dict(r) for r in rows]
+
+    def diff(self, old_id, new_id, context=3):
+        """Unified diff between two versions."""
+        old, new = self.get(old_id), self.get(new_id)
+        if old is None or new is None:
+            return ""
+        return "".join(difflib.unified_diff(
+            old.splitlines(keepends=True), new.splitlines(keepends=True),
+            fromfile=f"v{old_id}", tofile=f"v{new_id}", n=context,
+        ))
+
+    def stats(self, user):
+        sizes = self.storage.cached(topic(user), "sizes", lambda: self._rows.select(
+            TABLE, ["chars", "stored"], {"user": user}
+        ))
+        chars = sum(r["chars"] or 0 for r in sizes)
+        stored = sum(r["stored"] or 0 for r in sizes)
+        with self._lock:
+            cached = len(self._cache)
+        return {
+            "versions": len(sizes),
+            "text_mb": round(chars / 2 ** 20, 2),
+            "stored_mb": round(stored / 2 ** 20, 2),
+            "cached_versions": cached,
+        }
@@ -0,0 +1,173 @@
+"""Gemini calls through the key pool, response cache and client registry.
+
+These functions touch no Streamlit state, so the same code runs on the
+script thread, in the background job queue, and in the batch CLI. The
+caller resolves the model and passes in the shared pool, clients and
+cache. Passing a Metrics store records every key attempt and the model
+call as a whole. user is whoever the call is for; the pool queues
+callers per user once the keys' quotas run dry. With a ContextCache and
+the prompt's static prefix, each key sends the prefix once and later
+calls reference it.
+"""
+import time
+
+from vakildraft.context_cache import is_missing_cache
+from vakildraft.text import estimate_tokens
+
+
+class Cancelled(Exception):
+    pass
+
+
+def close_stream(opened):
+    close = getattr(opened[1], "close", None)
+    if close:
+        close()
+
+
+def timed_attempts(metrics, model, fn):
+    """Wrap a pool attempt fn(name, key) so each try is recorded under its key."""
+    if metrics is None:
+        return fn
+
+    def attempt(name, key):
+        with metrics.span("key_attempt", model, name):
+            return fn(name, key)
+
+    return attempt
+
+
+def observe(metrics, stage, start_time, model, key="", outcome="ok"):
+    if metrics is not None:
+        metrics.observe(stage, time.time() - start_time, model, key, outcome)
+
+
+def with_context_cache(context_cache, model, prompt, prefix, send):
+    """Wrap send(client_key, contents, config) into a pool attempt that uses the prefix cache when it can."""
+
+    def attempt(name, key):
+        if context_cache is None or not prefix:
+            return send(key, prompt, None)
+        contents, config = context_cache.split(name, key, model, prompt, prefix)
+        if config is None:
+            return send(key, prompt, None)
+        try:
+            return send(key, contents, config)
+        except Exception as exc:
+            if not is_missing_cache(exc):
+                raise
+            # The cache went away early: forget it and send the whole prompt this time
+            context_cache.forget(name, model, prefix)
+            return send(key, prompt, None)
+
+    return attempt
+
+
+def generate(
+    pool, clients, cache, model, prompt, force=False, metrics=None, user=None, prefix="", context_cache=None
+):
+    """Blocking draft. Returns (text, tank, seconds), or (None, "Offline", seconds)."""
+    start_time = time.time()
+
+    if not force and cache is not None:
+        cached = cache.get(model, prompt)
+        if cached:
+            observe(metrics, "model_call", start_time, model, outcome="cache")
+            return cached, f"Cache ({model})", round(time.time() - start_time, 1)
+
+    def send(key, contents, config):
+        return clients.genai(key).models.generate_content(model=model, contents=contents, config=config).text
+
+    call = with_context_cache(context_cache, model, prompt, prefix, send)
+    tokens = estimate_tokens(prompt)
+    res, name = pool.run(timed_attempts(metrics, model, call), user=user, tokens=tokens)
+    if name is not None:
+        pool.settle(name, tokens, tokens + estimate_tokens(res or ""))
+        if cache is not None:
+            cache.put(model, prompt, res)
+        observe(metrics, "model_call", start_time, model, name)
+        return res, f"{name} ({model})", round(time.time() - start_time, 1)
+
+    observe(metrics, "model_call", start_time, model, outcome="offline")
+    return None, "Offline", round(time.time() - start_time, 1)
+
+
+def generate_stream(
+    pool, clients, cache, model, prompt, on_chunk, force=False, should_stop=None, metrics=None, user=None,
+    prefix="", context_cache=None,
+):
+    """Streaming draft.
+
+    on_chunk receives the text accumulated so far after every chunk (and ""
+    when a dead key forces a restart). Returns (text, tank, timings) where
+    timings holds time-to-first-token ("ttft") and total time ("total") in
+    seconds. A cached answer is returned whole unless force is set. Raises
+    Cancelled as soon as should_stop() turns true.
+    """
+    start_time = time.time()
+
+    if not force and cache is not None:
+        cached = cache.get(model, prompt)
+        if cached:
+            on_chunk(cached)
+            observe(metrics, "model_call", start_time, model, outcome="cache")
+            elapsed = round(time.time() - start_time, 1)
+            return cached, f"Cache ({model})", {"ttft": elapsed, "total": elapsed}
+
+    # The hedge race is on the first chunk: whichever key starts talking first wins
+    def send(key, contents, config):
+        models = clients.genai(key).models
+        stream = iter(models.generate_content_stream(model=model, contents=contents, config=config))
+        for chunk in stream:
+            if chunk.text:
+                return chunk.text, stream
+        raise ValueError("empty stream")
+
+    open_stream = with_context_cache(context_cache, model, prompt, prefix, send)
+
+    tokens = estimate_tokens(prompt)
+    tried = set()
+    while True:
+        if should_stop and should_stop():
+            raise Cancelled()
+        opened, name = pool.run(
+            timed_attempts(metrics, model, open_stream), exclude=tried, on_discard=close_stream, user=user,
+            tokens=tokens, should_stop=should_stop,
+        )
+        if name is None:
+            if should_stop and should_stop():
+                raise Cancelled()
+            break
+        tried.add(name)
+        first, stream = opened
+        ttft = round(time.time() - start_time, 1)
+        observe(metrics, "first_token", start_time, model, name)
+        parts = [first]
+        try:
+            on_chunk(first)
+            for chunk in stream:
+                if should_stop and should_stop():
+                    close_stream(opened)
+                    raise Cancelled()
+                if chunk.text:
+                    parts.append(chunk.text)
+                    on_chunk("".join(parts))
+            timings = {"ttft": ttft, "total": round(time.time() - start_time, 1)}
+            text = "".join(parts)
+            if cache is not None:
+                cache.put(model, prompt, text)
+            observe(metrics, "model_call", start_time, model, name)
+            return text, f"{name} ({model})", timings
+        except Cancelled:
+            raise
+        except Exception as exc:
+            # A key that dies mid-stream restarts the draft on the next key
+            kind = pool.report_failure(name, exc)
+            observe(metrics, "stream_broken", start_time, model, name, kind)
+            on_chunk("")
+        finally:
+            # Finished, cancelled or broken: the key is charged for what was streamed, not the reservation
+            pool.settle(name, tokens, tokens + estimate_tokens("".join(parts)))
+
+    observe(metrics, "model_call", start_time, model, outcome="offline")
+    return None, "Offline", {"ttft": 0, "total": round(time.time() - start_time, 1)}
@@ -0,0 +1,161 @@
+"""On-demand DOCX/PDF export of drafts.
+
+Rendering happens on a small worker pool only when a download is requested,
+and finished files are memoized by (sha256 of the draft text, format), so a
+rerun that does not change the draft never renders it again. python-docx
+and fpdf are imported by the first render.
+
+No Malayalam font ships with the app: DejaVu Sans (the usual system
+fallback) has no Malayalam glyphs, so unless a Malayalam-capable font is
+installed or configured, Malayalam text comes out of the PDF as blank
+boxes. DraftExporter.malayalam says whether the chosen font covers it, so
+the app can warn before the download.
+"""
+import hashlib
+import io
+import logging
+import os
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Looked up in order when no font_path is configured; the first one that
+# exists is embedded so non latin-1 text survives. fonts/ is for a font
+# dropped in by the deployment (e.g. Noto Sans Malayalam, SIL OFL); the
+# repo does not bundle one. Only the last entry lacks Malayalam glyphs.
+FONT_CANDIDATES = [
+    "fonts/NotoSansMalayalam-Regular.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSansMalayalam-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSansMalayalam-Regular.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+MALAYALAM_SAMPLE = "\u0d2e"   # MA
+
+
+def find_font(font_path=None):
+    for path in ([font_path] if font_path else []) + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def covers(font_path, char):
+    """True if the TrueType font maps char to a glyph (read from its cmap table)."""
+    code = ord(char)
+    try:
+        with open(font_path, "rb") as f:
+            data = f.read()
+        tables = struct.unpack(">H", data[4:6])[0]
+        for i in range(tables):
+            tag, _, cmap, _ = struct.unpack(">4sIII", data[12 + 16 * i:28 + 16 * i])
+            if tag == b"cmap":
+                break
+        else:
+            return False
+        for i in range(struct.unpack(">H", data[cmap + 2:cmap + 4])[0]):
+            platform, encoding, offset = struct.unpack(">HHI", data[cmap + 4 + 8 * i:cmap + 12 + 8 * i])
+            if (platform, encoding) not in ((0, 3), (0, 4), (3, 1), (3, 10)):
+                continue
+            start = cmap + offset
+            fmt = struct.unpack(">H", data[start:start + 2])[0]
+            if fmt == 4:
+                segments = struct.unpack(">H", data[start + 6:start + 8])[0] // 2
+                ends = struct.unpack(f">{segments}H", data[start + 14:start + 14 + 2 * segments])
+                firsts = struct.unpack(f">{segments}H", data[start + 16 + 2 * segments:start + 16 + 4 * segments])
+                if any(first <= code <= end for first, end in zip(firsts, ends) if first != 0xFFFF):
+                    return True
+            elif fmt == 12:
+                groups = struct.unpack(">I", data[start + 12:start + 16])[0]
+                for g in range(groups):
+                    first, end, _ = struct.unpack(">III", data[start + 16 + 12 * g:start + 28 + 12 * g])
+                    if first <= code <= end:
+                        return True
+        return False
+    except (OSError, struct.error):
+        return False
+
+
+def has_malayalam(text):
+    return any("\u0d00" <= ch <= "\u0d7f" for ch in text)
+
+
+def render_docx(text):
+    from docx import Document
+
+    doc = Document()
+    doc.add_paragraph(text)
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+
+def render_pdf(text, font_path=None):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    if font_path:
+        pdf.add_font("DraftFont", "", font_path, uni=True)
+        pdf.set_font("DraftFont", size=11)
+        pdf.multi_cell(0, 10, text)
+    else:
+        # No Unicode font available: fall back to the core font and latin-1
+        pdf.set_font("Arial", size=11)
+        pdf.multi_cell(0, 10, text.encode("latin-1", "replace").decode("latin-1"))
+    return pdf.output(dest="S").encode("latin-1")
+
+
+class DraftExporter:
+    def __init__(self, max_items=32, max_workers=2, font_path=None, metrics=None):
+        self.max_items = max_items
+        self.font_path = find_font(font_path)
+        self.malayalam = bool(self.font_path) and covers(self.font_path, MALAYALAM_SAMPLE)
+        if not self.malayalam:
+            logger.warning(
+                "No Malayalam-capable font found (using %s); Malayalam text will be blank in PDF exports. "
+                "Install Noto Sans Malayalam or set [EXPORT] font_path.", self.font_path or "core Arial"
+            )
+        self.metrics = metrics
+        self._jobs = OrderedDict()   # (digest, fmt) -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self.renders = 0
+
+    @staticmethod
+    def _key(text, fmt):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest(), fmt
+
+    def _render(self, text, fmt):
+        self.renders += 1
+        if self.metrics is None:
+            return self._render_format(text, fmt)
+        with self.metrics.span(f"export_{fmt}"):
+            return self._render_format(text, fmt)
+
+    def _render_format(self, text, fmt):
+        if fmt == "docx":
+            return render_docx(text)
+        if fmt == "pdf":
+            return render_pdf(text, self.font_path)
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    def submit(self, text, fmt):
+        """Start rendering (or return the existing job) for this text and format."""
+        key = self._key(text, fmt)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or (job.done() and job.exception() is not None):
+                job = self._executor.submit(self._render, text, fmt)
+                self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            while len(self._jobs) > self.max_items:
+                self._jobs.popitem(last=False)
+            return job
+
+    def peek(self, text, fmt):
+        """The job for this text and format if one was ever submitted, else None."""
+        with self._lock:
+            return self._jobs.get(self._key(text, fmt))
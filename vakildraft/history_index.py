@@ -0,0 +1,227 @@
+"""BM25 search over the past-draft CSVs shipped with the app.
+
+kerala_legal_history.csv (Date, Type, Draft) and case_history.csv (Date,
+Type, Facts, Full_Draft) are loaded into a SQLite FTS5 index on disk. The
+index is built once, and later refresh() calls only parse bytes appended
+since the last run, so the cost of keeping it current does not grow with
+the corpus. Doc ids are never reused (AUTOINCREMENT), so consumers that
+follow new rows by id (NearDupIndex.refresh) never skip one; a source
+that is truncated or rewritten is dropped and re-read, which bumps
+drops() so they know to start over.
+"""
+import csv
+import io
+import os
+import sqlite3
+import threading
+
+from vakildraft.text import terms
+
+# (file, column holding the draft text, optional facts column)
+DEFAULT_SOURCES = (
+    ("kerala_legal_history.csv", "Draft", None),
+    ("case_history.csv", "Full_Draft", "Facts"),
+)
+
+
+def iter_records(handle):
+    """Yield (record_bytes, end_offset) for each complete CSV record in a binary file.
+
+    A newline ends a record only when the quotes seen so far are balanced, so
+    drafts with embedded newlines stay whole. A trailing record without its
+    final newline is left for the next refresh.
+    """
+    buf = b""
+    while True:
+        line = handle.readline()
+        if not line:
+            return
+        buf += line
+        if not line.endswith(b"\n") or buf.count(b'"') % 2:
+            continue
+        yield buf, handle.tell()
+        buf = b""
+
+
+def match_query(text):
+    """Turn free text into an FTS5 OR query of quoted terms."""
+    unique = list(dict.fromkeys(terms(text)))
+    return " OR ".join(f'"{t}"' for t in unique[:64])
+
+
+class HistoryIndex:
+    def __init__(self, path="cache/history_index.sqlite", sources=DEFAULT_SOURCES):
+        self.path = path
+        self.sources = sources
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._migrate()
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, date TEXT, dtype TEXT, facts TEXT, body TEXT
+            );
+            CREATE INDEX IF NOT EXISTS docs_type_date ON docs(dtype, date);
+            CREATE INDEX IF NOT EXISTS docs_date ON docs(date);
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                facts, body, content='docs', content_rowid='id', tokenize='porter unicode61'
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                file TEXT PRIMARY KEY, header TEXT, offset INTEGER, size INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER);
+        """)
+        self._db.commit()
+
+    def _migrate(self):
+        # Indexes built before ids were AUTOINCREMENT: copy docs over keeping their ids (and so the FTS rowids)
+        row = self._db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'docs'").fetchone()
+        if row is None or "AUTOINCREMENT" in row[0].upper():
+            return
+        self._db.executescript("""
+            BEGIN;
+            CREATE TABLE docs_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, date TEXT, dtype TEXT, facts TEXT, body TEXT
+            );
+            INSERT INTO docs_new SELECT id, source, date, dtype, facts, body FROM docs;
+            DROP TABLE docs;
+            ALTER TABLE docs_new RENAME TO docs;
+            COMMIT;
+        """)
+
+    # ---------------------------------------------------
+    # INGEST
+    # ---------------------------------------------------
+    def refresh(self):
+        """Index rows appended since the last call. Returns the number of new rows."""
+        added = 0
+        with self._lock:
+            for file, body_col, facts_col in self.sources:
+                if os.path.exists(file):
+                    added += self._ingest(file, body_col, facts_col)
+            self._db.commit()
+        return added
+
+    def _ingest(self, file, body_col, facts_col):
+        size = os.path.getsize(file)
+        row = self._db.execute("SELECT header, offset, size FROM sources WHERE file = ?", (file,)).fetchone()
+        with open(file, "rb") as handle:
+            header_line = handle.readline()
+            header = next(csv.reader([header_line.decode("utf-8-sig")]))
+            if row is not None and row[2] == size and row[0] == ",".join(header):
+                return 0
+            if row is None or size < row[1] or row[0] != ",".join(header):
+                # New, truncated or rewritten file: start this source over
+                self._drop_source(file)
+                offset = handle.tell()
+            else:
+                offset = row[1]
+                handle.seek(offset)
+
+            added = 0
+            for record, end in iter_records(handle):
+                fields = next(csv.reader(io.StringIO(record.decode("utf-8", "replace"))), None)
+                offset = end
+                if not fields:
+                    continue
+                values = dict(zip(header, fields))
+                body = values.get(body_col, "")
+                if not body.strip():
+                    continue
+                facts = values.get(facts_col, "") if facts_col else ""
+                cur = self._db.execute(
+                    "INSERT INTO docs (source, date, dtype, facts, body) VALUES (?, ?, ?, ?, ?)",
+                    (file, values.get("Date", "")[:19], values.get("Type", "").strip(), facts, body),
+                )
+                self._db.execute(
+                    "INSERT INTO docs_fts (rowid, facts, body) VALUES (?, ?, ?)", (cur.lastrowid, facts, body)
+                )
+                added += 1
+
+        self._db.execute(
+            "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)", (file, ",".join(header), offset, size)
+        )
+        return added
+
+    def _drop_source(self, file):
+        dropped = self._db.execute("SELECT id, facts, body FROM docs WHERE source = ?", (file,)).fetchall()
+        for doc_id, facts, body in dropped:
+            self._db.execute(
+                "INSERT INTO docs_fts (docs_fts, rowid, facts, body) VALUES ('delete', ?, ?, ?)",
+                (doc_id, facts, body),
+            )
+        self._db.execute("DELETE FROM docs WHERE source = ?", (file,))
+        self._db.execute("DELETE FROM sources WHERE file = ?", (file,))
+        if dropped:
+            self._db.execute(
+                "INSERT INTO state VALUES ('drops', 1) ON CONFLICT(key) DO UPDATE SET value = value + 1"
+            )
+
+    def drops(self):
+        """How many times indexed docs have been dropped (a source truncated or rewritten)."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM state WHERE key = 'drops'").fetchone()
+        return row[0] if row else 0
+
+    # ---------------------------------------------------
+    # QUERY
+    # ---------------------------------------------------
+    def types(self):
+        with self._lock:
+            return [r[0] for r in self._db.execute("SELECT DISTINCT dtype FROM docs ORDER BY dtype")]
+
+    def search(self, text, dtypes=None, date_from=None, date_to=None, limit=10):
+        """BM25-ranked drafts matching text, optionally filtered by Type and date range.
+
+        Dates are ISO strings ("2026-02-16"); date_to is inclusive of that day.
+        """
+        query = match_query(text)
+        if not query:
+            return []
+        sql = [
+            "SELECT d.id, d.date, d.dtype, d.source,",
+            " snippet(docs_fts, 1, '**', '**', ' … ', 24), bm25(docs_fts, 0.5, 1.0) AS score",
+            " FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid WHERE docs_fts MATCH ?",
+        ]
+        args = [query]
+        if dtypes:
+            sql.append(f" AND d.dtype IN ({','.join('?' * len(dtypes))})")
+            args.extend(dtypes)
+        if date_from:
+            sql.append(" AND d.date >= ?")
+            args.append(str(date_from))
+        if date_to:
+            sql.append(" AND d.date < ?")
+            args.append(f"{date_to}~")
+        sql.append(" ORDER BY score LIMIT ?")
+        args.append(limit)
+        with self._lock:
+            rows = self._db.execute("".join(sql), args).fetchall()
+        return [
+            {"id": r[0], "date": r[1], "type": r[2], "source": r[3], "snippet": r[4], "score": round(-r[5], 2)}
+            for r in rows
+        ]
+
+    def get(self, doc_id):
+        with self._lock:
+            row = self._db.execute("SELECT body FROM docs WHERE id = ?", (doc_id,)).fetchone()
+        return row[0] if row else None
+
+    def doc(self, doc_id):
+        with self._lock:
+            row = self._db.execute("SELECT date, dtype, facts, body FROM docs WHERE id = ?", (doc_id,)).fetchone()
+        return dict(zip(("date", "type", "facts", "body"), row)) if row else None
+
+    def rows_since(self, last_id, limit=200):
+        """Docs indexed after last_id, oldest first, as (id, date, dtype, facts, body)."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, date, dtype, facts, body FROM docs WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+            ).fetchall()
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
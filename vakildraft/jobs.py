@@ -0,0 +1,182 @@
+"""Process-wide background queue for drafting jobs.
+
+A Draft or Mirror click submits a job and gets back its id. The job runs on
+a bounded thread pool while the session stays interactive, and the UI polls
+the job for its status, partial text and result. Each user has a
+concurrency limit: extra jobs wait in the queue, and free slots are
+handed out round-robin across users, so one advocate queueing ten
+petitions cannot starve the others. Finished jobs are kept (up to keep)
+for the jobs panel, but a job's text is handed over when its session
+collects it, so only uncollected results stay in memory.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from vakildraft.drafting import Cancelled
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class Job:
+    def __init__(self, user, label, fn, meta=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.user = user
+        self.label = label
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.partial = ""
+        self.result = None
+        self.tank = ""
+        self.timings = {}
+        self.error = ""
+        self.collected = False
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._fn = fn
+        self._cancel = threading.Event()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def set_partial(self, text):
+        self.partial = text
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return round((self.finished or time.time()) - self.started, 1)
+
+
+class JobQueue:
+    def __init__(self, max_workers=4, per_user=2, keep=200):
+        self.max_workers = max_workers
+        self.per_user = per_user
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="draft-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()   # id -> Job, oldest first
+        self._waiting = OrderedDict()   # user -> deque of queued jobs (round-robin order)
+        self._running = {}   # user -> count
+
+    # ---------------------------------------------------
+    # SUBMIT / CANCEL
+    # ---------------------------------------------------
+    def submit(self, user, label, fn, meta=None):
+        """Queue fn(job) to run for user. fn returns (text, tank, timings)."""
+        job = Job(user, label, fn, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._waiting.setdefault(user, deque()).append(job)
+            self._prune()
+        self._pump()
+        return job.id
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE:
+                return
+            job._cancel.set()
+            if job.status == QUEUED:
+                self._waiting[job.user].remove(job)
+                job.status = CANCELLED
+                job.finished = time.time()
+
+    # ---------------------------------------------------
+    # SCHEDULING
+    # ---------------------------------------------------
+    def _pump(self):
+        to_start = []
+        with self._lock:
+            busy = sum(self._running.values())
+            progress = True
+            while busy < self.max_workers and progress:
+                progress = False
+                for user in list(self._waiting):
+                    queue = self._waiting[user]
+                    if not queue:
+                        del self._waiting[user]
+                        continue
+                    if self._running.get(user, 0) >= self.per_user or busy >= self.max_workers:
+                        continue
+                    job = queue.popleft()
+                    # Rotate this user to the back so the next free slot goes to someone else
+                    self._waiting.move_to_end(user)
+                    self._running[user] = self._running.get(user, 0) + 1
+                    job.status = RUNNING
+                    job.started = time.time()
+                    to_start.append(job)
+                    busy += 1
+                    progress = True
+        for job in to_start:
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            text, tank, timings = job._fn(job)
+            job.result, job.tank, job.timings = text, tank, timings
+            if text:
+                job.status = DONE
+            else:
+                job.status = FAILED
+                job.error = f"No response ({tank})"
+        except Cancelled:
+            job.status = CANCELLED
+        except Exception as exc:
+            job.status = FAILED
+            job.error = str(exc)[:300]
+        finally:
+            job.partial = ""   # only shown while running; don't hold the text after it
+            job.finished = time.time()
+            with self._lock:
+                self._running[job.user] -= 1
+            self._pump()
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond keep
+        finished = [j for j in self._jobs.values() if j.status not in ACTIVE]
+        for job in finished[: max(0, len(self._jobs) - self.keep)]:
+            del self._jobs[job.id]
+
+    # ---------------------------------------------------
+    # POLLING
+    # ---------------------------------------------------
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def for_user(self, user):
+        """The user's jobs, newest first."""
+        with self._lock:
+            return [j for j in reversed(self._jobs.values()) if j.user == user]
+
+    def collect(self, user):
+        """(job, result) for finished, successful jobs not yet pulled into a session, oldest first.
+
+        The jobs are marked collected and let go of their result: the session owns it from here.
+        """
+        with self._lock:
+            ready = [j for j in self._jobs.values() if j.user == user and j.status == DONE and not j.collected]
+            handed = []
+            for job in ready:
+                job.collected = True
+                handed.append((job, job.result))
+                job.result = None
+            return handed
+
+    def position(self, job_id):
+        """How many jobs are ahead of a queued job in its user's queue (None if not queued)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return None
+            return list(self._waiting.get(job.user, ())).index(job)
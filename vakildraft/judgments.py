@@ -0,0 +1,443 @@
+"""Offline judgment corpus: sharded full-text search over court judgments.
+
+Judgment dumps (plain text, PDF, or JSONL exports of Kerala High Court and
+Supreme Court judgments) are split into paragraphs and indexed with SQLite
+FTS5, one shard file per (court, year):
+
+    corpus/judgments/catalog.sqlite        ingested files and shard sizes
+    corpus/judgments/kerala_hc/2023.sqlite  docs, paragraphs, paras_fts
+    corpus/judgments/sc/2023.sqlite
+
+A court or year filter therefore only opens the shards it names, the
+shards are searched in parallel (SQLite releases the GIL), and each shard
+is read through a memory map, so repeat queries are served from the page
+cache without read() calls. A query is run as an AND of its terms first
+and widened to OR only when that finds too few paragraphs. Hits come back
+one per judgment, best paragraph first, with the matched terms in **bold**.
+Ingest is incremental: files already seen with the same size and mtime
+are skipped, and a judgment already in its shard (same text) is not added
+twice.
+
+    python -m vakildraft.judgments ingest dumps/kerala_2023/ --court "Kerala High Court"
+    python -m vakildraft.judgments search "bail conditions breach" --from-year 2021
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from vakildraft.citations import extract_citations
+from vakildraft.text import terms
+
+# Display name (as in the research module) -> shard folder
+COURTS = {"Kerala High Court": "kerala_hc", "Supreme Court": "sc"}
+COURT_NAMES = {slug: name for name, slug in COURTS.items()}
+UNKNOWN_YEAR = 0
+
+COURT_PATTERNS = (
+    ("Supreme Court", re.compile(r"SUPREME\s+COURT\s+OF\s+INDIA|\bINSC\b", re.IGNORECASE)),
+    ("Kerala High Court", re.compile(r"HIGH\s+COURT\s+OF\s+KERALA|KERALA\s+HIGH\s+COURT|\d{4}:KER:\d+", re.IGNORECASE)),
+)
+# Neutral citations: 2024:KER:12345, 2023 INSC 512
+NEUTRAL = re.compile(r"\b((?:19|20)\d{2}):KER:\d+\b|\b((?:19|20)\d{2})\s+INSC\s+\d+\b")
+DATED = re.compile(
+    r"\b\d{1,2}(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?(?:January|February|March|April|May|June|July|August|"
+    r"September|October|November|December)[,\s]+((?:19|20)\d{2})\b|\b\d{1,2}[./-]\d{1,2}[./-]((?:19|20)\d{2})\b",
+    re.IGNORECASE,
+)
+TITLE = re.compile(r"\s(?:v\.|vs\.?|versus)\s", re.IGNORECASE)
+NUMBERED = re.compile(r"\n(?=\s*\(?\d{1,3}[.)]\s)")
+SEARCH_NOISE = re.compile(r"\bsite:\S+|\b(?:judgment|judgement|pdf)\b", re.IGNORECASE)
+
+
+def court_slug(court):
+    return COURTS.get(court) or re.sub(r"[^a-z0-9]+", "_", court.lower()).strip("_")
+
+
+def split_paragraphs(text, min_chars=200, max_chars=1500):
+    """Paragraphs by blank lines (or numbered paras in PDF text), small pieces merged, long ones cut."""
+    text = text.replace("\r\n", "\n")
+    pieces = re.split(r"\n\s*\n", text)
+    if len(pieces) < 3:
+        pieces = NUMBERED.split(text)
+    paragraphs, buf = [], ""
+    for piece in (" ".join(p.split()) for p in pieces):
+        if not piece:
+            continue
+        buf = f"{buf} {piece}".strip()
+        if len(buf) < min_chars:
+            continue
+        while len(buf) > max_chars:
+            # Cut at the last sentence end before max_chars
+            cut = buf.rfind(". ", 0, max_chars) + 1 or max_chars
+            paragraphs.append(buf[:cut].strip())
+            buf = buf[cut:].strip()
+        if buf:
+            paragraphs.append(buf)
+        buf = ""
+    if buf:
+        paragraphs.append(buf)
+    return paragraphs
+
+
+def describe(text, name=""):
+    """Best-effort (title, citation, court, year) from a judgment's opening text."""
+    head = text[:4000]
+    court = next((c for c, pattern in COURT_PATTERNS if pattern.search(head)), None)
+    citation, year = "", None
+    neutral = NEUTRAL.search(head)
+    if neutral:
+        citation, year = neutral.group(0), int(neutral.group(1) or neutral.group(2))
+    else:
+        found = extract_citations(head)
+        if found:
+            citation, year = found[0].normalized, int(found[0].year)
+    if year is None:
+        dated = DATED.search(text[:20000]) or DATED.search(text[-3000:])
+        if dated:
+            year = int(dated.group(1) or dated.group(2))
+    title = ""
+    for line in head.splitlines()[:60]:
+        line = " ".join(line.split())
+        if TITLE.search(line) and len(line) < 200:
+            title = line
+            break
+    return title or os.path.splitext(os.path.basename(name))[0], citation, court, year
+
+
+def read_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF ingest needs pypdf (pip install pypdf)") from None
+    reader = PdfReader(path)
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def fts_query(text, mode="AND"):
+    unique = list(dict.fromkeys(terms(SEARCH_NOISE.sub(" ", text))))[:32]
+    return f" {mode} ".join(f'"{t}"' for t in unique)
+
+
+class Shard:
+    """One (court, year) FTS5 file with its own connection and lock."""
+
+    def __init__(self, path, mmap_mb):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(f"""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA mmap_size={int(mmap_mb) * 2 ** 20};
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY, sha TEXT UNIQUE, title TEXT, citation TEXT, court TEXT, year INTEGER,
+                source TEXT, paragraphs INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS paras (id INTEGER PRIMARY KEY, doc INTEGER, n INTEGER, body TEXT, meta TEXT);
+            CREATE INDEX IF NOT EXISTS paras_doc ON paras(doc, n);
+            CREATE VIRTUAL TABLE IF NOT EXISTS paras_fts USING fts5(
+                body, meta, content='paras', content_rowid='id', tokenize='porter unicode61'
+            );
+        """)
+        # Title and citation words (meta, on each judgment's first paragraph) outweigh body words
+        self._db.execute("INSERT INTO paras_fts (paras_fts, rank) VALUES ('rank', 'bm25(1.0, 4.0)')")
+        self._db.commit()
+
+    def add(self, sha, title, citation, court, year, source, paragraphs):
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM docs WHERE sha = ?", (sha,)).fetchone():
+                return False
+            cur = self._db.execute(
+                "INSERT INTO docs (sha, title, citation, court, year, source, paragraphs) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha, title, citation, court, year, source, len(paragraphs)),
+            )
+            doc_id = cur.lastrowid
+            for n, body in enumerate(paragraphs):
+                meta = f"{title} {citation}" if n == 0 else ""
+                cur = self._db.execute(
+                    "INSERT INTO paras (doc, n, body, meta) VALUES (?, ?, ?, ?)", (doc_id, n, body, meta)
+                )
+                self._db.execute(
+                    "INSERT INTO paras_fts (rowid, body, meta) VALUES (?, ?, ?)", (cur.lastrowid, body, meta)
+                )
+            self._db.commit()
+            return True
+
+    def optimize(self):
+        with self._lock:
+            self._db.execute("INSERT INTO paras_fts (paras_fts) VALUES ('optimize')")
+            self._db.commit()
+
+    def search(self, query, limit):
+        """[(rank, para id, doc id)] for the best paragraphs, at most one per judgment."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT rank, p.id, p.doc FROM (SELECT rowid, rank FROM paras_fts WHERE paras_fts MATCH ?"
+                " ORDER BY rank LIMIT ?) AS top JOIN paras p ON p.id = top.rowid ORDER BY rank",
+                (query, limit * 4),
+            ).fetchall()
+        best = {}
+        for rank, para_id, doc_id in rows:
+            best.setdefault(doc_id, (rank, para_id, doc_id))
+        return list(best.values())[:limit]
+
+    def hits(self, query, picked):
+        """Full hit dicts (with highlighted snippets) for the chosen paragraph ids."""
+        if not picked:
+            return {}
+        ids = [para_id for _, para_id, _ in picked]
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT p.id, p.n, d.title, d.citation, d.court, d.year, d.paragraphs,"
+                " highlight(paras_fts, 0, '**', '**'), snippet(paras_fts, 0, '**', '**', ' … ', 40)"
+                " FROM paras_fts JOIN paras p ON p.id = paras_fts.rowid JOIN docs d ON d.id = p.doc"
+                f" WHERE paras_fts MATCH ? AND paras_fts.rowid IN ({','.join('?' * len(ids))})",
+                [query, *ids],
+            ).fetchall()
+        return {
+            r[0]: {
+                "para": r[0], "n": r[1] + 1, "title": r[2], "citation": r[3], "court": r[4], "year": r[5],
+                "paragraphs": r[6], "snippet": r[8] if "**" in r[8] else r[7][:300],
+            }
+            for r in rows
+        }
+
+    def paragraph(self, para_id, context=0):
+        """(title, citation, text of the paragraph plus context paragraphs either side)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT p.doc, p.n, d.title, d.citation FROM paras p JOIN docs d ON d.id = p.doc WHERE p.id = ?",
+                (para_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            doc_id, n, title, citation = row
+            bodies = [b for b, in self._db.execute(
+                "SELECT body FROM paras WHERE doc = ? AND n BETWEEN ? AND ? ORDER BY n",
+                (doc_id, n - context, n + context),
+            )]
+        return title, citation, "\n\n".join(bodies)
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT (SELECT COUNT(*) FROM docs), (SELECT COUNT(*) FROM paras)").fetchone()
+
+
+class JudgmentCorpus:
+    def __init__(self, path="corpus/judgments", mmap_mb=256, max_workers=4):
+        self.path = path
+        self.mmap_mb = mmap_mb
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="judgments")
+        self._lock = threading.Lock()
+        self._shards = {}   # (court slug, year) -> Shard
+        os.makedirs(path, exist_ok=True)
+        self._catalog = sqlite3.connect(os.path.join(path, "catalog.sqlite"), check_same_thread=False)
+        self._catalog.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, docs INTEGER);
+            CREATE TABLE IF NOT EXISTS shards (
+                court TEXT, year INTEGER, docs INTEGER, paras INTEGER, PRIMARY KEY (court, year)
+            );
+        """)
+        self._catalog.commit()
+
+    def _shard(self, court, year):
+        key = (court, year)
+        with self._lock:
+            if key not in self._shards:
+                folder = os.path.join(self.path, court)
+                os.makedirs(folder, exist_ok=True)
+                self._shards[key] = Shard(os.path.join(folder, f"{year}.sqlite"), self.mmap_mb)
+            return self._shards[key]
+
+    # ---------------------------------------------------
+    # INGEST
+    # ---------------------------------------------------
+    def add(self, text, title="", citation="", court=None, year=None, source=""):
+        """Index one judgment. Returns its paragraph count, or 0 if it was already indexed or empty."""
+        found_title, found_citation, found_court, found_year = describe(text, source)
+        court = court_slug(court or found_court or "unknown")
+        year = int(year or found_year or UNKNOWN_YEAR)
+        paragraphs = split_paragraphs(text)
+        if not paragraphs:
+            return 0
+        sha = hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+        added = self._shard(court, year).add(
+            sha, title or found_title, citation or found_citation, court, year, source, paragraphs
+        )
+        return len(paragraphs) if added else 0
+
+    def _records(self, path, court, year):
+        """(text, title, citation, court, year) for each judgment in one file."""
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        date_year = re.match(r"(?:19|20)\d{2}", str(row.get("date", "")))
+                        yield (
+                            row.get("text") or row.get("body") or "", row.get("title", ""), row.get("citation", ""),
+                            court or row.get("court"), year or row.get("year") or (date_year and date_year.group(0)),
+                        )
+        elif path.lower().endswith(".pdf"):
+            yield read_pdf(path), "", "", court, year
+        else:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield f.read(), "", "", court, year
+
+    def ingest(self, paths, court=None, year=None, log=None):
+        """Index .txt, .pdf and .jsonl files (folders are walked). Returns (files, judgments, paragraphs)."""
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.extend(os.path.join(root, n) for n in sorted(names))
+            else:
+                files.append(path)
+        done = docs = paras = 0
+        for path in files:
+            if not path.lower().endswith((".txt", ".pdf", ".jsonl")):
+                continue
+            stat = os.stat(path)
+            seen = self._catalog.execute("SELECT size, mtime FROM files WHERE path = ?", (path,)).fetchone()
+            if seen == (stat.st_size, stat.st_mtime):
+                continue
+            added = 0
+            for text, title, citation, rec_court, rec_year in self._records(path, court, year):
+                n = self.add(text, title, citation, rec_court, rec_year, source=os.path.basename(path))
+                added += n > 0
+                paras += n
+            docs += added
+            done += 1
+            self._catalog.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, stat.st_size, stat.st_mtime, added)
+            )
+            if log and done % 100 == 0:
+                log(f"{done} files, {docs} judgments, {paras} paragraphs")
+        self.finish()
+        return done, docs, paras
+
+    def finish(self):
+        """Merge every open shard's index segments, then record shard sizes in the catalog."""
+        with self._lock:
+            shards = list(self._shards.items())
+        for (court, year), shard in shards:
+            shard.optimize()
+            docs, paras = shard.count()
+            self._catalog.execute("INSERT OR REPLACE INTO shards VALUES (?, ?, ?, ?)", (court, year, docs, paras))
+        self._catalog.commit()
+
+    # ---------------------------------------------------
+    # SEARCH
+    # ---------------------------------------------------
+    def shards(self, courts=None, year_from=None, year_to=None):
+        """[(court slug, year)] matching the filters; unknown-year shards only without a year filter."""
+        sql, args = "SELECT court, year FROM shards WHERE paras > 0", []
+        if courts:
+            slugs = [court_slug(c) for c in courts]
+            sql += f" AND court IN ({','.join('?' * len(slugs))})"
+            args += slugs
+        if year_from:
+            sql += " AND year >= ?"
+            args.append(int(year_from))
+        if year_to:
+            sql += " AND year <= ? AND year > 0"
+            args.append(int(year_to))
+        with self._lock:
+            return self._catalog.execute(sql + " ORDER BY year DESC", args).fetchall()
+
+    def search(self, text, courts=None, year_from=None, year_to=None, limit=10):
+        """Best matching judgments for text, one hit (its best paragraph) each, best first.
+
+        Each hit: {"key", "title", "citation", "court", "year", "n", "paragraphs", "snippet", "score"};
+        pass hit["key"] to reference() to get it as a {title, citation, extract} reference.
+        """
+        keys = self.shards(courts, year_from, year_to)
+        if not keys:
+            return []
+        shards = [(key, self._shard(*key)) for key in keys]
+        for mode in ("AND", "OR"):
+            query = fts_query(text, mode)
+            if not query:
+                return []
+            found = list(self._pool.map(lambda item: (item[0], item[1].search(query, limit)), shards))
+            ranked = sorted(
+                ((rank, key, para_id) for key, picked in found for rank, para_id, _ in picked),
+                key=lambda r: r[0],
+            )[:limit]
+            if len(ranked) >= limit or mode == "OR":
+                break
+        by_shard = {}
+        for rank, key, para_id in ranked:
+            by_shard.setdefault(key, []).append((rank, para_id, None))
+        details = {key: self._shard(*key).hits(query, picked) for key, picked in by_shard.items()}
+        hits = []
+        for rank, key, para_id in ranked:
+            hit = details[key].get(para_id)
+            if hit:
+                hit.update(
+                    key=f"{key[0]}/{key[1]}/{para_id}", court=COURT_NAMES.get(key[0], key[0]),
+                    score=round(-rank, 2),
+                )
+                hits.append(hit)
+        return hits
+
+    def reference(self, key, context=1):
+        """A {title, citation, extract} entry for a hit key: the paragraph and its neighbours."""
+        court, year, para_id = key.split("/")
+        found = self._shard(court, int(year)).paragraph(int(para_id), context)
+        if found is None:
+            return None
+        title, citation, extract = found
+        return {"title": title, "citation": citation, "extract": extract}
+
+    def stats(self):
+        with self._lock:
+            shards, docs, paras = self._catalog.execute(
+                "SELECT COUNT(*), COALESCE(SUM(docs), 0), COALESCE(SUM(paras), 0) FROM shards"
+            ).fetchone()
+        return {"shards": shards, "judgments": docs, "paragraphs": paras}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline judgment corpus: ingest dumps and search them.")
+    parser.add_argument("--path", default="corpus/judgments", help="corpus folder")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="index .txt, .pdf and .jsonl judgment files or folders")
+    ingest.add_argument("paths", nargs="+")
+    ingest.add_argument("--court", help='court for files that do not say, e.g. "Kerala High Court"')
+    ingest.add_argument("--year", type=int, help="year for files that do not say")
+    search = sub.add_parser("search", help="search the corpus")
+    search.add_argument("query")
+    search.add_argument("--court", action="append", help="repeat for several courts")
+    search.add_argument("--from-year", type=int)
+    search.add_argument("--to-year", type=int)
+    search.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    corpus = JudgmentCorpus(args.path)
+    if args.command == "ingest":
+        start = time.time()
+        files, docs, paras = corpus.ingest(args.paths, args.court, args.year, log=print)
+        stats = corpus.stats()
+        print(f"{files} files, {docs} new judgments, {paras} paragraphs in {time.time() - start:.1f}s · "
+              f"corpus: {stats['judgments']} judgments, {stats['paragraphs']} paragraphs in {stats['shards']} shards")
+        return 0
+    start = time.time()
+    hits = corpus.search(args.query, args.court, args.from_year, args.to_year, args.limit)
+    for hit in hits:
+        print(f"{hit['score']:>7} {hit['court']} {hit['year']} · {hit['title']} {hit['citation']} "
+              f"(para {hit['n']}/{hit['paragraphs']})\n        {hit['snippet']}")
+    print(f"{len(hits)} hits in {(time.time() - start) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
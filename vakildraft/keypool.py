@@ -0,0 +1,279 @@
+"""Health-aware, hedged dispatch across the API_KEYS pool.
+
+One KeyPool is shared by every session (the app builds it with
+st.cache_resource). Each key keeps a latency EWMA, an error-rate EWMA, a
+429 cooldown and a circuit breaker. run() sends the call to the healthiest
+key and, if no answer arrives within hedge_delay, fires the same call on the
+next-best key and takes whichever succeeds first. Every attempt first takes
+a slot from the per-key request and token budgets in vakildraft.quota, so
+callers queue (fairly, per user) instead of running into 429s.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from vakildraft.quota import QuotaScheduler
+
+# ---------------------------------------------------
+# ERROR CLASSIFICATION
+# ---------------------------------------------------
+RATE_LIMIT = "rate_limit"
+AUTH = "auth"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+
+def classify_error(exc):
+    code = getattr(exc, "code", None)
+    text = str(exc)
+    if code == 429 or "RESOURCE_EXHAUSTED" in text:
+        return RATE_LIMIT
+    if code in (401, 403) or "API key not valid" in text or "PERMISSION_DENIED" in text:
+        return AUTH
+    if isinstance(exc, TimeoutError) or "timed out" in text.lower() or "Timeout" in type(exc).__name__:
+        return TIMEOUT
+    return ERROR
+
+
+# ---------------------------------------------------
+# PER-KEY HEALTH
+# ---------------------------------------------------
+class KeyHealth:
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self.latency = None          # EWMA of successful call time (s)
+        self.error_rate = 0.0        # EWMA of failures (0..1)
+        self.cooldown_until = 0.0    # set by 429s
+        self.breaker_until = 0.0     # set when the breaker opens
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.last_error = ""
+
+    def available(self, now):
+        return now >= self.cooldown_until and now >= self.breaker_until
+
+    def score(self, now):
+        # Unknown keys score 0 so a fresh key gets explored straight away
+        latency = self.latency if self.latency is not None else 0.0
+        return latency * (1 + 4 * self.error_rate) + self.in_flight
+
+
+class KeyPool:
+    def __init__(
+        self,
+        projects,
+        hedge_delay=4.0,
+        timeout=120.0,
+        cooldown=60.0,
+        breaker_threshold=3,
+        breaker_reset=300.0,
+        auth_reset=3600.0,
+        alpha=0.3,
+        max_workers=16,
+        rpm=None,
+        tpm=None,
+        limits=None,
+        output_reserve=2000,
+        period=60.0,
+    ):
+        self.keys = [KeyHealth(name, key) for name, key in projects]
+        # rpm/tpm apply to every key; limits={"name": {"rpm": .., "tpm": ..}} overrides per key
+        self.quota = QuotaScheduler([h.name for h in self.keys], rpm, tpm, limits, period)
+        self.output_reserve = output_reserve   # tokens reserved for the answer until its size is known
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.auth_reset = auth_reset
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="keypool")
+
+    # ---------------------------------------------------
+    # BOOKKEEPING
+    # ---------------------------------------------------
+    def _get(self, name):
+        for health in self.keys:
+            if health.name == name:
+                return health
+        return None
+
+    def ranked(self, exclude=()):
+        """Keys in dispatch order: healthy ones by score, then the rest as a last resort."""
+        now = time.time()
+        with self._lock:
+            pool = [h for h in self.keys if h.name not in exclude]
+            healthy = sorted(
+                (h for h in pool if h.available(now)), key=lambda h: h.score(now)
+            )
+            if healthy:
+                return healthy
+            # Every key is cooling down or broken: try the one that recovers first
+            return sorted(pool, key=lambda h: max(h.cooldown_until, h.breaker_until))[:1]
+
+    def report_success(self, name, elapsed):
+        with self._lock:
+            health = self._get(name)
+            if health is None:
+                return
+            health.calls += 1
+            health.consecutive_failures = 0
+            health.breaker_until = 0.0
+            health.error_rate *= 1 - self.alpha
+            if health.latency is None:
+                health.latency = elapsed
+            else:
+                health.latency += self.alpha * (elapsed - health.latency)
+
+    def report_failure(self, name, exc):
+        kind = classify_error(exc)
+        now = time.time()
+        with self._lock:
+            health = self._get(name)
+            if health is None:
+                return kind
+            health.calls += 1
+            health.failures += 1
+            health.last_error = f"{kind}: {exc}"[:200]
+            if kind == RATE_LIMIT:
+                # Quota exhaustion says nothing about the key's health
+                health.cooldown_until = now + self.cooldown
+                return kind
+            health.error_rate += self.alpha * (1 - health.error_rate)
+            health.consecutive_failures += 1
+            if kind == AUTH:
+                health.breaker_until = now + self.auth_reset
+            elif health.consecutive_failures >= self.breaker_threshold:
+                health.breaker_until = now + self.breaker_reset
+        return kind
+
+    def snapshot(self):
+        now = time.time()
+        budgets = self.quota.snapshot()
+        with self._lock:
+            return [
+                {
+                    "key": h.name,
+                    "latency_ewma_s": round(h.latency, 2) if h.latency is not None else None,
+                    "error_rate": round(h.error_rate, 2),
+                    "calls": h.calls,
+                    "failures": h.failures,
+                    "cooldown_s": max(0, round(h.cooldown_until - now)),
+                    "breaker": "open" if now < h.breaker_until else "closed",
+                    "in_flight": h.in_flight,
+                    "rpm_left": budgets[h.name]["rpm_left"],
+                    "tpm_left": budgets[h.name]["tpm_left"],
+                    "last_error": h.last_error,
+                }
+                for h in self.keys
+            ]
+
+    # ---------------------------------------------------
+    # DISPATCH
+    # ---------------------------------------------------
+    def expected_wait(self, tokens=0):
+        """Rough seconds before a call of this many prompt tokens would start."""
+        names = [h.name for h in self.ranked()]
+        return self.quota.expected_wait(tokens + self.output_reserve, names)
+
+    def settle(self, name, prompt_tokens, used_tokens):
+        """Swap the reservation made for a finished call for what it really used."""
+        self.quota.settle(name, prompt_tokens + self.output_reserve, used_tokens)
+
+    def _submit(self, fn, health, tokens):
+        with self._lock:
+            health.in_flight += 1
+        started = time.time()
+
+        def attempt():
+            try:
+                return fn(health.name, health.key)
+            finally:
+                with self._lock:
+                    health.in_flight -= 1
+
+        future = self._executor.submit(attempt)
+        future.key_name = health.name
+        future.started = started
+        future.tokens = tokens
+        return future
+
+    def _record(self, future):
+        exc = future.exception()
+        if exc is None:
+            self.report_success(future.key_name, time.time() - future.started)
+        else:
+            self.report_failure(future.key_name, exc)
+            # A failed call produced no answer: hand its token reservation back
+            self.quota.settle(future.key_name, future.tokens, 0)
+
+    def run(self, fn, exclude=(), on_discard=None, hedge=True, user=None, tokens=0, should_stop=None):
+        """Run fn(name, key) on the best key, hedging onto the next one.
+
+        tokens is the prompt size; output_reserve is added on top for the
+        answer. When every key is out of budget the call queues behind other
+        users' calls in round-robin order, until should_stop() turns true.
+        Returns (result, key_name), or (None, None) once every candidate has
+        failed, the overall timeout passes or the wait was stopped. A hedged
+        loser (or a straggler after a timeout) that succeeds late is handed to
+        on_discard, e.g. to close a stream nobody will read.
+        """
+        deadline = time.time() + self.timeout
+        tokens += self.output_reserve
+        tried = set()
+        pending = set()
+
+        def untried():
+            return [h.name for h in self.ranked(exclude) if h.name not in tried]
+
+        def settle(future):
+            self._record(future)
+            if future.exception() is None and on_discard:
+                on_discard(future.result())
+
+        def launch(name):
+            tried.add(name)
+            pending.add(self._submit(fn, self._get(name), tokens))
+
+        first = self.quota.acquire(user, tokens, untried, max(0.0, deadline - time.time()), should_stop)
+        if first is None:
+            return None, None
+        launch(first)
+
+        while pending:
+            can_hedge = hedge and self.hedge_delay is not None and len(pending) < 2
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            done, _ = wait(
+                pending,
+                timeout=min(self.hedge_delay, remaining) if can_hedge else remaining,
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                # Hedge only onto a key with budget to spare; never queue for one
+                name = self.quota.try_take(untried(), tokens) if can_hedge else None
+                if name is not None:
+                    launch(name)
+                continue
+            for future in done:
+                pending.discard(future)
+                if future.exception() is None:
+                    self._record(future)
+                    for other in pending:
+                        other.add_done_callback(settle)
+                    return future.result(), future.key_name
+                self._record(future)
+            if not pending:
+                name = self.quota.acquire(user, tokens, untried, max(0.0, deadline - time.time()), should_stop)
+                if name is not None:
+                    launch(name)
+
+        # Timed out: let stragglers still update health when they finish
+        for other in pending:
+            other.add_done_callback(settle)
+        return None, None
@@ -0,0 +1,83 @@
+"""Durable access-log store.
+
+Logins and logouts are rows in the shared access_logs table (see
+vakildraft.storage), so the audit trail survives restarts and every
+replica sees every session. Writes are queued and applied in batches by
+the storage writer thread; a logout that lands in the same batch as its
+login is folded into it. session_id is the key, so a logout is a single
+keyed update, and the admin view pages and filters in the backend
+instead of loading the whole table. Counts and filter choices are cached
+until the next login or logout on any replica.
+"""
+import csv
+import io
+import time
+
+COLUMNS = ("user", "login_time", "logout_time", "year")
+TABLE = "access_logs"
+TOPIC = "access_logs"
+
+
+class AccessLogStore:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def login(self, session_id, user, login_time, year):
+        self.storage.upsert(TABLE, {
+            "session_id": session_id, "user": user, "login_time": login_time, "logout_time": "Active",
+            "year": year, "login_ts": time.time(),
+        }, topic=TOPIC)
+
+    def logout(self, session_id, logout_time):
+        self.storage.update(TABLE, {"logout_time": logout_time}, {"session_id": session_id}, topic=TOPIC)
+
+    def flush(self, timeout=5.0):
+        """Block until every queued write has been committed (or timeout passes)."""
+        self.storage.flush(timeout)
+
+    # ---------------------------------------------------
+    # ADMIN QUERIES
+    # ---------------------------------------------------
+    @staticmethod
+    def _where(user, year):
+        where = {}
+        if user:
+            where["user"] = user
+        if year:
+            where["year"] = int(year)
+        return where
+
+    def _cached(self, key, load):
+        self.flush()
+        return self.storage.cached(TOPIC, key, load)
+
+    def count(self, user=None, year=None):
+        return self._cached(("count", user, year), lambda: self.storage.backend.count(TABLE, self._where(user, year)))
+
+    def query(self, user=None, year=None, page=0, page_size=50):
+        """One page of logs, newest first."""
+        rows = self._cached(("page", user, year, page, page_size), lambda: self.storage.backend.select(
+            TABLE, list(COLUMNS), self._where(user, year), order="login_ts", desc=True,
+            limit=page_size, offset=page * page_size,
+        ))
+        return [dict(r) for r in rows]
+
+    def users(self):
+        return self._cached(("users",), lambda: sorted({
+            r["user"] for r in self.storage.backend.select(TABLE, ["user"])
+        }))
+
+    def years(self):
+        return self._cached(("years",), lambda: sorted({
+            r["year"] for r in self.storage.backend.select(TABLE, ["year"])
+        }, reverse=True))
+
+    def to_csv(self, user=None, year=None):
+        self.flush()
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(("session_id",) + COLUMNS)
+        columns = ["session_id", *COLUMNS]
+        for row in self.storage.backend.select(TABLE, columns, self._where(user, year), order="login_ts"):
+            writer.writerow([row[c] for c in columns])
+        return out.getvalue().encode("utf-8")
@@ -0,0 +1,97 @@
+"""Process-wide timing spans with rolling latency percentiles.
+
+Every timed stage (prompt assembly, each key attempt, the model call as a
+whole, export rendering, full reruns) is recorded as a sample in a series
+keyed by (stage, model, key, outcome). Each series keeps only its last
+window samples, so p50/p95/p99 follow recent behaviour and memory stays
+flat. A slow or failing key shows up as its own row long before users
+notice.
+"""
+import csv
+import io
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from vakildraft.keypool import classify_error
+
+OK = "ok"
+COLUMNS = ["stage", "model", "key", "outcome", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms", "last_seen"]
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+class Series:
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.last = 0.0
+
+    def add(self, seconds, now):
+        self.samples.append(seconds)
+        self.count += 1
+        self.last = now
+
+
+class Metrics:
+    def __init__(self, window=500):
+        self.window = window
+        self._series = {}   # (stage, model, key, outcome) -> Series
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, model="", key="", outcome=OK):
+        now = time.time()
+        with self._lock:
+            series = self._series.get((stage, model, key, outcome))
+            if series is None:
+                series = self._series[(stage, model, key, outcome)] = Series(self.window)
+            series.add(seconds, now)
+
+    @contextmanager
+    def span(self, stage, model="", key=""):
+        """Time the block; an exception is recorded under its error class and re-raised."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as exc:
+            self.observe(stage, time.perf_counter() - start, model, key, classify_error(exc))
+            raise
+        self.observe(stage, time.perf_counter() - start, model, key)
+
+    def rows(self):
+        """One dict per series, slowest p95 first within each stage."""
+        with self._lock:
+            snapshot = [(labels, sorted(s.samples), s.count, s.last) for labels, s in self._series.items()]
+        rows = []
+        for (stage, model, key, outcome), ordered, count, last in snapshot:
+            rows.append({
+                "stage": stage,
+                "model": model,
+                "key": key,
+                "outcome": outcome,
+                "count": count,
+                "p50_ms": round(percentile(ordered, 0.50) * 1000),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000),
+                "max_ms": round(ordered[-1] * 1000) if ordered else 0,
+                "last_seen": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last)),
+            })
+        rows.sort(key=lambda r: (r["stage"], -r["p95_ms"]))
+        return rows
+
+    def to_csv(self):
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(self.rows())
+        return out.getvalue().encode("utf-8")
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
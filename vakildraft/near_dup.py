@@ -0,0 +1,295 @@
+"""Near-duplicate detection for past drafts with MinHash and LSH.
+
+Every text is reduced to a MinHash signature over its word 3-shingles and
+stored in SQLite with its LSH band buckets. A new text only gets compared
+with the entries that share at least one bucket with it, so adding or
+looking up a draft costs about the same whatever the corpus size, and
+clustering the whole corpus is linear in it. Near-identical entries (the
+same Legal Notice regenerated with a changed date) share a cluster.
+
+Entries live in scopes: "corpus" holds past draft bodies (deduplicated
+search results, the compacted canonical corpus), "request" holds the
+facts drafts were written from (the "similar drafts already exist" check).
+Rows stream in from HistoryIndex as they are appended to the CSVs:
+
+    python -m vakildraft.near_dup --out cache/history_canonical.csv
+"""
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import sys
+import threading
+import zlib
+
+from vakildraft.text import WORD
+
+CORPUS = "corpus"
+REQUEST = "request"
+
+PRIME = (1 << 61) - 1
+MAX_HASH = 0xFFFFFFFF
+
+
+def shingles(text, k=3):
+    words = WORD.findall(text.lower())
+    if len(words) < k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm=128, seed=1):
+        import numpy as np
+
+        rng = random.Random(seed)
+        # a, b < 2**32 and 32-bit shingle hashes keep a * x + b inside uint64
+        self._a = np.array([rng.randrange(1, MAX_HASH) for _ in range(num_perm)], dtype=np.uint64)[:, None]
+        self._b = np.array([rng.randrange(0, MAX_HASH) for _ in range(num_perm)], dtype=np.uint64)[:, None]
+        self.num_perm = num_perm
+
+    def signature(self, text):
+        """num_perm uint32 minimums, or None for a text without words."""
+        import numpy as np
+
+        found = shingles(text)
+        if not found:
+            return None
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in found), dtype=np.uint64, count=len(found))
+        return (((self._a * hashes + self._b) % PRIME) & MAX_HASH).min(axis=1).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float((sig_a == sig_b).mean())
+
+
+class NearDupIndex:
+    def __init__(self, path="cache/near_dup.sqlite", num_perm=128, bands=16, threshold=0.8):
+        """bands x rows = num_perm; 16 x 8 puts the LSH cut-off near 0.7, below threshold."""
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._hasher = None   # built (and numpy imported) on first use
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY, scope TEXT, ref TEXT, dtype TEXT, date TEXT, cluster INTEGER, sig BLOB,
+                UNIQUE(scope, ref)
+            );
+            CREATE INDEX IF NOT EXISTS entries_cluster ON entries(cluster);
+            CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket INTEGER, entry INTEGER);
+            CREATE INDEX IF NOT EXISTS bands_bucket ON bands(band, bucket);
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER);
+        """)
+        self._db.commit()
+
+    # ---------------------------------------------------
+    # LSH
+    # ---------------------------------------------------
+    def _signature(self, text):
+        if self._hasher is None:
+            self._hasher = MinHasher(self.num_perm)
+        return self._hasher.signature(text)
+
+    def _buckets(self, sig):
+        return [
+            (band, zlib.crc32(sig[band * self.rows:(band + 1) * self.rows].tobytes()))
+            for band in range(self.bands)
+        ]
+
+    def _matches(self, sig, scope, dtype=None):
+        """[(similarity, entry id, ref, dtype, date, cluster)] at or above threshold, best first."""
+        import numpy as np
+
+        ids = set()
+        for band, bucket in self._buckets(sig):
+            ids.update(r[0] for r in self._db.execute(
+                "SELECT entry FROM bands WHERE band = ? AND bucket = ?", (band, bucket)
+            ))
+        found = []
+        for entry_id in ids:
+            row = self._db.execute(
+                "SELECT ref, dtype, date, cluster, sig FROM entries WHERE id = ? AND scope = ?", (entry_id, scope)
+            ).fetchone()
+            if row is None or (dtype and row[1] != dtype):
+                continue
+            score = similarity(sig, np.frombuffer(row[4], dtype=np.uint32))
+            if score >= self.threshold:
+                found.append((score, entry_id, row[0], row[1], row[2], row[3]))
+        found.sort(key=lambda m: (-m[0], -m[1]))
+        return found
+
+    # ---------------------------------------------------
+    # INGEST
+    # ---------------------------------------------------
+    def _add(self, scope, ref, text, dtype, date):
+        if self._db.execute("SELECT 1 FROM entries WHERE scope = ? AND ref = ?", (scope, ref)).fetchone():
+            return False
+        sig = self._signature(text)
+        if sig is None:
+            return False
+        matches = self._matches(sig, scope)
+        cur = self._db.execute(
+            "INSERT INTO entries (scope, ref, dtype, date, sig) VALUES (?, ?, ?, ?, ?)",
+            (scope, ref, dtype, date, sig.tobytes()),
+        )
+        entry_id = cur.lastrowid
+        clusters = sorted({m[5] for m in matches})
+        cluster = clusters[0] if clusters else entry_id
+        # A text close to several clusters joins them into one
+        for other in clusters[1:]:
+            self._db.execute("UPDATE entries SET cluster = ? WHERE cluster = ?", (cluster, other))
+        self._db.execute("UPDATE entries SET cluster = ? WHERE id = ?", (cluster, entry_id))
+        self._db.executemany(
+            "INSERT INTO bands (band, bucket, entry) VALUES (?, ?, ?)",
+            [(band, bucket, entry_id) for band, bucket in self._buckets(sig)],
+        )
+        return True
+
+    def add(self, scope, ref, text, dtype="", date=""):
+        """Index one text under ref (e.g. "version:12"). Returns False if ref is known or text is empty."""
+        with self._lock:
+            added = self._add(scope, ref, text, dtype, date)
+            self._db.commit()
+        return added
+
+    def refresh(self, history_index, batch=200):
+        """Pull rows appended to the history CSVs since the last call. Returns how many were added.
+
+        When the history index has dropped docs since the last call (a CSV was
+        rewritten), every history entry is forgotten and the rows read again.
+        """
+        added = 0
+        drops = history_index.drops()
+        with self._lock:
+            seen = self._db.execute("SELECT value FROM state WHERE key = 'history_drops'").fetchone()
+            if drops != (seen[0] if seen else 0):
+                self._forget_history()
+                self._db.execute("INSERT OR REPLACE INTO state VALUES ('history_drops', ?)", (drops,))
+                self._db.execute("INSERT OR REPLACE INTO state VALUES ('history_id', 0)")
+                self._db.commit()
+            last = self._db.execute("SELECT value FROM state WHERE key = 'history_id'").fetchone()
+            last = last[0] if last else 0
+            while True:
+                rows = history_index.rows_since(last, batch)
+                if not rows:
+                    break
+                for doc_id, date, dtype, facts, body in rows:
+                    ref = f"history:{doc_id}"
+                    added += self._add(CORPUS, ref, body, dtype, date)
+                    if facts.strip():
+                        self._add(REQUEST, ref, facts, dtype, date)
+                    last = doc_id
+                self._db.execute("INSERT OR REPLACE INTO state VALUES ('history_id', ?)", (last,))
+                self._db.commit()
+        return added
+
+    def _forget_history(self):
+        self._db.execute(
+            "DELETE FROM bands WHERE entry IN (SELECT id FROM entries WHERE ref LIKE 'history:%')"
+        )
+        self._db.execute("DELETE FROM entries WHERE ref LIKE 'history:%'")
+
+    # ---------------------------------------------------
+    # QUERY
+    # ---------------------------------------------------
+    def similar(self, text, scope=REQUEST, dtype=None, limit=5):
+        """Entries whose text is near-identical to text: [{ref, similarity, dtype, date}], best first."""
+        with self._lock:
+            sig = self._signature(text)
+            if sig is None:
+                return []
+            matches = self._matches(sig, scope, dtype)
+        return [
+            {"ref": m[2], "similarity": round(m[0], 2), "dtype": m[3], "date": m[4]}
+            for m in matches[:limit]
+        ]
+
+    def clusters_of(self, refs, scope=CORPUS):
+        """{ref: cluster id} for the given refs (unknown refs are left out)."""
+        if not refs:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT ref, cluster FROM entries WHERE scope = ? AND ref IN ({','.join('?' * len(refs))})",
+                [scope, *refs],
+            ).fetchall()
+        return dict(rows)
+
+    def copies(self, cluster):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries WHERE cluster = ?", (cluster,)).fetchone()[0]
+
+    def canonical(self, scope=CORPUS):
+        """One (ref, copies) per cluster: its newest member, in cluster order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT cluster, ref, date, id FROM entries WHERE scope = ? ORDER BY cluster, date DESC, id DESC",
+                (scope,),
+            ).fetchall()
+        picked = {}
+        for cluster, ref, _, _ in rows:
+            if cluster in picked:
+                picked[cluster][1] += 1
+            else:
+                picked[cluster] = [ref, 1]
+        return [tuple(v) for v in picked.values()]
+
+    def stats(self, scope=CORPUS):
+        with self._lock:
+            entries, clusters = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT cluster) FROM entries WHERE scope = ?", (scope,)
+            ).fetchone()
+        return {"entries": entries, "clusters": clusters, "duplicates": entries - clusters}
+
+
+def write_canonical(index, history_index, path):
+    """Write one CSV row (Date, Type, Draft, Copies) per corpus cluster. Returns the row count."""
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Type", "Draft", "Copies"])
+        for ref, copies in index.canonical(CORPUS):
+            doc = history_index.doc(int(ref.split(":", 1)[1]))
+            if doc is not None:
+                writer.writerow([doc["date"], doc["type"], doc["body"], copies])
+                written += 1
+    return written
+
+
+def main(argv=None):
+    from vakildraft.history_index import HistoryIndex
+
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate past drafts and write a compacted corpus.")
+    parser.add_argument("--out", default="cache/history_canonical.csv", help="compacted corpus CSV")
+    parser.add_argument("--index", default="cache/near_dup.sqlite", help="signature database")
+    parser.add_argument("--threshold", type=float, default=0.8, help="estimated Jaccard similarity for a duplicate")
+    args = parser.parse_args(argv)
+
+    history = HistoryIndex()
+    history.refresh()
+    index = NearDupIndex(args.index, threshold=args.threshold)
+    added = index.refresh(history)
+    stats = index.stats(CORPUS)
+    rows = write_canonical(index, history, args.out)
+    print(f"{added} new drafts indexed · {stats['entries']} drafts in {stats['clusters']} clusters "
+          f"({stats['duplicates']} near-duplicates) · {rows} canonical drafts written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
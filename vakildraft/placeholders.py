@@ -0,0 +1,123 @@
+"""Placeholder mapping for the Live Editor.
+
+A table of placeholder -> value pairs (PARTY A, PARTY B, [Address],
+[Crime No.] ...) is applied in one pass over the draft with an
+Aho-Corasick automaton, so the cost depends on the draft's length, not on
+the number of rows. Overlapping hits resolve leftmost-longest ("PARTY AB"
+wins over "PARTY A"). Whole-word and ignore-case matching are optional.
+find_placeholders() lists what is still unmapped in a generated draft.
+"""
+import re
+from collections import deque
+from functools import lru_cache
+
+# PARTY A, [Name of the accused], <Date>, XXXX, ______ (but not the "[⚠ UNVERIFIED CITATION]" flag)
+PLACEHOLDER = re.compile(
+    r"\bPARTY [A-Z]\b"
+    r"|\[(?!⚠)[A-Za-z][^\[\]\n]{0,40}\]"
+    r"|<[A-Za-z][^<>\n]{0,40}>"
+    r"|\bX{3,}\b"
+    r"|_{4,}"
+)
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _fold(text):
+    # One char in, one char out, so offsets into the folded text match the original
+    return "".join(c.lower()[0] for c in text)
+
+
+class Automaton:
+    def __init__(self, patterns, ignore_case=False):
+        self.patterns = list(patterns)
+        self.ignore_case = ignore_case
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]   # pattern indices ending at each state (own + via fail links)
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in _fold(pattern) if ignore_case else pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].append(index)
+
+        # Breadth-first, so a state's fail target (always shallower) is final before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def matches(self, text):
+        """Every (start, end, pattern index) occurrence, in order of end position."""
+        goto, fail, out, lengths = self._goto, self._fail, self._out, [len(p) for p in self.patterns]
+        state = 0
+        for i, ch in enumerate(_fold(text) if self.ignore_case else text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in out[state]:
+                yield i + 1 - lengths[index], i + 1, index
+
+
+@lru_cache(maxsize=32)
+def _automaton(patterns, ignore_case):
+    return Automaton(patterns, ignore_case)
+
+
+def replace_all(text, mapping, whole_word=True, ignore_case=False):
+    """Apply every placeholder -> value pair in one pass.
+
+    Returns (new_text, counts) with counts keyed by placeholder. Rows with an
+    empty placeholder or value are skipped.
+    """
+    pairs = [(k, v) for k, v in mapping.items() if k and v]
+    counts = {k: 0 for k, _ in pairs}
+    if not pairs or not text:
+        return text, counts
+    patterns = tuple(k for k, _ in pairs)
+    automaton = _automaton(patterns, ignore_case)
+
+    hits = []
+    for start, end, index in automaton.matches(text):
+        if whole_word:
+            pattern = patterns[index]
+            if _is_word(pattern[0]) and start > 0 and _is_word(text[start - 1]):
+                continue
+            if _is_word(pattern[-1]) and end < len(text) and _is_word(text[end]):
+                continue
+        hits.append((start, -(end - start), index))
+    hits.sort()
+
+    out, pos = [], 0
+    for start, neg_length, index in hits:
+        if start < pos:
+            continue   # overlaps a hit already taken
+        out.append(text[pos:start])
+        out.append(pairs[index][1])
+        counts[patterns[index]] += 1
+        pos = start - neg_length
+    out.append(text[pos:])
+    return "".join(out), counts
+
+
+def find_placeholders(text):
+    """Unfilled placeholders in a draft with their counts, in order of first appearance."""
+    found = {}
+    for m in PLACEHOLDER.finditer(text):
+        found[m.group(0)] = found.get(m.group(0), 0) + 1
+    return found
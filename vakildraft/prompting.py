@@ -0,0 +1,266 @@
+"""Prompt assembly with token budgeting.
+
+The Draft Standard and Mirror Style prompts are built here instead of
+inline in the button handlers. Verified judgment extracts are deduplicated
+(exact copies, extracts contained in another, and near-identical
+overlaps). If they still exceed the reference budget, each extract is
+trimmed to its passages most relevant to the facts. Every plan carries
+a token breakdown (facts, references, DNA), which route_model() uses to
+pick between models. Standard
+drafts use the section headings from vakildraft.sections, and
+build_section_prompt() writes one of those sections on its own.
+"""
+import math
+import re
+
+from vakildraft.sections import HEADINGS, INPUTS, NAMES
+from vakildraft.text import estimate_tokens, terms
+
+SENTENCE_END = re.compile(r"(?<=[.;:?!])\s+|\n\s*\n")
+PASSAGE_WORDS = 80
+OVERLAP_JACCARD = 0.7
+GAP = " … "
+
+
+# ---------------------------------------------------
+# DEDUPLICATION
+# ---------------------------------------------------
+def _normalized(text):
+    return " ".join(text.lower().split())
+
+
+def _shingles(text, size=5):
+    words = _normalized(text).split()
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def dedupe_references(references):
+    """Drop references whose extract repeats, is contained in, or mostly overlaps another."""
+    kept = []
+    for ref in sorted(references, key=lambda r: len(r["extract"]), reverse=True):
+        text = _normalized(ref["extract"])
+        if not text:
+            continue
+        shingles = _shingles(text)
+        duplicate = False
+        for other, other_text, other_shingles in kept:
+            if text in other_text:
+                duplicate = True
+                break
+            overlap = len(shingles & other_shingles) / len(shingles | other_shingles)
+            if overlap >= OVERLAP_JACCARD:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append((ref, text, shingles))
+    # Preserve the order the advocate added them in
+    order = {id(r): i for i, r in enumerate(references)}
+    return sorted((k[0] for k in kept), key=lambda r: order[id(r)])
+
+
+# ---------------------------------------------------
+# RELEVANCE TRIMMING
+# ---------------------------------------------------
+def split_passages(text):
+    """Group sentences into passages of roughly PASSAGE_WORDS words."""
+    passages, current, words = [], [], 0
+    for sentence in SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        current.append(sentence)
+        words += len(sentence.split())
+        if words >= PASSAGE_WORDS:
+            passages.append(" ".join(current))
+            current, words = [], 0
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def _allocate(sizes, budget):
+    """Water-fill budget across items: small items keep everything, large ones share the rest."""
+    shares = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        fair = remaining // (len(sizes) - n)
+        shares[i] = min(sizes[i], fair)
+        remaining -= shares[i]
+    return shares
+
+
+def trim_extract(passages, weights, facts_terms, budget):
+    """Keep the highest-scoring passages within budget tokens, in their original order."""
+    def score(passage):
+        return sum(weights.get(t, 0.0) for t in set(terms(passage)) if t in facts_terms)
+
+    ranked = sorted(range(len(passages)), key=lambda i: (-score(passages[i]), i))
+    chosen, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(passages[i])
+        if used + cost > budget:
+            continue
+        chosen.append(i)
+        used += cost
+    if not chosen and passages:
+        # Even the best passage is too long: keep its head rather than nothing
+        best = passages[ranked[0]]
+        return best[: max(0, budget) * 4].rstrip() + GAP.rstrip()
+    chosen.sort()
+    out = []
+    for n, i in enumerate(chosen):
+        if n and i != chosen[n - 1] + 1:
+            out.append(GAP.strip())
+        out.append(passages[i])
+    return " ".join(out)
+
+
+def compact_references(references, facts, budget):
+    """Deduplicate references and fit their extracts into budget tokens.
+
+    Returns (references, stats) where references are new dicts with trimmed
+    extracts, in their original order.
+    """
+    refs = dedupe_references(references)
+    before = sum(estimate_tokens(r["extract"]) for r in references)
+    sizes = [estimate_tokens(r["extract"]) for r in refs]
+    if sum(sizes) <= budget:
+        compacted = [dict(r) for r in refs]
+    else:
+        facts_terms = set(terms(facts))
+        split = [split_passages(r["extract"]) for r in refs]
+        df = {}
+        for passages in split:
+            for passage in passages:
+                for t in set(terms(passage)):
+                    df[t] = df.get(t, 0) + 1
+        total = sum(len(p) for p in split) or 1
+        weights = {t: math.log(1 + total / n) for t, n in df.items()}
+        compacted = []
+        for ref, passages, share in zip(refs, split, _allocate(sizes, budget)):
+            ref = dict(ref)
+            if estimate_tokens(ref["extract"]) > share:
+                ref["extract"] = trim_extract(passages, weights, facts_terms, share)
+            compacted.append(ref)
+    stats = {
+        "references_in": len(references),
+        "references_kept": len(compacted),
+        "reference_tokens_before": before,
+        "reference_tokens": sum(estimate_tokens(r["extract"]) for r in compacted),
+    }
+    return compacted, stats
+
+
+# ---------------------------------------------------
+# PROMPTS
+# ---------------------------------------------------
+def references_block(references):
+    if not references:
+        return ""
+    text = "\nVerified Judgments:\n"
+    for ref in references:
+        text += f"""
+Case: {ref['title']}
+Citation: {ref['citation']}
+Extract:
+{ref['extract']}
+"""
+    return text
+
+
+def build_standard_prompt(dtype, court, district, facts, references, reference_budget=6000):
+    """The Draft Standard prompt plus a token breakdown.
+
+    The rules and the reference pack come first and the case last, so
+    prompt[:stats["prefix_chars"]] is the same for every draft against the
+    same references (the part worth context-caching).
+    """
+    refs, stats = compact_references(references, facts, reference_budget)
+    prefix = f"""
+IMPORTANT:
+Use ONLY the verified judgment extracts below.
+Do NOT create or assume any case law.
+If no verified extract is provided, do not cite case law.
+
+{references_block(refs)}
+
+STRICT RULES:
+- STRICTLY use PARTY A and PARTY B
+- Use exactly these section headings, each on its own line, in this order: {", ".join(HEADINGS[n] for n in NAMES)}
+"""
+    prompt = prefix + f"""
+Draft {dtype} for {court} at {district}.
+
+Facts:
+{facts}
+"""
+    stats.update(
+        facts_tokens=estimate_tokens(facts), dna_tokens=0, tokens=estimate_tokens(prompt), prefix_chars=len(prefix)
+    )
+    return prompt, stats
+
+
+SECTION_TASKS = {
+    "parties": "the cause title: the court, the case type with the number left blank, "
+               "PARTY A as petitioner and PARTY B as respondent with [Address] placeholders",
+    "facts": "a statement of facts in numbered paragraphs, based only on the facts below",
+    "grounds": "the grounds, lettered A, B, C ..., arguing from the facts and the verified extracts below",
+    "prayer": "the prayer: the reliefs sought from the court, in numbered clauses",
+    "verification": "the verification by PARTY A, with [Date] and [Place] placeholders",
+}
+
+
+def build_section_prompt(name, dtype, court, district, facts, references, reference_budget=6000):
+    """A prompt for one section of a Draft Standard petition, carrying only the inputs it depends on."""
+    fields = INPUTS[name]
+    where = f" for {court}" if "court" in fields else ""
+    where += f" at {district}" if "district" in fields else ""
+    stats = {"reference_tokens": 0}
+    # Same order as the standard prompt: the reference pack first, so it can share a context cache
+    prefix = ""
+    if "references" in fields:
+        refs, stats = compact_references(references, facts, reference_budget)
+        prefix = (
+            "Use ONLY the verified judgment extracts below. Do NOT create or assume any case law. "
+            "If no verified extract is provided, do not cite case law."
+            + references_block(refs) + "\n\n"
+        )
+    parts = [f"Write ONLY the {HEADINGS[name]} section of a {dtype}{where}: {SECTION_TASKS[name]}."]
+    if "facts" in fields:
+        parts.append(f"Facts:\n{facts}")
+    parts.append("STRICT RULES:\n- STRICTLY use PARTY A and PARTY B\n- No heading and no other sections")
+    prompt = prefix + "\n\n".join(parts) + "\n"
+    stats.update(facts_tokens=estimate_tokens(facts) if "facts" in fields else 0, dna_tokens=0,
+                 tokens=estimate_tokens(prompt), prefix_chars=len(prefix))
+    return prompt, stats
+
+
+def build_mirror_prompt(dtype, court, district, dna, dna_budget=1500):
+    """The Mirror Style prompt, with the Style DNA cut to dna_budget tokens."""
+    if estimate_tokens(dna) > dna_budget:
+        dna = dna[: dna_budget * 4].rsplit("\n", 1)[0]
+    prefix = f"Style DNA:\n{dna}\n\n"
+    prompt = prefix + f"Draft {dtype} for {court} at {district}. Use PARTY A/B."
+    stats = {
+        "facts_tokens": 0, "dna_tokens": estimate_tokens(dna), "tokens": estimate_tokens(prompt),
+        "prefix_chars": len(prefix),
+    }
+    return prompt, stats
+
+
+def route_model(stats, choice="Auto-Pilot", pro_threshold_tokens=300, pro_context_tokens=2000):
+    """Auto-Pilot's pick from a prompt's token breakdown; any other choice is used as-is.
+
+    Only what the advocate supplies counts, not the fixed instructions around
+    it. pro is used when the facts alone exceed pro_threshold_tokens (300 is
+    the old 1200-character facts rule) or when facts, compacted references
+    and Style DNA together exceed pro_context_tokens.
+    """
+    if choice != "Auto-Pilot":
+        return choice
+    facts = stats.get("facts_tokens", 0)
+    content = facts + stats.get("reference_tokens", 0) + stats.get("dna_tokens", 0)
+    if facts > pro_threshold_tokens or content > pro_context_tokens:
+        return "gemini-2.5-pro"
+    return "gemini-2.5-flash"
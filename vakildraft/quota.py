@@ -0,0 +1,205 @@
+"""Per-key request and token budgets shared by every session.
+
+Each API key gets two token buckets, one for requests per minute and one
+for tokens per minute. acquire() takes a slot on the first key (in the
+caller's preference order) whose buckets can cover the call. When none
+can, the caller waits in a per-user queue. Queues are served round-robin
+across users, so twenty advocates arriving at once share the keys instead
+of piling onto the first one and failing over together. A limit left as
+None is not enforced.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+# The server clocks a call when it arrives, a little after we send it: hold each
+# slot this share of the period longer so our window never closes before theirs
+SLACK = 0.02
+
+
+class TokenBucket:
+    """A minute's allowance; whatever a call takes flows back in one period later.
+
+    That matches how the per-minute quotas are counted on the server (a
+    rolling window), so a burst after an idle minute goes out at once and a
+    steady load never runs ahead of the server's own count. A continuously
+    refilling bucket would let up to twice the quota into one window.
+    """
+
+    def __init__(self, per_minute=None, period=60.0):
+        self.capacity = per_minute
+        self.period = period * (1 + SLACK)
+        self.taken = deque()   # [time, amount] still inside the window
+
+    def _expire(self, now):
+        while self.taken and now - self.taken[0][0] >= self.period:
+            self.taken.popleft()
+
+    def level(self, now):
+        if self.capacity is None:
+            return None
+        self._expire(now)
+        return self.capacity - sum(amount for _, amount in self.taken)
+
+    def wait(self, amount, now):
+        """Seconds until amount can be taken (0 if it can now)."""
+        if self.capacity is None:
+            return 0.0
+        # A call bigger than the whole allowance only has to wait for an empty window
+        short = min(amount, self.capacity) - self.level(now)
+        if short <= 0:
+            return 0.0
+        for started, taken in self.taken:
+            short -= taken
+            if short <= 0:
+                return max(0.0, started + self.period - now)
+        return self.period
+
+    def take(self, amount, now):
+        if self.capacity is not None:
+            self.taken.append([now, amount])
+
+    def adjust(self, reserved, used):
+        """Replace the newest reservation of reserved with what the call really used."""
+        for entry in reversed(self.taken):
+            if entry[1] == reserved:
+                entry[1] = used
+                return
+
+
+class QuotaScheduler:
+    STOP_POLL = 0.25   # seconds between should_stop checks while a call waits for budget
+
+    def __init__(self, names, rpm=None, tpm=None, limits=None, period=60.0):
+        """limits optionally overrides per key: {"name": {"rpm": 15, "tpm": 1000000}}."""
+        limits = limits or {}
+        self.period = period
+        self.buckets = {}
+        for name in names:
+            own = limits.get(name, {})
+            self.buckets[name] = (
+                TokenBucket(own.get("rpm", rpm), period),
+                TokenBucket(own.get("tpm", tpm), period),
+            )
+        self._cond = threading.Condition()
+        self._waiting = OrderedDict()   # user -> deque of tickets, served round-robin
+        self.waited = 0
+        self.granted = 0
+
+    # ---------------------------------------------------
+    # ADMISSION
+    # ---------------------------------------------------
+    def _key_wait(self, name, tokens, now):
+        requests, budget = self.buckets[name]
+        return max(requests.wait(1, now), budget.wait(tokens, now))
+
+    def _take(self, name, tokens, now):
+        requests, budget = self.buckets[name]
+        requests.take(1, now)
+        budget.take(tokens, now)
+
+    def try_take(self, names, tokens):
+        """Take a slot on the first of names with budget now, without queueing. Returns the name or None."""
+        now = time.time()
+        with self._cond:
+            if self._waiting:
+                return None   # queued callers go first
+            for name in names:
+                if name in self.buckets and self._key_wait(name, tokens, now) == 0:
+                    self._take(name, tokens, now)
+                    self.granted += 1
+                    return name
+        return None
+
+    def _head(self):
+        for queue in self._waiting.values():
+            if queue:
+                return queue[0]
+        return None
+
+    def acquire(self, user, tokens, order, timeout, should_stop=None):
+        """Block until a key from order() can take the call, then take it.
+
+        order is called on every attempt so the caller's ranking (health,
+        cooldowns) stays current. Returns the key name, or None on timeout,
+        when order() runs out of keys, or once should_stop() turns true
+        (checked at least every STOP_POLL seconds while waiting).
+        """
+        ticket = object()
+        deadline = time.time() + timeout
+        with self._cond:
+            queue = self._waiting.setdefault(user, deque())
+            queue.append(ticket)
+            try:
+                queued = False
+                while True:
+                    if should_stop and should_stop():
+                        return None
+                    now = time.time()
+                    wait = 0.5
+                    if self._head() is ticket:
+                        names = [n for n in order() if n in self.buckets]
+                        if not names:
+                            return None
+                        waits = {n: self._key_wait(n, tokens, now) for n in names}
+                        ready = [n for n in names if waits[n] == 0]
+                        if ready:
+                            self._take(ready[0], tokens, now)
+                            self.granted += 1
+                            self.waited += queued
+                            queue.popleft()
+                            # This user goes to the back of the round-robin
+                            self._waiting.move_to_end(user)
+                            return ready[0]
+                        wait = min(waits.values())
+                    queued = True
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    if should_stop:
+                        wait = min(wait, self.STOP_POLL)
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                if ticket in queue:
+                    queue.remove(ticket)
+                if not queue and self._waiting.get(user) is queue:
+                    del self._waiting[user]
+                self._cond.notify_all()
+
+    def settle(self, name, reserved_tokens, used_tokens):
+        """Correct a token reservation once the real size of the call is known."""
+        if name not in self.buckets:
+            return
+        with self._cond:
+            self.buckets[name][1].adjust(reserved_tokens, used_tokens)
+            self._cond.notify_all()
+
+    # ---------------------------------------------------
+    # REPORTING
+    # ---------------------------------------------------
+    def queued(self):
+        with self._cond:
+            return sum(len(q) for q in self._waiting.values())
+
+    def expected_wait(self, tokens=0, names=None):
+        """Rough seconds a new call of this size would wait, given who is already queued."""
+        now = time.time()
+        with self._cond:
+            names = [n for n in (names or self.buckets) if n in self.buckets]
+            if not names:
+                return 0.0
+            ahead = sum(len(q) for q in self._waiting.values())
+            soonest = min(self._key_wait(n, tokens, now) for n in names)
+            # Each queued call ahead of us needs one request slot somewhere in the pool
+            capacities = [self.buckets[n][0].capacity for n in names]
+            if ahead and all(capacities):
+                return max(soonest, ahead * self.period / sum(capacities))
+            return soonest
+
+    def snapshot(self):
+        now = time.time()
+        with self._cond:
+            return {
+                name: {"rpm_left": requests.level(now), "tpm_left": budget.level(now)}
+                for name, (requests, budget) in self.buckets.items()
+            }
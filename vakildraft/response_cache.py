@@ -0,0 +1,152 @@
+"""Content-addressed cache for LLM responses.
+
+Entries are keyed by a hash of (model, normalized prompt). A small
+in-memory LRU sits in front of a SQLite file on disk, so identical keyword
+and draft requests come back in milliseconds, survive restarts, and cost no
+quota. Both tiers expire entries after ttl seconds; the memory tier is
+bounded by entry count and the disk tier by total size.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    # Indentation and blank lines from f-string templates should not split the cache
+    return " ".join(prompt.split())
+
+
+def cache_key(model, prompt):
+    return hashlib.sha256(f"{model}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path="cache/responses.sqlite",
+        max_items=256,
+        max_disk_mb=200,
+        ttl=7 * 24 * 3600,
+        purge_every=50,
+    ):
+        self.path = path
+        self.max_items = max_items
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()   # key -> (stored_at, text)
+        self._lock = threading.Lock()
+        self._puts = 0
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, stored_at REAL, last_access REAL,"
+            " size INTEGER, value TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_access ON responses(last_access)")
+        self._db.commit()
+
+    # ---------------------------------------------------
+    # LOOKUP / STORE
+    # ---------------------------------------------------
+    def get(self, model, prompt):
+        key = cache_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT stored_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[0] <= self.ttl:
+                self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[1]
+            if row is not None:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, model, prompt, text):
+        if not text:
+            return
+        key = cache_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, text)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, now, now, len(text.encode("utf-8")), text),
+            )
+            self._db.commit()
+            self._puts += 1
+            if self._puts % self.purge_every == 0:
+                self._purge(now)
+
+    def _remember(self, key, stored_at, text):
+        self._memory[key] = (stored_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    # ---------------------------------------------------
+    # EVICTION
+    # ---------------------------------------------------
+    def _purge(self, now):
+        self._db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_disk_bytes:
+            # Drop least recently used rows until we are back under budget
+            excess = total - self.max_disk_bytes
+            freed = 0
+            doomed = []
+            for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                doomed.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            rows, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 2) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": rows,
+                "disk_mb": round(size / (1024 * 1024), 2),
+            }
@@ -0,0 +1,94 @@
+"""Petitions as named sections, so a change only redrafts what it touches.
+
+Every draft is written under the fixed headings in SECTIONS. Each section
+depends on a subset of the case (dtype, court, district, facts,
+references), and input_hashes() fingerprints those subsets. Comparing
+the fingerprints a draft was written from with the current case gives the
+sections to regenerate. merge() splices the new bodies into the editor
+text and keeps every other section, manual edits included, as it was.
+Drafts without the headings (Mirror drafts, past drafts) cannot be
+redrafted by section: merge() refuses them rather than append a second
+copy of the petition.
+"""
+import hashlib
+import json
+import re
+
+# (name, heading, case fields the section is written from)
+SECTIONS = (
+    ("parties", "CAUSE TITLE AND PARTIES", ("dtype", "court", "district")),
+    ("facts", "STATEMENT OF FACTS", ("dtype", "facts")),
+    ("grounds", "GROUNDS", ("dtype", "court", "facts", "references")),
+    ("prayer", "PRAYER", ("dtype", "court", "facts")),
+    ("verification", "VERIFICATION", ("dtype", "district")),
+)
+NAMES = tuple(name for name, _, _ in SECTIONS)
+HEADINGS = {name: heading for name, heading, _ in SECTIONS}
+INPUTS = {name: fields for name, _, fields in SECTIONS}
+
+# Bump when the section prompts change, so old fingerprints stop matching
+PROMPT_VERSION = 1
+
+# A heading line, allowing the markdown and numbering models like to add: "## 3. GROUNDS:"
+_HEADING = re.compile(
+    r"^[#*\s]*(?:[0-9IVX]+[.)]\s*)?(" + "|".join(re.escape(h) for h in HEADINGS.values()) + r")[\s:*]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_BY_HEADING = {heading: name for name, heading in HEADINGS.items()}
+
+
+def input_hashes(case):
+    """{section name: fingerprint of the case fields it depends on}."""
+    hashes = {}
+    for name in NAMES:
+        inputs = {field: case.get(field) for field in INPUTS[name]}
+        blob = json.dumps([PROMPT_VERSION, name, inputs], sort_keys=True, ensure_ascii=False)
+        hashes[name] = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+    return hashes
+
+
+def changed_sections(written_from, case):
+    """Sections whose inputs changed since the draft was written (all of them if that is unknown)."""
+    current = input_hashes(case)
+    return [name for name in NAMES if written_from.get(name) != current[name]]
+
+
+def split_sections(text):
+    """(preamble, {name: body}) for the headings found in text; later repeats of a heading win."""
+    matches = list(_HEADING.finditer(text))
+    preamble = text[: matches[0].start()] if matches else text
+    bodies = {}
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        bodies[_BY_HEADING[m.group(1).upper()]] = text[m.end():end].strip("\n")
+    return preamble.strip("\n"), bodies
+
+
+def is_sectioned(text):
+    """True if text has at least one of the fixed headings."""
+    return bool(text) and _HEADING.search(text) is not None
+
+
+def stitch(preamble, bodies):
+    parts = [preamble] if preamble else []
+    parts += [f"{HEADINGS[name]}\n\n{bodies[name].strip()}" for name in NAMES if name in bodies]
+    return "\n\n".join(parts) + "\n"
+
+
+def merge(text, updates):
+    """text with the given section bodies replaced (or added in their place); the rest untouched.
+
+    Raises ValueError when text has none of the headings: there is nothing to
+    replace, and appending the sections would duplicate the petition.
+    """
+    preamble, bodies = split_sections(text)
+    if updates and not bodies:
+        raise ValueError("draft has no section headings to merge into")
+    bodies.update(updates)
+    return stitch(preamble, bodies)
+
+
+def section_body(name, text):
+    """A generated section without the heading the model may have repeated."""
+    _, bodies = split_sections(text)
+    return bodies.get(name, text).strip()
@@ -0,0 +1,260 @@
+"""Per-session memory accounting and a shared, spillable blob store.
+
+Long texts a session keeps between reruns (the current draft, reference
+extracts, a past draft used as Style DNA) are put once into a
+content-addressed BlobStore shared by every session in the process, and
+session state keeps only the sha256 handle. The same past draft or
+judgment extract opened by several advocates is held once. Recently used
+blobs stay in memory up to memory_mb; beyond that the least recently
+used are spilled to a SQLite file and read back on their next get. Blobs
+are reference counted per session and dropped when no session holds them.
+
+SessionMemory records each session's footprint on every rerun (the size
+of its session state plus the blobs it holds), spills the blobs of
+sessions idle for idle_spill seconds, forgets sessions idle for
+expire_after, and lets an admin evict a session by hand: its blobs go to
+disk and the session drops its regenerable caches on its next rerun.
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def footprint(value, _seen=None):
+    """Approximate bytes held by a value: strings, bytes and nested containers of them."""
+    if isinstance(value, (str, bytes, bytearray)):
+        return sys.getsizeof(value)
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(footprint(k, seen) + footprint(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(footprint(v, seen) for v in value)
+    return size
+
+
+def process_rss():
+    """Resident set size of this process in bytes (Linux), or None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class BlobStore:
+    def __init__(self, path=None, memory_mb=64):
+        # One scratch file per process: blobs belong to live sessions and die with them
+        self.path = path or os.path.join("cache", f"session_blobs-{os.getpid()}.sqlite")
+        self.memory_bytes = int(memory_mb * 1024 * 1024)
+        self.spilled = 0
+        self.loaded = 0
+        self._memory = OrderedDict()   # handle -> text, least recently used first
+        self._sizes = {}               # handle -> bytes, for every live blob
+        self._owners = {}              # handle -> set of session ids
+        self._held = {}                # session id -> set of handles
+        self._on_disk = set()          # handles with a row in the spill file (kept after a read-back)
+        self._in_memory = 0
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE blobs (handle TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+    def put(self, owner, text):
+        """Store text for a session and return its handle ("" for empty text)."""
+        if not text:
+            return ""
+        handle = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if handle not in self._sizes:
+                self._sizes[handle] = sys.getsizeof(text)
+                self._remember(handle, text)
+            elif handle in self._memory:
+                self._memory.move_to_end(handle)
+            self._owners.setdefault(handle, set()).add(owner)
+            self._held.setdefault(owner, set()).add(handle)
+        return handle
+
+    def get(self, handle):
+        """The text for a handle, read back from disk if it was spilled; None if it was released."""
+        if not handle:
+            return ""
+        with self._lock:
+            text = self._memory.get(handle)
+            if text is not None:
+                self._memory.move_to_end(handle)
+                return text
+            if handle not in self._sizes:
+                return None
+            row = self._db.execute("SELECT value FROM blobs WHERE handle = ?", (handle,)).fetchone()
+            if row is None:
+                return None
+            self.loaded += 1
+            self._remember(handle, row[0])
+            return row[0]
+
+    def _remember(self, handle, text):
+        self._memory[handle] = text
+        self._in_memory += self._sizes[handle]
+        # Spill least recently used blobs; the one just used stays even if it alone is over budget
+        while self._in_memory > self.memory_bytes and len(self._memory) > 1:
+            self._spill(next(iter(self._memory)))
+
+    def _spill(self, handle):
+        text = self._memory.pop(handle)
+        self._in_memory -= self._sizes[handle]
+        if handle not in self._on_disk:
+            self._db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?)", (handle, text))
+            self._db.commit()
+            self._on_disk.add(handle)
+        self.spilled += 1
+
+    def spill(self, owner):
+        """Move every blob a session holds out of memory."""
+        with self._lock:
+            for handle in self._held.get(owner, ()):
+                if handle in self._memory:
+                    self._spill(handle)
+
+    def keep(self, owner, handles):
+        """Release the session's blobs that are not in handles (the ones its state still refers to)."""
+        with self._lock:
+            stale = self._held.get(owner, set()) - set(handles)
+            for handle in stale:
+                self._release(owner, handle)
+
+    def release(self, owner):
+        with self._lock:
+            for handle in list(self._held.get(owner, ())):
+                self._release(owner, handle)
+            self._held.pop(owner, None)
+
+    def _release(self, owner, handle):
+        self._held[owner].discard(handle)
+        owners = self._owners.get(handle, set())
+        owners.discard(owner)
+        if owners:
+            return
+        self._owners.pop(handle, None)
+        if handle in self._memory:
+            self._memory.pop(handle)
+            self._in_memory -= self._sizes[handle]
+        # A blob read back into memory still has its row on disk
+        if handle in self._on_disk:
+            self._on_disk.discard(handle)
+            self._db.execute("DELETE FROM blobs WHERE handle = ?", (handle,))
+            self._db.commit()
+        del self._sizes[handle]
+
+    def held(self, owner):
+        """(bytes in memory, bytes on disk) of the blobs a session holds."""
+        with self._lock:
+            handles = self._held.get(owner, ())
+            memory = sum(self._sizes[h] for h in handles if h in self._memory)
+            return memory, sum(self._sizes[h] for h in handles) - memory
+
+    def stats(self):
+        with self._lock:
+            return {
+                "blobs": len(self._sizes),
+                "memory_bytes": self._in_memory,
+                "disk_bytes": sum(self._sizes.values()) - self._in_memory,
+                "spilled": self.spilled,
+                "loaded": self.loaded,
+            }
+
+
+class SessionMemory:
+    def __init__(self, store, idle_spill=900, expire_after=7 * 24 * 3600):
+        self.store = store
+        self.idle_spill = idle_spill
+        self.expire_after = expire_after
+        self._sessions = {}   # session id -> {"user", "seen", "state", "spilled", "evicted"}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id, user):
+        """Mark a session active at the start of its rerun; True if an admin evicted it since the last one."""
+        with self._lock:
+            session = self._sessions.setdefault(session_id, {"state": {}, "evicted": False})
+            session.update(user=user, seen=time.time(), spilled=False)
+            evicted, session["evicted"] = session["evicted"], False
+        self._housekeep()
+        return evicted
+
+    def measure(self, session_id, state, handles):
+        """Record the size of each session-state key and release blobs the state no longer refers to."""
+        sizes = {key: footprint(value) for key, value in state.items()}
+        self.store.keep(session_id, handles)
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id]["state"] = sizes
+
+    def _housekeep(self):
+        now = time.time()
+        with self._lock:
+            idle = [(sid, s) for sid, s in self._sessions.items() if now - s["seen"] > self.idle_spill]
+        for session_id, session in idle:
+            if now - session["seen"] > self.expire_after:
+                self.forget(session_id)
+            elif not session["spilled"]:
+                self.store.spill(session_id)
+                with self._lock:
+                    session["spilled"] = True
+
+    def evict(self, session_id):
+        self.store.spill(session_id)
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id].update(spilled=True, evicted=True)
+
+    def evict_idle(self, seconds):
+        """Evict every session idle for at least seconds; returns how many."""
+        now = time.time()
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if now - s["seen"] >= seconds]
+        for session_id in idle:
+            self.evict(session_id)
+        return len(idle)
+
+    def forget(self, session_id):
+        """Drop a session (reset or expired) and release its blobs."""
+        self.store.release(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def usage(self):
+        """One row per session, largest first."""
+        now = time.time()
+        with self._lock:
+            sessions = [(sid, dict(s)) for sid, s in self._sessions.items()]
+        rows = []
+        for session_id, session in sessions:
+            in_memory, on_disk = self.store.held(session_id)
+            state = session["state"]
+            largest = max(state, key=state.get, default="")
+            rows.append({
+                "session": session_id,
+                "user": session["user"],
+                "state_kb": round(sum(state.values()) / 1024, 1),
+                "blobs_memory_kb": round(in_memory / 1024, 1),
+                "blobs_disk_kb": round(on_disk / 1024, 1),
+                "largest_key": f"{largest} ({state[largest] / 1024:.1f} KB)" if largest else "",
+                "idle_s": round(now - session["seen"]),
+                "spilled": session["spilled"],
+            })
+        return sorted(rows, key=lambda r: r["state_kb"] + r["blobs_memory_kb"], reverse=True)
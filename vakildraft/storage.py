@@ -0,0 +1,755 @@
+"""Shared storage for access logs, the style vault and saved drafts.
+
+Every replica of the app reads and writes the same tables and files through
+one Storage, backed either by SQLite files and folders on this host
+(LocalBackend, the default) or by Supabase tables and a Storage bucket
+(SupabaseBackend), so a login, an upload or a saved draft on one replica
+is visible from all of them. Storage adds three things on top of a backend:
+
+- read-through caching: cached(topic, key, load) answers repeat reads
+  (listings, counts, history pages) from memory until the topic changes;
+- batched writes: upsert()/update() go to one writer thread that merges
+  them into as few backend calls as it can. A batch the backend refuses
+  is retried with exponential backoff; if it still fails it is appended
+  to a local journal file (shared by the worker processes on a host under
+  a file lock), and the journal is replayed (before any newer write, so
+  order is kept) once the backend answers again;
+- change notifications: every write appends (topic, origin) to the
+  changes table, and one watcher thread per process reads new rows every
+  watch_interval seconds and drops the cached reads of those topics. The
+  cost is one small query per process per interval, whatever the number
+  of sessions, instead of every rerun checking the backend.
+
+For Supabase, create the tables once with the SQL from
+
+    python -m vakildraft.storage --schema
+
+and a private Storage bucket per name in buckets (default "vault").
+"""
+import argparse
+import base64
+import contextlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:   # Windows: one process per host, nothing to lock against
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# table -> columns (name, type), conflict key, indexes. "id" columns are assigned by the backend.
+TABLES = {
+    "access_logs": {
+        "columns": (
+            ("session_id", "text"), ("user", "text"), ("login_time", "text"), ("logout_time", "text"),
+            ("year", "integer"), ("login_ts", "real"),
+        ),
+        "key": "session_id",
+        "indexes": (("user", "year", "login_ts"), ("year", "login_ts"), ("login_ts",)),
+    },
+    "versions": {
+        "columns": (
+            ("id", "id"), ("user", "text"), ("label", "text"), ("kind", "text"), ("created", "real"),
+            ("parent", "integer"), ("encoding", "text"), ("depth", "integer"), ("payload", "blob"),
+            ("chars", "integer"), ("sha", "text"), ("stored", "integer"),
+        ),
+        "key": "id",
+        "indexes": (("user", "id"),),
+    },
+    "vault_files": {
+        "columns": (("name", "text"), ("sha", "text"), ("size", "integer"), ("uploaded", "real")),
+        "key": "name",
+        "indexes": (),
+    },
+    "changes": {
+        "columns": (("seq", "id"), ("topic", "text"), ("origin", "text"), ("at", "real")),
+        "key": "seq",
+        "indexes": (("at",),),
+    },
+}
+
+# Columns added after a table first shipped, with how to fill them in on an existing SQLite file
+BACKFILL = {("versions", "stored"): "length(payload)"}
+
+# AUTOINCREMENT: ids handed out (version ids in sessions, change seqs) are never reused after a delete
+SQLITE_TYPES = {
+    "id": "INTEGER PRIMARY KEY AUTOINCREMENT", "text": "TEXT", "integer": "INTEGER", "real": "REAL", "blob": "BLOB",
+}
+POSTGRES_TYPES = {
+    "id": "BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY", "text": "TEXT", "integer": "BIGINT",
+    "real": "DOUBLE PRECISION", "blob": "TEXT",   # base64 over PostgREST
+}
+OPERATORS = {"=": "eq", "<": "lt", "<=": "lte", ">": "gt", ">=": "gte"}
+
+
+def conditions(where):
+    """[(column, op, value)] from a {column: value} dict (equality) or a list of triples."""
+    if not where:
+        return []
+    if isinstance(where, dict):
+        return [(column, "=", value) for column, value in where.items()]
+    return list(where)
+
+
+def schema_sql():
+    """Postgres DDL for the Supabase backend."""
+    statements = []
+    for table, spec in TABLES.items():
+        columns = ", ".join(f'"{name}" {POSTGRES_TYPES[kind]}' for name, kind in spec["columns"])
+        if dict(spec["columns"])[spec["key"]] != "id":
+            columns += f', PRIMARY KEY ("{spec["key"]}")'
+        statements.append(f'CREATE TABLE IF NOT EXISTS "{table}" ({columns});')
+        for n, index in enumerate(spec["indexes"]):
+            cols = ", ".join(f'"{c}"' for c in index)
+            statements.append(f'CREATE INDEX IF NOT EXISTS "{table}_{n}" ON "{table}" ({cols});')
+    return "\n".join(statements)
+
+
+# ---------------------------------------------------
+# LOCAL: SQLITE + FOLDERS
+# ---------------------------------------------------
+class LocalBackend:
+    """SQLite files and folders on this host, shared by its worker processes (WAL mode).
+
+    Tables can live in separate files (files maps table -> path, the rest go
+    to path) and buckets map to folders, so data written before the storage
+    layer existed is picked up where it already is.
+    """
+
+    name = "local"
+
+    def __init__(self, path="data/shared.sqlite", files=None, buckets=None, blob_dir="data/blobs"):
+        self.files = {"access_logs": "data/access_logs.sqlite", "versions": "data/drafts.sqlite"}
+        self.files.update(files or {})
+        self.path = path
+        self.buckets = {"vault": "private_vault"}
+        self.buckets.update(buckets or {})
+        self.blob_dir = blob_dir
+        self._dbs = {}    # path -> (connection, lock)
+        for table in TABLES:
+            self._create(table)
+
+    def _db(self, table):
+        path = self.files.get(table, self.path)
+        if path not in self._dbs:
+            folder = os.path.dirname(path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._dbs[path] = (db, threading.Lock())
+        return self._dbs[path]
+
+    def _create(self, table):
+        spec = TABLES[table]
+        db, lock = self._db(table)
+        with lock, db:
+            columns = [f'"{name}" {SQLITE_TYPES[kind]}' for name, kind in spec["columns"]]
+            if dict(spec["columns"])[spec["key"]] != "id":
+                columns.append(f'PRIMARY KEY ("{spec["key"]}")')
+            db.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({", ".join(columns)})')
+            have = {row[1] for row in db.execute(f'PRAGMA table_info("{table}")')}
+            for name, kind in spec["columns"]:
+                if name not in have:
+                    db.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {SQLITE_TYPES[kind]}')
+                    if (table, name) in BACKFILL:
+                        db.execute(f'UPDATE "{table}" SET "{name}" = {BACKFILL[(table, name)]}')
+            for n, index in enumerate(spec["indexes"]):
+                cols = ", ".join(f'"{c}"' for c in index)
+                db.execute(f'CREATE INDEX IF NOT EXISTS "{table}_{n}" ON "{table}" ({cols})')
+
+    @staticmethod
+    def _where(where):
+        clauses, args = [], []
+        for column, op, value in conditions(where):
+            if op not in OPERATORS:
+                raise ValueError(f"unsupported operator {op!r}")
+            clauses.append(f'"{column}" {op} ?')
+            args.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    # ---------------------------------------------------
+    # ROWS
+    # ---------------------------------------------------
+    def insert(self, table, rows):
+        """Insert rows and return their new ids."""
+        db, lock = self._db(table)
+        ids = []
+        with lock, db:
+            for row in rows:
+                cols = ", ".join(f'"{c}"' for c in row)
+                cur = db.execute(f'INSERT INTO "{table}" ({cols}) VALUES ({", ".join("?" * len(row))})',
+                                 list(row.values()))
+                ids.append(cur.lastrowid)
+        return ids
+
+    def upsert(self, table, rows, key):
+        if not rows:
+            return
+        db, lock = self._db(table)
+        columns = list(rows[0])
+        cols = ", ".join(f'"{c}"' for c in columns)
+        updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c != key)
+        sql = (f'INSERT INTO "{table}" ({cols}) VALUES ({", ".join("?" * len(columns))}) '
+               f'ON CONFLICT ("{key}") DO UPDATE SET {updates}')
+        with lock, db:
+            db.executemany(sql, [[row[c] for c in columns] for row in rows])
+
+    def update(self, table, values, where):
+        db, lock = self._db(table)
+        sets = ", ".join(f'"{c}" = ?' for c in values)
+        clause, args = self._where(where)
+        with lock, db:
+            db.execute(f'UPDATE "{table}" SET {sets}{clause}', list(values.values()) + args)
+
+    def delete(self, table, where):
+        db, lock = self._db(table)
+        clause, args = self._where(where)
+        with lock, db:
+            db.execute(f'DELETE FROM "{table}"{clause}', args)
+
+    def select(self, table, columns=None, where=None, order=None, desc=False, limit=None, offset=0):
+        db, lock = self._db(table)
+        columns = columns or [name for name, _ in TABLES[table]["columns"]]
+        clause, args = self._where(where)
+        cols = ", ".join(f'"{c}"' for c in columns)
+        sql = f'SELECT {cols} FROM "{table}"{clause}'
+        if order:
+            sql += f' ORDER BY "{order}"' + (" DESC" if desc else "")
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            args += [-1 if limit is None else limit, offset]
+        with lock:
+            rows = db.execute(sql, args).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def count(self, table, where=None):
+        db, lock = self._db(table)
+        clause, args = self._where(where)
+        with lock:
+            return db.execute(f'SELECT COUNT(*) FROM "{table}"{clause}', args).fetchone()[0]
+
+    # ---------------------------------------------------
+    # FILES
+    # ---------------------------------------------------
+    def _folder(self, bucket):
+        folder = self.buckets.get(bucket) or os.path.join(self.blob_dir, bucket)
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def put_blob(self, bucket, name, data):
+        path = os.path.join(self._folder(bucket), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get_blob(self, bucket, name):
+        try:
+            with open(os.path.join(self._folder(bucket), name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def list_blobs(self, bucket):
+        folder = self._folder(bucket)
+        return [n for n in os.listdir(folder) if os.path.isfile(os.path.join(folder, n))]
+
+
+# ---------------------------------------------------
+# SUPABASE: POSTGREST TABLES + STORAGE BUCKETS
+# ---------------------------------------------------
+class SupabaseBackend:
+    """The same tables in Supabase Postgres (via PostgREST) and files in Storage buckets.
+
+    client is a callable returning the Supabase client, so the SDK is only
+    imported when storage is first touched. blob columns travel as base64.
+    """
+
+    name = "supabase"
+    PAGE = 1000   # PostgREST's default max rows per response
+
+    def __init__(self, client, buckets=None):
+        self._client = client
+        self.buckets = {"vault": "vault"}
+        self.buckets.update(buckets or {})
+
+    @staticmethod
+    def _encode(table, row):
+        kinds = dict(TABLES[table]["columns"])
+        return {
+            c: base64.b64encode(v).decode("ascii") if kinds.get(c) == "blob" and v is not None else v
+            for c, v in row.items()
+        }
+
+    @staticmethod
+    def _decode(table, row):
+        kinds = dict(TABLES[table]["columns"])
+        return {c: base64.b64decode(v) if kinds.get(c) == "blob" and v is not None else v for c, v in row.items()}
+
+    @staticmethod
+    def _filter(query, where):
+        for column, op, value in conditions(where):
+            if op not in OPERATORS:
+                raise ValueError(f"unsupported operator {op!r}")
+            query = getattr(query, OPERATORS[op])(column, value)
+        return query
+
+    # ---------------------------------------------------
+    # ROWS
+    # ---------------------------------------------------
+    def insert(self, table, rows):
+        key = TABLES[table]["key"]
+        res = self._client().table(table).insert([self._encode(table, r) for r in rows]).execute()
+        return [r[key] for r in res.data]
+
+    def upsert(self, table, rows, key):
+        if rows:
+            self._client().table(table).upsert([self._encode(table, r) for r in rows], on_conflict=key).execute()
+
+    def update(self, table, values, where):
+        self._filter(self._client().table(table).update(self._encode(table, values)), where).execute()
+
+    def delete(self, table, where):
+        self._filter(self._client().table(table).delete(), where).execute()
+
+    def select(self, table, columns=None, where=None, order=None, desc=False, limit=None, offset=0):
+        columns = columns or [name for name, _ in TABLES[table]["columns"]]
+        rows = []
+        # Page through the PostgREST row cap so "everything" really is everything
+        while True:
+            want = self.PAGE if limit is None else min(self.PAGE, limit - len(rows))
+            query = self._filter(self._client().table(table).select(",".join(columns)), where)
+            if order:
+                query = query.order(order, desc=desc)
+            start = offset + len(rows)
+            page = query.range(start, start + want - 1).execute().data
+            rows.extend(page)
+            if len(page) < want or (limit is not None and len(rows) >= limit):
+                break
+        return [self._decode(table, r) for r in rows]
+
+    def count(self, table, where=None):
+        key = TABLES[table]["key"]
+        return self._filter(self._client().table(table).select(key, count="exact", head=True), where).execute().count
+
+    # ---------------------------------------------------
+    # FILES
+    # ---------------------------------------------------
+    def _bucket(self, bucket):
+        return self._client().storage.from_(self.buckets.get(bucket, bucket))
+
+    def put_blob(self, bucket, name, data):
+        self._bucket(bucket).upload(name, data, {"upsert": "true", "content-type": "application/octet-stream"})
+
+    def get_blob(self, bucket, name):
+        try:
+            return self._bucket(bucket).download(name)
+        except Exception:
+            return None   # storage raises for a missing object
+
+    def list_blobs(self, bucket):
+        names, offset = [], 0
+        while True:
+            page = self._bucket(bucket).list("", {"limit": self.PAGE, "offset": offset})
+            # Folders come back as entries without an id
+            names.extend(item["name"] for item in page if item.get("id"))
+            if len(page) < self.PAGE:
+                return names
+            offset += self.PAGE
+
+
+# ---------------------------------------------------
+# CACHE, WRITE QUEUE AND CHANGE FEED
+# ---------------------------------------------------
+class Storage:
+    def __init__(
+        self, backend, flush_interval=1.0, batch_size=100, watch_interval=2.0, cache_ttl=300.0, changes_keep=86400.0,
+        retries=4, retry_backoff=0.5, retry_max=30.0, journal="data/storage_journal.jsonl",
+    ):
+        """cache_ttl bounds how long a read is trusted without a change notification (writes made
+        outside Storage, e.g. a file copied into the vault folder); changes_keep is how long the
+        changes table keeps rows. A failed batch is retried up to retries times, waiting
+        retry_backoff seconds and doubling up to retry_max, then appended to journal."""
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.watch_interval = watch_interval
+        self.cache_ttl = cache_ttl
+        self.changes_keep = changes_keep
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.retry_max = retry_max
+        self.journal = journal
+        self.origin = uuid.uuid4().hex    # this process, so the watcher skips its own writes
+        self._cache = {}                  # (topic, key) -> (value, loaded at)
+        self._generation = {}             # topic -> bumped on every change
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._flushed = threading.Condition()
+        self._started = False
+        self._seen = None                 # last change seq applied
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.batches = 0
+        self.notified = 0
+        self.failures = 0                 # backend calls that raised, retries included
+        self.journaled = 0                # writes waiting in the journal
+        self.replayed = 0
+
+    def _start(self):
+        # Threads start on first use, so building a Storage touches neither the network nor the SDKs
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._write_loop, name="storage-writer", daemon=True).start()
+        threading.Thread(target=self._watch_loop, name="storage-watcher", daemon=True).start()
+
+    # ---------------------------------------------------
+    # READ-THROUGH CACHE
+    # ---------------------------------------------------
+    def cached(self, topic, key, load):
+        """load()'s result, reused until topic changes here or on another replica. Do not mutate it."""
+        self._start()
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get((topic, key))
+            if entry is not None and now - entry[1] < self.cache_ttl:
+                self.hits += 1
+                return entry[0]
+            generation = self._generation.get(topic, 0)
+            self.misses += 1
+        value = load()
+        with self._lock:
+            # A change that landed while loading makes this value stale already
+            if self._generation.get(topic, 0) == generation:
+                self._cache[(topic, key)] = (value, now)
+        return value
+
+    def invalidate(self, topic):
+        with self._lock:
+            self._generation[topic] = self._generation.get(topic, 0) + 1
+            for entry in [k for k in self._cache if k[0] == topic]:
+                del self._cache[entry]
+
+    # ---------------------------------------------------
+    # BATCHED WRITES
+    # ---------------------------------------------------
+    def upsert(self, table, row, topic=None):
+        """Queue an insert-or-replace of row (by the table's key)."""
+        self._start()
+        self._pending.put(("upsert", table, dict(row), topic))
+
+    def update(self, table, values, where, topic=None):
+        """Queue an update of the rows matching where."""
+        self._start()
+        self._pending.put(("update", table, (dict(values), where), topic))
+
+    def publish(self, topic):
+        """Announce a change made directly on the backend: drop local reads now, tell other replicas."""
+        self._start()
+        self.invalidate(topic)
+        self._pending.put(("publish", None, None, topic))
+
+    def flush(self, timeout=5.0):
+        """Block until every queued write has been applied (or timeout passes)."""
+        end = time.time() + timeout
+        with self._flushed:
+            while self._pending.unfinished_tasks and time.time() < end:
+                self._flushed.wait(timeout=max(0, end - time.time()))
+
+    def _write_loop(self):
+        # Writes left in the journal by an earlier run go out before anything queued now
+        try:
+            with self._journal_lock():
+                self.journaled = len(self._read_journal())
+        except Exception:
+            logger.exception("Could not read the storage journal %s", self.journal)
+        while True:
+            try:
+                # While writes wait in the journal, wake up now and then to replay them
+                batch = [self._pending.get(timeout=self.retry_max if self.journaled else None)]
+            except queue.Empty:
+                try:
+                    self._replay()
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Could not replay the storage journal %s", self.journal)
+                continue
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._pending.get(timeout=max(0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except Exception:
+                # The journal could not be written either (disk full, permissions): the writer must live on
+                self.failures += 1
+                logger.exception(
+                    "Lost %d storage writes: neither the backend nor %s took them", len(batch), self.journal
+                )
+            finally:
+                with self._flushed:
+                    for _ in batch:
+                        self._pending.task_done()
+                    self._flushed.notify_all()
+
+    def _commit(self, batch):
+        """Apply a batch, retrying with backoff; journal it if the backend keeps refusing."""
+        for topic in {op[3] for op in batch if op[3] and op[0] != "publish"}:
+            self.invalidate(topic)
+        # Behind writes already in the journal, a batch has to wait its turn there
+        if self.journaled and not self._replay():
+            self._write_journal(batch)
+            return
+        delay = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            try:
+                self._apply(batch)
+                break
+            except Exception:
+                self.failures += 1
+                if attempt == self.retries:
+                    logger.exception("Storage backend refused %d writes; journaled to %s", len(batch), self.journal)
+                    self._write_journal(batch)
+                    return
+                logger.warning("Storage write failed, retrying in %.1fs", delay, exc_info=True)
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+        self._announce(batch)
+
+    def _announce(self, batch):
+        topics = {op[3] for op in batch if op[3]}
+        if not topics:
+            return
+        try:
+            now = time.time()
+            self.backend.insert("changes", [{"topic": t, "origin": self.origin, "at": now} for t in sorted(topics)])
+        except Exception:
+            logger.exception("Could not announce changes to %s", ", ".join(sorted(topics)))
+
+    # ---------------------------------------------------
+    # JOURNAL OF WRITES THE BACKEND REFUSED
+    # ---------------------------------------------------
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return {"__b64__": base64.b64encode(value).decode("ascii")}
+        if isinstance(value, dict):
+            return {k: Storage._encode(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [Storage._encode(v) for v in value]
+        return value
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, dict):
+            if set(value) == {"__b64__"}:
+                return base64.b64decode(value["__b64__"])
+            return {k: Storage._decode(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [Storage._decode(v) for v in value]
+        return value
+
+    @contextlib.contextmanager
+    def _journal_lock(self):
+        # Every worker process on the host shares the journal: hold the lock from read to remove
+        folder = os.path.dirname(self.journal)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        with open(self.journal + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_journal(self, batch):
+        with self._journal_lock():
+            with open(self.journal, "a", encoding="utf-8") as f:
+                for op in batch:
+                    f.write(json.dumps(self._encode(list(op))) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.journaled += len(batch)
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal):
+            return []
+        batch = []
+        with open(self.journal, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    batch.append(tuple(self._decode(json.loads(line))))
+                except ValueError:
+                    # A line cut short by a crash mid-append; the ones before it are intact
+                    logger.warning("Skipping a damaged line in %s", self.journal)
+        return batch
+
+    def _replay(self):
+        """Send the journaled writes (this process's and any other's) in one go. True if the journal is now empty."""
+        with self._journal_lock():
+            batch = self._read_journal()
+            if batch:
+                try:
+                    self._apply(batch)
+                except Exception:
+                    self.failures += 1
+                    logger.warning(
+                        "Storage backend still unavailable; %d writes wait in %s", len(batch), self.journal
+                    )
+                    return False
+                if os.path.exists(self.journal):
+                    os.remove(self.journal)
+        self.journaled = 0
+        if batch:
+            self._announce(batch)
+            self.replayed += len(batch)
+            logger.info("Replayed %d journaled storage writes", len(batch))
+        return True
+
+    def _apply(self, batch):
+        """Run a batch in order, one backend call per run of upserts into the same table."""
+        table, rows = None, {}
+
+        def send():
+            if rows:
+                self.backend.upsert(table, list(rows.values()), TABLES[table]["key"])
+                self.batches += 1
+
+        for op, op_table, payload, _ in batch:
+            if op == "publish":
+                continue
+            key = TABLES[op_table]["key"]
+            if op == "upsert":
+                if op_table != table:
+                    send()
+                    table, rows = op_table, {}
+                # The last write for a key wins (Postgres refuses the same key twice in one upsert)
+                rows[payload[key]] = payload
+                continue
+            values, where = payload
+            match = conditions(where)
+            # An update of a row still waiting in this batch is folded into its upsert (login + logout)
+            if op_table == table and len(match) == 1 and match[0][:2] == (key, "=") and match[0][2] in rows:
+                rows[match[0][2]].update(values)
+                continue
+            send()
+            table, rows = None, {}
+            self.backend.update(op_table, values, where)
+            self.batches += 1
+        send()
+        # Counted once the whole batch is through, so a retried batch is not counted twice
+        self.writes += sum(1 for op in batch if op[0] != "publish")
+
+    # ---------------------------------------------------
+    # CHANGE FEED
+    # ---------------------------------------------------
+    def _watch_loop(self):
+        next_trim = 0.0
+        while True:
+            try:
+                self.poll()
+                if time.time() >= next_trim:
+                    self.backend.delete("changes", [("at", "<", time.time() - self.changes_keep)])
+                    next_trim = time.time() + 3600
+            except Exception:
+                logger.warning("Storage change feed unavailable", exc_info=True)
+            time.sleep(self.watch_interval)
+
+    def poll(self):
+        """Apply changes other replicas announced since the last poll. Returns the topics dropped."""
+        if self._seen is None:
+            last = self.backend.select("changes", ["seq"], order="seq", desc=True, limit=1)
+            self._seen = last[0]["seq"] if last else 0
+            return set()
+        rows = self.backend.select(
+            "changes", ["seq", "topic", "origin"], [("seq", ">", self._seen)], order="seq", limit=1000
+        )
+        topics = set()
+        for row in rows:
+            self._seen = row["seq"]
+            if row["origin"] != self.origin:
+                topics.add(row["topic"])
+        for topic in topics:
+            self.invalidate(topic)
+        self.notified += len(topics)
+        return topics
+
+    def stats(self):
+        with self._lock:
+            cached = len(self._cache)
+        return {
+            "backend": self.backend.name,
+            "cached_reads": cached,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "write_calls": self.batches,
+            "queued": self._pending.unfinished_tasks,
+            "remote_changes": self.notified,
+            "failures": self.failures,
+            "journaled": self.journaled,
+            "replayed": self.replayed,
+        }
+
+
+def open_storage(clients=None, backend="local", url=None, key=None, buckets=None, **options):
+    """Storage from a [STORAGE] secrets table: backend = "local" or "supabase" (with url and key).
+
+    Remaining options go to the backend (path, files, blob_dir) or to Storage
+    (flush_interval, batch_size, watch_interval, cache_ttl, changes_keep, retries, retry_backoff,
+    retry_max, journal).
+    """
+    storage_options = {
+        k: options.pop(k) for k in (
+            "flush_interval", "batch_size", "watch_interval", "cache_ttl", "changes_keep",
+            "retries", "retry_backoff", "retry_max", "journal",
+        )
+        if k in options
+    }
+    if backend == "supabase":
+        if not (url and key):
+            raise ValueError("the supabase storage backend needs url and key")
+        if clients is None:
+            from vakildraft.clients import ClientRegistry
+
+            clients = ClientRegistry()
+        store = SupabaseBackend(lambda: clients.supabase(url, key), buckets=buckets, **options)
+    elif backend == "local":
+        store = LocalBackend(buckets=buckets, **options)
+    else:
+        raise ValueError(f"unknown storage backend {backend!r}")
+    return Storage(store, **storage_options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared storage for logs, vault files and drafts.")
+    parser.add_argument("--schema", action="store_true", help="print the Postgres DDL for the Supabase backend")
+    args = parser.parse_args(argv)
+    if args.schema:
+        print(schema_sql())
+        return 0
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Style vault with precomputed Style DNA.
+
+Reference files live in the shared "vault" bucket (see vakildraft.storage),
+so an upload on one replica is listed on all of them. Style DNA is
+extracted once, when a reference is uploaded (or first seen), and stored
+as JSON next to the files under .dna/, keyed by the file's content hash.
+The vault_files table maps each file to its hash, so a lookup never has
+to download the .docx again. The listing and that table are read through
+the storage cache and dropped when any replica uploads.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+SIDECAR = ".dna"
+BUCKET = "vault"
+TABLE = "vault_files"
+TOPIC = "vault"
+OPENING_PARAGRAPHS = 15
+
+PRAYER_START = re.compile(r"^\s*(PRAYER|RELIEFS?\s+SOUGHT|.*respectfully\s+prayed)", re.IGNORECASE)
+SECTION_END = re.compile(r"^\s*(VERIFICATION|AFFIDAVIT|LIST OF DOCUMENTS|Dated)", re.IGNORECASE)
+NUMBERING = [
+    ("1.", re.compile(r"^\d{1,3}\.\s")),
+    ("1)", re.compile(r"^\d{1,3}\)\s")),
+    ("(1)", re.compile(r"^\(\d{1,3}\)\s")),
+    ("(a)", re.compile(r"^\([a-z]\)\s")),
+    ("a)", re.compile(r"^[a-z]\)\s")),
+    ("(i)", re.compile(r"^\((?:i|ii|iii|iv|v|vi|vii|viii|ix|x)\)\s", re.IGNORECASE)),
+    ("A.", re.compile(r"^[A-H]\.\s")),
+]
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _is_heading(paragraph):
+    text = paragraph.text.strip()
+    if not text or len(text.split()) > 12:
+        return False
+    style = (paragraph.style.name or "") if paragraph.style is not None else ""
+    if style.startswith("Heading") or style == "Title":
+        return True
+    if text.isupper() and any(c.isalpha() for c in text):
+        return True
+    runs = [r for r in paragraph.runs if r.text.strip()]
+    return bool(runs) and all(r.bold for r in runs)
+
+
+def extract_features(source):
+    """Parse a reference .docx (a path or a file object) once and return its Style DNA features."""
+    from docx import Document
+
+    doc = Document(source)
+    paragraphs = [p for p in doc.paragraphs if p.text.strip()]
+    texts = [p.text.strip() for p in paragraphs]
+
+    numbering = Counter()
+    for p, text in zip(paragraphs, texts):
+        style = (p.style.name or "") if p.style is not None else ""
+        if style.startswith("List Number"):
+            numbering["auto-numbered list"] += 1
+            continue
+        for label, pattern in NUMBERING:
+            if pattern.match(text):
+                numbering[label] += 1
+                break
+
+    prayer = []
+    for i, text in enumerate(texts):
+        if PRAYER_START.match(text):
+            prayer.append(text)
+            for follow in texts[i + 1:i + 10]:
+                if SECTION_END.match(follow):
+                    break
+                prayer.append(follow)
+            break
+
+    return {
+        "opening": texts[:OPENING_PARAGRAPHS],
+        "headings": [t for p, t in zip(paragraphs, texts) if _is_heading(p)][:30],
+        "numbering": [label for label, _ in numbering.most_common(3)],
+        "prayer": prayer,
+        "has_verification": any(t.upper().startswith("VERIFICATION") for t in texts),
+        "paragraphs": len(texts),
+        "words": sum(len(t.split()) for t in texts),
+    }
+
+
+def dna_text(features):
+    """Render features as the Style DNA block sent to the model."""
+    parts = ["\n".join(features["opening"])]
+    if features["headings"]:
+        parts.append("Heading structure (in order):\n" + "\n".join(f"- {h}" for h in features["headings"]))
+    if features["numbering"]:
+        parts.append("Paragraph numbering style: " + ", ".join(features["numbering"]))
+    if features["prayer"]:
+        parts.append("Prayer clause layout:\n" + "\n".join(features["prayer"]))
+    if features["has_verification"]:
+        parts.append("Ends with a VERIFICATION section.")
+    return "\n\n".join(parts)
+
+
+class StyleVault:
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._dna = {}   # sha -> features; content-addressed, so never stale
+
+    # ---------------------------------------------------
+    # LISTING
+    # ---------------------------------------------------
+    def list(self):
+        return list(self.storage.cached(TOPIC, "list", lambda: sorted(
+            name for name in self.storage.backend.list_blobs(BUCKET)
+            if name.lower().endswith(".docx") and not name.startswith("~$")
+        )))
+
+    def invalidate(self):
+        self.storage.publish(TOPIC)
+
+    def _entry(self, name):
+        def load():
+            rows = self.storage.backend.select(TABLE, where={"name": name})
+            return rows[0] if rows else None
+
+        return self.storage.cached(TOPIC, ("file", name), load)
+
+    # ---------------------------------------------------
+    # UPLOAD / DNA
+    # ---------------------------------------------------
+    def save(self, name, data):
+        """Store an uploaded reference and extract its DNA now. Returns False if unchanged."""
+        name = os.path.basename(name)
+        sha = file_digest(data)
+        entry = self._entry(name)
+        if entry and entry["sha"] == sha:
+            return False
+        self.storage.backend.put_blob(BUCKET, name, data)
+        self._index(name, sha, data)
+        return True
+
+    def features(self, name):
+        name = os.path.basename(name)
+        entry = self._entry(name)
+        if entry is not None:
+            cached = self._load(entry["sha"])
+            if cached is not None:
+                return cached
+        # First sight of a file put in the vault some other way: hash and index it now
+        data = self.storage.backend.get_blob(BUCKET, name)
+        if data is None:
+            raise FileNotFoundError(name)
+        return self._index(name, file_digest(data), data)
+
+    def dna(self, name):
+        return dna_text(self.features(name))
+
+    def _index(self, name, sha, data):
+        features = self._load(sha)
+        if features is None:
+            features = extract_features(io.BytesIO(data))
+            self.storage.backend.put_blob(
+                BUCKET, f"{SIDECAR}/{sha}.json", json.dumps(features, ensure_ascii=False).encode("utf-8")
+            )
+            with self._lock:
+                self._dna[sha] = features
+        row = {"name": name, "sha": sha, "size": len(data), "uploaded": time.time()}
+        self.storage.backend.upsert(TABLE, [row], "name")
+        self.storage.publish(TOPIC)
+        return features
+
+    def _load(self, sha):
+        with self._lock:
+            if sha in self._dna:
+                return self._dna[sha]
+        blob = self.storage.backend.get_blob(BUCKET, f"{SIDECAR}/{sha}.json")
+        try:
+            features = json.loads(blob) if blob is not None else None
+        except ValueError:
+            return None
+        if features is not None:
+            with self._lock:
+                self._dna[sha] = features
+        return features
@@ -0,0 +1,20 @@
+"""Small text helpers shared by the search, prompt and dedup code."""
+import re
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "he",
+    "her", "his", "in", "is", "it", "of", "on", "or", "she", "that", "the", "their",
+    "there", "this", "to", "was", "were", "which", "with",
+}
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def terms(text):
+    """Lower-cased content words (no stopwords or single characters), in order."""
+    return [w for w in WORD.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English legal prose; cheap and close enough for budgeting
+    return (len(text) + 3) // 4